@@ -14,15 +14,17 @@
 # main.py (Migrated)
 import argparse
 import asyncio
-from google.adk.runners import InMemoryRunner
-from src.agents.adk_agent import agent_config
+import time
+from src.agents.service import AgentService
 from src.ingestion.pipeline import run_ingestion
+from src.ingestion.watcher import DirectoryWatcher
 from src.shared.logger import setup_logger
 from src.shared.validator import validate_datastore
 import os
 
 logger = setup_logger(__name__)
 app_name = os.getenv("APP_NAME", "GenAI-RAG")
+CHAT_USER_ID = "chat_user"
 
 
 def run_chat_mode():
@@ -30,17 +32,33 @@ def run_chat_mode():
 
     print(f"--- {app_name} ADK Chatbot ---")
     print("Type 'exit' to quit.")
-    
-    runner = InMemoryRunner(agent=agent_config)
-    
-    # Use the ADK's built-in debug runner for interactive chat
-    # This handles the user input loop.
+
+    service = AgentService(max_concurrency=1)
+
+    # Stream the reply as it is generated and print timing markers for
+    # time-to-first-token, each tool call and the whole turn.
     async def chat():
+        session_id = await service.create_session(CHAT_USER_ID)
         while True:
             user_input = input("\nYou: ")
             if user_input.lower() in ["exit", "quit"]:
                 break
-            await runner.run_debug(user_input)
+
+            print("\nAgent: ", end="", flush=True)
+            ttft = None
+            started = time.perf_counter()
+            try:
+                async for event in service.stream_events(CHAT_USER_ID, session_id, user_input):
+                    if event.kind == "text":
+                        if ttft is None:
+                            ttft = event.elapsed
+                        print(event.text, end="", flush=True)
+                    elif event.kind == "tool_end":
+                        print(f"[{event.tool}: {event.duration:.2f}s] ", end="", flush=True)
+            except Exception as e:
+                logger.error(f"Error during chat turn: {e}")
+            ttft_label = f"{ttft:.2f}s" if ttft is not None else "n/a"
+            print(f"\n[time to first token: {ttft_label} | turn: {time.perf_counter() - started:.2f}s]")
 
     asyncio.run(chat())
 
@@ -49,10 +67,12 @@ def main():
     parser = argparse.ArgumentParser(description=f"{app_name} RAG Agent CLI")
     parser.add_argument(
         "--mode",
-        choices=["chat", "ingest"],
+        choices=["chat", "ingest", "watch", "serve"],
         required=True,
         help="The mode to run the application in.",
     )
+    parser.add_argument("--host", default="0.0.0.0", help="Host to bind to in serve mode.")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")), help="Port to listen on in serve mode.")
     args = parser.parse_args()
 
     # Validate common environment variables
@@ -78,8 +98,23 @@ def main():
         run_chat_mode()
     elif args.mode == "ingest":
         logger.info("Starting ingestion mode...")
-        run_ingestion(input_dir="data/raw", output_dir="data/processed")
+        try:
+            failed = run_ingestion(input_dir="data/raw", output_dir="data/processed")
+        except Exception as e:
+            logger.critical(f"Ingestion failed: {e}")
+            return
+        if failed:
+            logger.warning(f"Ingestion mode finished; {len(failed)} file(s) failed and can be ingested again.")
+            return
         logger.info("Ingestion mode finished.")
+    elif args.mode == "watch":
+        logger.info("Starting watch mode...")
+        DirectoryWatcher(input_dir="data/raw", output_dir="data/processed").run()
+    elif args.mode == "serve":
+        logger.info("Starting serve mode...")
+        # Imported lazily so chat and ingest modes do not require the web server dependencies.
+        from src.server.app import serve
+        serve(host=args.host, port=args.port)
 
 if __name__ == "__main__":
     main()
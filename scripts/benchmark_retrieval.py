@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add 'src' to path so we can import the search backends
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.evaluation.retrieval import DEFAULT_CONCURRENCY_LEVELS, DEFAULT_KS, load_cases, run_benchmark
+from src.search.backend import get_search_backend
+from src.search.fanout import shard_latency_report
+from src.shared.metrics import get_metrics
+
+# Configuration
+GOLDEN_DATASET = "data/processed/golden_dataset"
+RESULTS_FILE = "data/processed/retrieval_benchmark.json"
+# Settings recorded with the results, so that runs with different configurations can be told apart.
+RECORDED_SETTINGS = ("SEARCH_BACKEND", "SEARCH_TARGETS", "SEARCH_RERANKER", "SEARCH_RERANK_CANDIDATES", "DATA_STORE_ID", "ENGINE_ID", "DOCSTORE_PATH", "METADATA_INDEX_PATH")
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency against the golden dataset.")
+    parser.add_argument("--backend", help="Search backend to benchmark: vertex or local (default: SEARCH_BACKEND).")
+    parser.add_argument("--dataset", default=GOLDEN_DATASET, help="Golden dataset directory or legacy JSONL file.")
+    parser.add_argument("--k", type=_int_list, default=list(DEFAULT_KS), help="Comma-separated recall cutoffs.")
+    parser.add_argument("--concurrency", type=_int_list, default=list(DEFAULT_CONCURRENCY_LEVELS),
+                        help="Comma-separated concurrency levels.")
+    parser.add_argument("--top-k", type=int, help="Documents requested per query (default: the largest k).")
+    parser.add_argument("--limit", type=int, help="Maximum number of questions to replay.")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results, e.g. a release tag.")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Output JSON file.")
+    args = parser.parse_args()
+
+    try:
+        cases = load_cases(args.dataset, args.limit)
+    except FileNotFoundError:
+        print(f"❌ Dataset not found: {args.dataset}. Run 'scripts/generate_golden_dataset.py' first.")
+        return
+    if not cases:
+        print(f"❌ No questions with a source_file found in {args.dataset}.")
+        return
+
+    backend_name = (args.backend or os.getenv("SEARCH_BACKEND", "vertex")).lower()
+    print(f"🔎 Benchmarking the '{backend_name}' backend with {len(cases)} questions...")
+    backend = get_search_backend(backend_name)
+    results = run_benchmark(backend, cases, ks=args.k, concurrency_levels=args.concurrency, top_k=args.top_k)
+
+    report = {
+        "label": args.label,
+        "backend": backend_name,
+        "dataset": args.dataset,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "settings": {name: os.getenv(name) for name in RECORDED_SETTINGS if os.getenv(name) is not None},
+        **results,
+    }
+    shards = shard_latency_report()
+    if shards:
+        report["shard_latency_seconds"] = shards
+    rerank = get_metrics().histogram("search_rerank_seconds").summary()
+    if rerank["count"]:
+        report["rerank_latency_seconds"] = rerank
+
+    print("\n--- Retrieval Benchmark Summary ---")
+    for level in results["levels"]:
+        recall = ", ".join(f"R{k}={v:.3f}" for k, v in level["recall"].items())
+        latency = level["latency_ms"]
+        print(
+            f"concurrency={level['concurrency']:>3}  {recall}  MRR={level['mrr']:.3f}  "
+            f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms  "
+            f"QPS={level['qps']:.1f}  errors={level['errors']}"
+        )
+
+    for name, latency in shards.items():
+        print(f"shard {name}: queries={latency['count']}  p50={latency['p50'] * 1000:.1f}ms "
+              f"p95={latency['p95'] * 1000:.1f}ms p99={latency['p99'] * 1000:.1f}ms")
+
+    if rerank["count"]:
+        print(f"rerank: queries={rerank['count']}  p50={rerank['p50'] * 1000:.2f}ms p95={rerank['p95'] * 1000:.2f}ms")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
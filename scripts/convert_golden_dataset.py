@@ -0,0 +1,51 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import os
+import sys
+
+# Add 'src' to path so we can import the dataset format
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.evaluation.dataset import GoldenDataset, convert_jsonl, export_jsonl
+
+# Configuration
+LEGACY_DATASET = "data/processed/golden_dataset.jsonl"
+GOLDEN_DATASET = "data/processed/golden_dataset"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the golden dataset between JSONL and Parquet.")
+    parser.add_argument("--input", default=LEGACY_DATASET, help="JSONL file, or dataset directory with --to-jsonl.")
+    parser.add_argument("--output", default=GOLDEN_DATASET, help="Dataset directory, or JSONL file with --to-jsonl.")
+    parser.add_argument("--to-jsonl", action="store_true", help="Export a Parquet dataset back to JSONL.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ Input not found: {args.input}.")
+        return
+
+    if args.to_jsonl:
+        count = export_jsonl(GoldenDataset.open(args.input), args.output)
+        print(f"✅ Exported {count} rows to {args.output}")
+        return
+
+    count = convert_jsonl(args.input, args.output)
+    before = os.path.getsize(args.input)
+    after = sum(os.path.getsize(os.path.join(args.output, name)) for name in os.listdir(args.output))
+    print(f"✅ Converted {count} questions to {args.output} ({before / 1024:.0f} KB -> {after / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@
 #     "google-cloud-aiplatform",
 #     "python-dotenv",
 #     "pypdf",
+#     "pyarrow",
 # ]
 # ///
 
@@ -28,6 +29,11 @@ from vertexai.generative_models import GenerativeModel
 import vertexai
 from dotenv import load_dotenv
 from src.ingestion.parser import parse_pdf  # Re-using existing parser logic
+from google.api_core import exceptions as google_exceptions
+from src.evaluation.dataset import write_dataset
+from src.shared.docstore import DocStore
+from src.shared.rate_limit import GEMINI, get_limiter
+from src.shared.sanitizer import sanitize_id
 
 load_dotenv()
 
@@ -35,7 +41,8 @@ load_dotenv()
 PROJECT_ID = os.getenv("PROJECT_ID")
 LOCATION = os.getenv("VERTEX_AI_REGION", "us-central1")
 INPUT_DIR = "data/raw"
-OUTPUT_FILE = "data/processed/golden_dataset.jsonl"
+# A directory of Parquet files; each record text is stored once (see src/evaluation/dataset.py).
+OUTPUT_DIR = "data/processed/golden_dataset"
 
 def generate_qa_pairs():
     """Generates a golden dataset (Q&A pairs) from raw PDFs."""
@@ -47,13 +54,18 @@ def generate_qa_pairs():
     
     pdf_files = glob.glob(os.path.join(INPUT_DIR, "*.pdf"))
     dataset = []
+    # Texts parsed by the last ingestion are read from the document store instead of re-parsing the PDFs.
+    store = DocStore.open()
 
     print(f"Found {len(pdf_files)} PDF files. Generating Q&A pairs...")
 
     for file_path in pdf_files:
         try:
             # 1. Extract text using existing project logic
-            text_content = parse_pdf(file_path)
+            doc_id = sanitize_id(os.path.splitext(os.path.basename(file_path))[0])
+            text_content = store.text(doc_id) if store is not None else None
+            if text_content is None:
+                text_content = parse_pdf(file_path)
             
             # 2. Prompt Gemini to generate Ground Truth
             prompt = f"""
@@ -71,7 +83,14 @@ def generate_qa_pairs():
             {text_content[:8000]} # Truncate to fit context if needed
             """
             
-            response = model.generate_content(prompt)
+            # Calls share the Gemini quota budget with other local processes (RATE_LIMIT_SHARED_DIR).
+            limiter = get_limiter(GEMINI)
+            limiter.acquire()
+            try:
+                response = model.generate_content(prompt)
+            except google_exceptions.TooManyRequests:
+                limiter.penalize()
+                raise
             
             # 3. Parse JSON response (Basic cleanup)
             content = response.text.replace("```json", "").replace("```", "").strip()
@@ -90,12 +109,10 @@ def generate_qa_pairs():
         except Exception as e:
             print(f"Skipping {file_path}: {e}")
 
-    # 4. Save to JSONL
-    with open(OUTPUT_FILE, "w") as f:
-        for entry in dataset:
-            f.write(json.dumps(entry) + "\n")
+    # 4. Save as a normalized Parquet dataset
+    write_dataset(OUTPUT_DIR, dataset)
     
-    print(f"✅ Golden dataset saved to {OUTPUT_FILE} ({len(dataset)} pairs)")
+    print(f"✅ Golden dataset saved to {OUTPUT_DIR} ({len(dataset)} pairs)")
 
 if __name__ == "__main__":
     generate_qa_pairs()
@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add 'src' to path so we can import the agent and tools
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.evaluation.load import FakeSearchService, agent_request, run_load, tool_request
+from src.evaluation.retrieval import load_cases
+from src.search.local_client import LocalSearchClient
+from src.shared.clients import SEARCH, get_registry
+
+# Configuration
+GOLDEN_DATASET = "data/processed/golden_dataset"
+RESULTS_FILE = "data/processed/load_test.json"
+
+
+def install_fake_search(args) -> FakeSearchService:
+    """Routes all Discovery Engine search calls of this process to a local fake."""
+    # The Vertex AI Search code path is exercised against the fake, so its settings
+    # only need to be present, not valid.
+    os.environ["SEARCH_BACKEND"] = "vertex"
+    # The fake has no quota, so the search budget is lifted unless set explicitly.
+    os.environ.setdefault("RATE_LIMIT_DISCOVERY_ENGINE_QPS", "0")
+    for name, value in (("PROJECT_ID", "load-test"), ("LOCATION", "global"), ("DATA_STORE_ID", "load-test")):
+        os.environ.setdefault(name, value)
+    corpus = LocalSearchClient() if not args.no_corpus else None
+    fake = FakeSearchService(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        corpus=corpus,
+        seed=args.seed,
+    )
+    get_registry().override(SEARCH, fake)
+    return fake
+
+
+async def main(args):
+    cases = load_cases(args.dataset)
+    if not cases:
+        print(f"❌ No questions found in {args.dataset}. Run 'scripts/generate_golden_dataset.py' first.")
+        return
+    questions = [case.question for case in cases]
+
+    # Set before the tools are imported, which sizes their thread pool.
+    os.environ["SEARCH_TOOL_WORKERS"] = str(args.workers)
+    fake = install_fake_search(args) if not args.real_search else None
+    is_rejection = lambda e: False
+    if args.target == "agent":
+        # The agent is imported only now, so that its tools bind to the fake search service.
+        from src.agents.service import AgentService, OverloadedError
+        service = AgentService(max_concurrency=args.max_concurrency, max_pending=args.max_pending)
+        request = agent_request(service)
+        is_rejection = lambda e: isinstance(e, OverloadedError)
+    else:
+        request = tool_request()
+
+    print(f"🚀 Sending {args.rate} req/s to the {args.target} path for {args.duration}s "
+          f"({len(questions)} distinct questions)...")
+    try:
+        report = await run_load(args.target, request, questions, args.rate, args.duration, args.seed, is_rejection)
+    finally:
+        from src.agents.tools import shutdown
+        shutdown()
+    summary = report.summary()
+    if fake is not None:
+        summary["fake_search"] = {
+            "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma,
+            "error_rate": args.error_rate,
+            "calls": fake.calls,
+            "injected_errors": fake.injected_errors,
+        }
+
+    print("\n--- Load Test Summary ---")
+    latency, lag = summary["latency_ms"], summary["event_loop_lag_ms"]
+    print(f"sent={summary['sent']} completed={summary['completed']} rejected={summary['rejected']} "
+          f"errors={summary['errors']} throughput={summary['throughput']:.1f}/s peak_inflight={summary['peak_inflight']}")
+    print(f"latency p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms max={latency['max']:.1f}ms")
+    print(f"event loop lag p50={lag['p50']:.1f}ms p99={lag['p99']:.1f}ms max={lag['max']:.1f}ms")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the agent or its search tool against a fake search service.")
+    parser.add_argument("--target", choices=["tool", "agent"], default="tool",
+                        help="'tool' calls search_knowledge_base directly; 'agent' runs full agent turns (the model is still called).")
+    parser.add_argument("--rate", type=float, default=50.0, help="Mean arrival rate, in requests per second.")
+    parser.add_argument("--duration", type=float, default=30.0, help="How long to send requests, in seconds.")
+    parser.add_argument("--dataset", default=GOLDEN_DATASET, help="Golden dataset (directory or legacy JSONL file) providing the question mix.")
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Median latency of the fake search service.")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the fake latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake search calls that fail.")
+    parser.add_argument("--no-corpus", action="store_true", help="Return empty results instead of BM25 hits from the local document store.")
+    parser.add_argument("--real-search", action="store_true", help="Use the configured search backend instead of the fake.")
+    parser.add_argument("--workers", type=int, default=64, help="Threads running search tool calls (SEARCH_TOOL_WORKERS).")
+    parser.add_argument("--max-concurrency", type=int, help="AgentService concurrency limit in 'agent' mode.")
+    parser.add_argument("--max-pending", type=int, help="AgentService queue limit in 'agent' mode.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for arrivals, questions and injected faults.")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Output JSON file.")
+    asyncio.run(main(parser.parse_args()))
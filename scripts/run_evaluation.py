@@ -16,6 +16,7 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "pandas",
+#     "pyarrow",
 #     "google-cloud-aiplatform",
 #     "google-cloud-aiplatform[evaluation]",
 #     "python-dotenv",
@@ -24,7 +25,7 @@
 # ]
 # ///
 
-import json
+import argparse
 import os
 import sys
 import uuid
@@ -49,11 +50,14 @@ from google.adk.sessions import InMemorySessionService
 
 from src.agents.adk_agent import agent_config, app_name, system_prompt
 from src.agents.tools import search_knowledge_base
+from src.evaluation.cache import EvalCache, agent_fingerprint
+from src.evaluation.dataset import GoldenDataset
+from src.shared.rate_limit import GEMINI, get_limiter
 
 # Configuration
 PROJECT_ID = os.getenv("PROJECT_ID")
 LOCATION = os.getenv("VERTEX_AI_REGION", "europe-west1") 
-GOLDEN_DATASET = "data/processed/golden_dataset.jsonl"
+GOLDEN_DATASET = "data/processed/golden_dataset"
 RESULTS_FILE = "data/processed/eval_results.json"
 USER_ID = "eval_user_123"
 
@@ -75,6 +79,8 @@ async def get_agent_response(question: str) -> str:
         app_name=app_name, user_id=USER_ID, session_id=session_id
     )
     try:
+        # Questions are sent concurrently; the shared Gemini budget spaces out the turns.
+        await get_limiter(GEMINI).acquire_async()
         print(f"   🗣️ Asking agent: {question[:30]}...")
         final_response_text = "Error: No response received."
         async for event in runner.run_async(
@@ -94,28 +100,50 @@ async def get_agent_response(question: str) -> str:
         return f"Error generating response: {e}"
 
 
-async def main():
+def _plain(value):
+    """Converts NumPy scalars from the metrics table to JSON-serializable Python values."""
+    return value.item() if hasattr(value, "item") else value
+
+
+async def main(args):
     print(f"🚀 Initializing Vertex AI in {LOCATION}...")
     vertexai.init(project=PROJECT_ID, location=LOCATION)
 
     # 1. Load Data
-    data = []
-    if not os.path.exists(GOLDEN_DATASET):
-        print(f"❌ Dataset not found: {GOLDEN_DATASET}. Run 'scripts/generate_golden_dataset.py' first.")
+    try:
+        dataset = GoldenDataset.open(args.dataset)
+    except FileNotFoundError:
+        print(f"❌ Dataset not found: {args.dataset}. Run 'scripts/generate_golden_dataset.py' first.")
         return
 
-    with open(GOLDEN_DATASET, "r") as f:
-        for line in f: 
-            data.append(json.loads(line))
-    
-    # Use 5 rows for a quick test (remove .head(5) for a full run)
-    eval_df = pd.DataFrame(data).head(5) 
-    
+    # Use 5 rows for a quick test (pass --limit 0 for a full run, or --sample for a random
+    # subset). Only the contexts of the selected questions are loaded.
+    if args.sample:
+        rows = dataset.rows(sample=args.sample, seed=args.seed)
+    else:
+        rows = dataset.rows(limit=args.limit or None)
+    print(f"📚 Loaded {len(rows)} of {len(dataset)} questions from {dataset.path}.")
+    eval_df = pd.DataFrame(rows)
+
+    # Responses and scores are reused for rows whose inputs did not change since a previous run.
+    cache = EvalCache(args.cache_dir) if not args.no_cache else None
+    fingerprint = agent_fingerprint(agent_config)
+    response_keys = [EvalCache.response_key(row["question"], fingerprint) for row in rows]
+
     # 2. Get Real Model Predictions
-    print(f"🤖 Generating responses for {len(eval_df)} questions...")
-    questions = eval_df["question"].tolist()
-    responses = await asyncio.gather(*[get_agent_response(q) for q in questions])
+    cached_responses = [cache.get(key) if cache else None for key in response_keys]
+    to_generate = [i for i, entry in enumerate(cached_responses) if entry is None]
+    print(f"🤖 Generating responses for {len(to_generate)} of {len(rows)} questions "
+          f"({len(rows) - len(to_generate)} cached)...")
+    generated = await asyncio.gather(*[get_agent_response(rows[i]["question"]) for i in to_generate])
+    responses = [entry["response"] if entry else None for entry in cached_responses]
+    for i, response in zip(to_generate, generated):
+        responses[i] = response
+        if cache and not response.startswith("Error generating response"):
+            cache.put(response_keys[i], {"question": rows[i]["question"], "response": response})
     eval_df["response"] = responses
+    # Failed turns are scored for this run's report but never cached.
+    failed = {i for i, response in enumerate(responses) if response.startswith("Error generating response")}
 
     # 3. Define Metrics
     metrics = [
@@ -124,25 +152,64 @@ async def main():
         "safety" 
     ]
 
+    # A row is scored again if any of its metrics has no cached score.
+    score_keys = [
+        {m: EvalCache.score_key(response_keys[i], responses[i], rows[i], m) for m in metrics}
+        for i in range(len(rows))
+    ]
+    scores = [{m: cache.get(keys[m]) if cache else None for m in metrics} for keys in score_keys]
+    to_score = [i for i, row_scores in enumerate(scores) if any(v is None for v in row_scores.values())]
+
     # 4. Run Evaluation
-    print("📊 Running Vertex AI Evaluation...")
-    eval_task = EvalTask(
-        dataset=eval_df,
-        metrics=metrics,
-        metric_column_mapping={
-            "prompt": "context",
-        },
-        experiment="rag-mvp-eval-002"
-    )
-    
-    result = eval_task.evaluate()
+    if to_score:
+        print(f"📊 Running Vertex AI Evaluation on {len(to_score)} of {len(rows)} rows...")
+        eval_task = EvalTask(
+            dataset=eval_df.iloc[to_score].reset_index(drop=True),
+            metrics=metrics,
+            metric_column_mapping={
+                "prompt": "context",
+            },
+            experiment="rag-mvp-eval-002"
+        )
+        table = eval_task.evaluate().metrics_table
+        for position, i in enumerate(to_score):
+            for m in metrics:
+                columns = {c: _plain(table.iloc[position][c]) for c in table.columns if c.startswith(f"{m}/")}
+                scores[i][m] = {"metric": m, "columns": columns}
+                if cache and i not in failed:
+                    cache.put(score_keys[i][m], scores[i][m])
+    else:
+        print("📊 All rows have cached scores; skipping the Vertex AI Evaluation.")
 
     # 5. Output Results
+    metrics_table = eval_df.copy()
+    for m in metrics:
+        for column in sorted({c for row_scores in scores for c in row_scores[m]["columns"]}):
+            metrics_table[column] = [row_scores[m]["columns"].get(column) for row_scores in scores]
+    metrics_table["response_cached"] = [i not in to_generate for i in range(len(rows))]
+    metrics_table["scores_cached"] = [i not in to_score for i in range(len(rows))]
+
+    summary_metrics = {"row_count": len(rows)}
+    for m in metrics:
+        if f"{m}/score" in metrics_table:
+            values = pd.to_numeric(metrics_table[f"{m}/score"], errors="coerce")
+            summary_metrics[f"{m}/mean"] = values.mean()
+            summary_metrics[f"{m}/std"] = values.std()
+
     print("\n--- Evaluation Summary ---")
-    print(result.summary_metrics)
+    print(summary_metrics)
+    print(f"♻️ Reused {len(rows) - len(to_generate)}/{len(rows)} responses and "
+          f"{len(rows) - len(to_score)}/{len(rows)} scored rows from {cache.directory if cache else 'no cache'}.")
     
-    result.metrics_table.to_json(RESULTS_FILE, orient="records", lines=True)
+    metrics_table.to_json(RESULTS_FILE, orient="records", lines=True)
     print(f"✅ Detailed results saved to {RESULTS_FILE}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evaluate the agent's responses to the golden dataset.")
+    parser.add_argument("--dataset", default=GOLDEN_DATASET, help="Golden dataset directory or legacy JSONL file.")
+    parser.add_argument("--limit", type=int, default=5, help="Number of questions to evaluate (0 for all).")
+    parser.add_argument("--sample", type=int, help="Evaluate a random sample of this many questions instead of the first --limit.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of --sample, to compare runs on the same questions.")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate and re-score every row.")
+    parser.add_argument("--cache-dir", help="Evaluation cache directory (default: EVAL_CACHE_DIR).")
+    asyncio.run(main(parser.parse_args()))
@@ -12,31 +12,58 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from google.adk.agents import Agent
+from src.agents import answer_cache, memory, prefetch, router
+from src.agents.prompts import GENERAL, PERSONAS
 from src.agents.tools import search_knowledge_base
 from google.genai import types
 import os
 
 
-# TODO: HACKATHON CHALLENGE (Challenge 2, Part 1)
-# The prompt below is static. Your goal is to implement a prompt router
-# that dynamically selects a persona and instructions based on the user's query.
-# For example, a query asking for a summary might use a "summarizer" persona,
-# while a query asking for specific data points might use a "data extractor" persona.
-# You can define different prompt strategies in a new module and then
-# modify this agent to use a router to select one before executing the search.
-
-system_prompt = """
-You are a helpful assistant.
-"""
+# The default instruction. When the query router is enabled, the instruction is chosen
+# per turn from the personas in `prompts.py` instead.
+system_prompt = PERSONAS[GENERAL]
+router_enabled = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
 
 app_name = os.getenv("APP_NAME", "GenAI-RAG").lower().replace(" ", "_").replace("-", "_")
 
+# Callbacks wrapped around every turn. The semantic answer cache answers paraphrases of
+# previously answered questions without calling the model or the search tool; the query
+# router answers chit-chat and simple record lookups locally and picks the persona; the
+# memory policy keeps the history sent to the model bounded in long sessions; the
+# prefetcher starts the search while the model decides on its tool call.
+before_agent_callbacks = []
+after_agent_callbacks = []
+before_model_callbacks = []
+after_model_callbacks = []
+before_tool_callbacks = []
+after_tool_callbacks = []
+if os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true":
+    before_agent_callbacks.append(answer_cache.before_agent)
+    after_model_callbacks.append(answer_cache.after_model)
+    after_tool_callbacks.append(answer_cache.after_tool)
+if router_enabled:
+    before_agent_callbacks.append(router.before_agent)
+memory_enabled = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+if memory_enabled:
+    before_model_callbacks.append(memory.before_model)
+# Last, so that no search is started for turns answered by the cache or the router.
+if os.getenv("SEARCH_PREFETCH", "false").lower() == "true":
+    before_agent_callbacks.append(prefetch.before_agent)
+    after_agent_callbacks.append(prefetch.after_agent)
+    before_tool_callbacks.append(prefetch.before_tool)
+
 # For a list of available models, see:
 # https://cloud.google.com/vertex-ai/generative-ai/docs/learn/models
 agent_config = Agent(
     name=f"{app_name}_agent",
     model="gemini-2.0-flash-lite",
-    instruction=system_prompt,
+    instruction=router.instruction if router_enabled else system_prompt,
     generate_content_config=types.GenerateContentConfig(temperature=0),
     tools=[search_knowledge_base],
+    before_agent_callback=before_agent_callbacks,
+    after_agent_callback=after_agent_callbacks,
+    before_model_callback=before_model_callbacks,
+    after_model_callback=after_model_callbacks,
+    before_tool_callback=before_tool_callbacks,
+    after_tool_callback=after_tool_callbacks,
 )
\ No newline at end of file
@@ -0,0 +1,202 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional
+import numpy as np
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.base_tool import BaseTool
+from google.genai import types
+from src.shared.embeddings import HashingEmbedder
+from src.shared.freshness import last_ingestion_time
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# Capitalized words and numbers identify what a question is about (patient names, dates,
+# doses). Two questions are only considered paraphrases if these match exactly, so that
+# "Jessica Woodward medication" never returns the answer cached for another patient.
+# The remaining words carry the intent and are what gets embedded.
+_KEY_TERM_PATTERN = re.compile(r"\b(?:[A-Z][a-z][a-zA-Z-]*|\d[\d./:-]*)(?:'s)?\b")
+_QUESTION_WORDS = frozenset("What When Where Which Who Whom Whose Why How Is Are Does Do Did Can Could Please Tell Show List Give".split())
+
+_STATE_QUESTION = "temp:answer_cache_question"
+_STATE_GROUNDED = "temp:answer_cache_grounded"
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    terms = (t.removesuffix("'s") for t in _KEY_TERM_PATTERN.findall(question))
+    return frozenset(t.lower() for t in terms if t not in _QUESTION_WORDS)
+
+
+def _intent(question: str) -> str:
+    return _KEY_TERM_PATTERN.sub(lambda m: m.group(0) if m.group(0) in _QUESTION_WORDS else " ", question)
+
+
+class SemanticAnswerCache:
+    """
+    Caches grounded agent answers and serves them for paraphrased questions.
+
+    The intent of each question (its text without key terms) is embedded with a local
+    `HashingEmbedder` and kept in an in-memory vector index (a NumPy matrix). A lookup
+    returns the answer of the most similar cached question if its cosine similarity is
+    at least `threshold` and both questions mention the same key terms. Entries expire
+    after `ttl_seconds`, and the whole cache is cleared when a newer ingestion run is
+    detected.
+
+    Two similar questions can still ask for different facts, so the cache is disabled
+    unless `ANSWER_CACHE_ENABLED=true`.
+    """
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        embedder: Optional[HashingEmbedder] = None,
+    ):
+        self.threshold = threshold if threshold is not None else float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+        self._clear()
+        self._ingestion_seen = last_ingestion_time()
+
+    def _clear(self):
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._questions: List[str] = []
+        self._terms: List[FrozenSet[str]] = []
+        self._answers: List[str] = []
+        self._expires: List[float] = []
+
+    def _check_freshness(self):
+        # Callers hold self._lock.
+        ingested_at = last_ingestion_time()
+        if ingested_at > self._ingestion_seen:
+            logger.info("New ingestion detected; clearing the answer cache.")
+            self._ingestion_seen = ingested_at
+            self._clear()
+
+    def _evict(self, keep: np.ndarray):
+        # Callers hold self._lock.
+        self._vectors = self._vectors[keep]
+        indices = np.flatnonzero(keep)
+        self._questions = [self._questions[i] for i in indices]
+        self._terms = [self._terms[i] for i in indices]
+        self._answers = [self._answers[i] for i in indices]
+        self._expires = [self._expires[i] for i in indices]
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Returns the cached answer for a question or a paraphrase of it, if any.
+        """
+        terms = key_terms(question)
+        if not terms:
+            return None
+        query = self.embedder.embed(_intent(question))
+        with self._lock:
+            self._check_freshness()
+            if not self._answers:
+                return None
+            now = time.time()
+            scores = self._vectors @ query
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                if self._terms[i] == terms and self._expires[i] > now:
+                    logger.info(f"Answer cache hit for '{question}' (matched '{self._questions[i]}', score {scores[i]:.2f}).")
+                    return self._answers[i]
+        return None
+
+    def put(self, question: str, answer: str):
+        """
+        Stores the answer to a question. Questions without key terms are not cached,
+        since they usually depend on earlier turns of the conversation.
+        """
+        terms = key_terms(question)
+        if not terms or not answer.strip():
+            return
+        vector = self.embedder.embed(_intent(question))
+        with self._lock:
+            self._check_freshness()
+            now = time.time()
+            expired = np.array(self._expires, dtype=np.float64) <= now
+            if expired.any():
+                self._evict(~expired)
+            if len(self._answers) >= self.max_entries:
+                # Entries are appended in insertion order, so the oldest come first.
+                keep = np.ones(len(self._answers), dtype=bool)
+                keep[: len(self._answers) - self.max_entries + 1] = False
+                self._evict(keep)
+            self._vectors = np.vstack([self._vectors, vector[None, :]])
+            self._questions.append(question)
+            self._terms.append(terms)
+            self._answers.append(answer)
+            self._expires.append(now + self.ttl_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+
+answer_cache = SemanticAnswerCache()
+
+
+def _user_text(callback_context: CallbackContext) -> str:
+    content = callback_context.user_content
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if part.text).strip()
+
+
+def before_agent(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answers the turn from the cache, skipping the model and search calls on a hit."""
+    question = _user_text(callback_context)
+    if not question:
+        return None
+    answer = answer_cache.get(question)
+    if answer is None:
+        metrics.counter("answer_cache_misses_total").inc()
+        callback_context.state[_STATE_QUESTION] = question
+        return None
+    metrics.counter("answer_cache_hits_total").inc()
+    return types.Content(role="model", parts=[types.Part(text=answer)])
+
+
+def after_tool(tool: BaseTool, args: Dict[str, Any], tool_context: CallbackContext, tool_response: Any) -> None:
+    """Marks the turn as grounded once the knowledge base has been searched."""
+    if tool.name == "search_knowledge_base":
+        tool_context.state[_STATE_GROUNDED] = True
+    return None
+
+
+def after_model(callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+    """Caches the final answer of a grounded turn."""
+    if llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return None
+    parts = llm_response.content.parts
+    if any(part.function_call for part in parts):
+        return None
+    question = callback_context.state.get(_STATE_QUESTION)
+    if question and callback_context.state.get(_STATE_GROUNDED):
+        answer_cache.put(question, "".join(part.text for part in parts if part.text))
+    return None
@@ -0,0 +1,179 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+from typing import List, Optional
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events import Event
+from google.adk.models.llm_request import LlmRequest
+from google.adk.sessions import BaseSessionService, Session
+from google.genai import types
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# The rolling summary of the turns dropped from the session, kept in the session state.
+_STATE_SUMMARY = "memory_summary"
+# State prefixes that are not owned by the session itself.
+_SHARED_STATE_PREFIXES = ("app:", "user:", "temp:")
+
+_TRUNCATED = " [...]"
+
+
+def _text(content: Optional[types.Content]) -> str:
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if part.text).strip()
+
+
+def _is_user_message(content: Optional[types.Content]) -> bool:
+    """Whether the content is a message typed by the user, as opposed to a tool result."""
+    return bool(content and content.role == "user" and _text(content)
+                and not any(part.function_response for part in content.parts))
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rstrip() + _TRUNCATED
+
+
+def split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    """
+    Groups the contents of a conversation into turns, each starting with a user message
+    and followed by the model's tool calls, the tool results and the reply.
+    """
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if _is_user_message(content) or not turns:
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+class MemoryPolicy:
+    """
+    Bounds what a long chat session sends to the model and keeps in memory.
+
+    -   Only the last `window_turns` turns are sent verbatim. Older turns are folded into a
+        rolling summary (each question with the start of its answer, newest last, at most
+        `summary_chars` long) that is appended to the system instruction.
+    -   Tool results of earlier turns are cut to `tool_output_chars`: the retrieved
+        snippets have already been used for the answer that follows them.
+    -   Once the stored events of a session exceed `max_session_bytes`, the session is
+        rebuilt with only the recent window and the summary of everything before it.
+
+    The summary is extractive, so compaction adds no model call to a turn.
+    """
+    def __init__(
+        self,
+        window_turns: Optional[int] = None,
+        tool_output_chars: Optional[int] = None,
+        summary_chars: Optional[int] = None,
+        max_session_bytes: Optional[int] = None,
+    ):
+        self.window_turns = max(1, window_turns or int(os.getenv("MEMORY_WINDOW_TURNS", "6")))
+        self.tool_output_chars = tool_output_chars or int(os.getenv("MEMORY_TOOL_OUTPUT_CHARS", "500"))
+        self.summary_chars = summary_chars or int(os.getenv("MEMORY_SUMMARY_CHARS", "2000"))
+        self.max_session_bytes = max_session_bytes or int(os.getenv("MEMORY_MAX_SESSION_BYTES", "262144"))
+
+    def summarize(self, summary: str, turns: List[List[types.Content]]) -> str:
+        """Appends one line per turn to the summary and drops its oldest lines beyond `summary_chars`."""
+        lines = summary.splitlines() if summary else []
+        for turn in turns:
+            if not turn:
+                continue
+            question = _text(turn[0]) if _is_user_message(turn[0]) else ""
+            answers = [_text(c) for c in turn if c.role == "model" and _text(c)]
+            if question or answers:
+                lines.append(f"- User: {_clip(question, 200)} | Assistant: {_clip(answers[-1] if answers else '', 300)}")
+        while lines and sum(len(line) + 1 for line in lines) > self.summary_chars:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _clip_tool_outputs(self, content: types.Content) -> types.Content:
+        parts = []
+        for part in content.parts or []:
+            response = part.function_response
+            if response is not None and response.response:
+                clipped = {key: _clip(value, self.tool_output_chars) if isinstance(value, str) else value
+                           for key, value in response.response.items()}
+                part = types.Part(function_response=types.FunctionResponse(
+                    id=response.id, name=response.name, response=clipped
+                ))
+            parts.append(part)
+        return types.Content(role=content.role, parts=parts)
+
+    def before_model(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        """Trims the request to the recent window, clipped tool results and the rolling summary."""
+        turns = split_turns(llm_request.contents)
+        old, recent = turns[:-self.window_turns], turns[-self.window_turns:]
+        summary = self.summarize(callback_context.state.get(_STATE_SUMMARY, ""), old)
+
+        contents = []
+        for index, turn in enumerate(recent):
+            current = index == len(recent) - 1
+            contents.extend(turn if current else (self._clip_tool_outputs(c) for c in turn))
+        llm_request.contents = contents
+        if summary:
+            llm_request.append_instructions([f"Summary of the earlier conversation:\n{summary}"])
+        metrics.histogram("agent_prompt_contents").observe(len(contents))
+        return None
+
+    async def compact_session(self, session_service: BaseSessionService, session: Session) -> Session:
+        """
+        Rebuilds the session with only its recent window of turns if its stored events
+        exceed `max_session_bytes`, moving the older turns into the rolling summary.
+
+        Returns:
+            Session: The compacted session, or `session` if it is within its budget.
+        """
+        size = sum(len(event.model_dump_json(exclude_none=True)) for event in session.events)
+        metrics.histogram("agent_session_bytes").observe(size)
+        if size <= self.max_session_bytes:
+            return session
+
+        # Events are grouped by turn the same way as the model request, by their content.
+        groups: List[List[Event]] = []
+        for event in session.events:
+            if (event.author == "user" and _is_user_message(event.content)) or not groups:
+                groups.append([])
+            groups[-1].append(event)
+        old, recent = groups[:-self.window_turns], groups[-self.window_turns:]
+        if not old:
+            return session
+
+        state = {k: v for k, v in session.state.items() if not k.startswith(_SHARED_STATE_PREFIXES)}
+        state[_STATE_SUMMARY] = self.summarize(
+            session.state.get(_STATE_SUMMARY, ""),
+            [[e.content for e in group if e.content] for group in old],
+        )
+        await session_service.delete_session(app_name=session.app_name, user_id=session.user_id, session_id=session.id)
+        compacted = await session_service.create_session(
+            app_name=session.app_name, user_id=session.user_id, session_id=session.id, state=state
+        )
+        for group in recent:
+            for event in group:
+                await session_service.append_event(compacted, event)
+        metrics.counter("agent_session_compactions_total").inc()
+        logger.info(f"Compacted session {session.id}: {len(old)} turn(s) ({size} bytes of events) moved to the summary.")
+        return compacted
+
+
+memory_policy = MemoryPolicy()
+
+
+def before_model(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+    """Applies the process-wide memory policy to a model request."""
+    return memory_policy.before_model(callback_context, llm_request)
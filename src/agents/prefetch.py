@@ -0,0 +1,140 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from src.agents.answer_cache import key_terms
+from src.agents.tools import search_client
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can could did do does for from give had has have how i in is it list me "
+    "of on or please s show tell that the their there this to was were what when where which who whom "
+    "whose why with would you".split()
+)
+_FILTER_ARGS = ("patient", "source_file", "date_from", "date_to", "document_type")
+
+
+def _terms(text: str) -> FrozenSet[str]:
+    return frozenset(w for w in _WORD_PATTERN.findall(text.lower()) if w not in _STOP_WORDS)
+
+
+class SearchPrefetcher:
+    """
+    Runs a speculative search on the user's message while the model decides which tool
+    call to make, so that the search round trip overlaps the first model call.
+
+    When the agent then calls `search_knowledge_base` without filters and with a query
+    whose terms are mostly taken from the message (at least `min_overlap` of them, and
+    every name and number), the prefetched result is used instead of a new search, even
+    if it is still in flight. Prefetches that are not used are counted as wasted.
+    """
+    def __init__(self, min_overlap: Optional[float] = None, workers: Optional[int] = None):
+        self.min_overlap = min_overlap if min_overlap is not None else float(os.getenv("SEARCH_PREFETCH_MIN_OVERLAP", "0.6"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("SEARCH_PREFETCH_WORKERS", "16")),
+            thread_name_prefix="search-prefetch",
+        )
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, Future, float]] = {}
+
+    def start(self, invocation_id: str, message: str):
+        """Starts searching for `message` on behalf of the turn `invocation_id`."""
+        future = self._executor.submit(search_client.search, message, None)
+        with self._lock:
+            self._pending[invocation_id] = (message, future, time.perf_counter())
+        metrics.counter("search_prefetch_started_total").inc()
+
+    def matches(self, message: str, query: str) -> bool:
+        """Whether the results for `message` can stand in for the results for `query`."""
+        query_terms = _terms(query)
+        if not query_terms or not key_terms(query) <= key_terms(message):
+            return False
+        return len(query_terms & _terms(message)) / len(query_terms) >= self.min_overlap
+
+    def take(self, invocation_id: str, args: Dict[str, Any]) -> Optional[Future]:
+        """
+        Returns the turn's prefetch if it can answer a search with these tool arguments.
+        A prefetch is used at most once; one that cannot answer is discarded as wasted.
+        """
+        with self._lock:
+            pending = self._pending.pop(invocation_id, None)
+        if pending is None:
+            return None
+        message, future, started = pending
+        if any(args.get(name) for name in _FILTER_ARGS) or not self.matches(message, args.get("query", "")):
+            self._waste(future)
+            return None
+        metrics.counter("search_prefetch_hits_total").inc()
+        # How much of the search had already run when the tool was called.
+        metrics.histogram("search_prefetch_head_start_seconds").observe(time.perf_counter() - started)
+        return future
+
+    def discard(self, invocation_id: str):
+        """Drops the turn's prefetch if it was never used."""
+        with self._lock:
+            pending = self._pending.pop(invocation_id, None)
+        if pending is not None:
+            self._waste(pending[1])
+
+    def _waste(self, future: Future):
+        future.cancel()
+        metrics.counter("search_prefetch_wasted_total").inc()
+
+
+prefetcher = SearchPrefetcher()
+
+
+def before_agent(callback_context: CallbackContext) -> None:
+    """Starts the speculative search for the turn's message."""
+    content = callback_context.user_content
+    message = "".join(part.text for part in content.parts if part.text).strip() if content and content.parts else ""
+    if message:
+        prefetcher.start(callback_context.invocation_id, message)
+    return None
+
+
+async def before_tool(tool: BaseTool, args: Dict[str, Any], tool_context: CallbackContext) -> Optional[Dict[str, Any]]:
+    """Answers a matching search tool call with the prefetched result."""
+    if tool.name != "search_knowledge_base":
+        return None
+    future = prefetcher.take(tool_context.invocation_id, args)
+    if future is None:
+        return None
+    try:
+        result = await asyncio.wrap_future(future)
+    except Exception as e:
+        logger.warning(f"Prefetched search failed ({e}); searching again.")
+        return None
+    if result.startswith("Error retrieving documents"):
+        return None
+    logger.info(f"Tool call: search_knowledge_base with query: {args.get('query')} served by the prefetch.")
+    return {"result": result}
+
+
+def after_agent(callback_context: CallbackContext) -> None:
+    """Counts a prefetch the turn never used as wasted."""
+    prefetcher.discard(callback_context.invocation_id)
+    return None
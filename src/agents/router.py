@@ -0,0 +1,336 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.genai import types
+from src.agents.prompts import CONVERSATIONAL, EXTRACTOR, GENERAL, PERSONAS, SUMMARIZER
+from src.search.field_store import FieldStore
+from src.shared.embeddings import MEDICAL_SYNONYMS, tokenize
+from src.shared.freshness import last_ingestion_time
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+CHITCHAT = "chitchat"
+LOOKUP = "lookup"
+AGGREGATE = "aggregate"
+GENERATE = "generate"
+
+_STATE_PERSONA = "temp:router_persona"
+
+# Longer messages classified as small talk are treated as real questions, to be safe.
+_MAX_SMALL_TALK_TOKENS = 3
+
+_CHITCHAT_REPLIES = [
+    (re.compile(r"^\s*(hi|hello|hey|good (morning|afternoon|evening))\b[\s!.]*$", re.I),
+     "Hello! Ask me anything about the patient records, e.g. \"What medication is Jessica Woodward on?\""),
+    (re.compile(r"^\s*(thanks|thank you|thx|cheers)\b.*$", re.I), "You're welcome!"),
+    (re.compile(r"^\s*(bye|goodbye|see you)\b.*$", re.I), "Goodbye!"),
+    (re.compile(r"^\s*(who|what) are you\b.*$", re.I),
+     "I am an assistant that answers questions about the indexed patient medical records."),
+]
+
+# Labelled seed questions for the intent classifier.
+_SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("hi there", CHITCHAT), ("hello how are you", CHITCHAT), ("thanks a lot", CHITCHAT),
+    ("good morning", CHITCHAT), ("what can you do", CHITCHAT), ("ok great", CHITCHAT),
+    ("what medication is the patient on", LOOKUP), ("what meds was she prescribed", LOOKUP),
+    ("what is the blood pressure", LOOKUP), ("what was the heart rate", LOOKUP),
+    ("what is the temperature", LOOKUP), ("what are the vitals", LOOKUP),
+    ("what is the diagnosis", LOOKUP), ("who is the provider", LOOKUP),
+    ("what was the date of the visit", LOOKUP), ("what symptoms did the patient report", LOOKUP),
+    ("what is the dosage of the medication", LOOKUP), ("what was the pain level", LOOKUP),
+    ("what is the primary complaint", LOOKUP), ("when did the symptoms start", LOOKUP),
+    ("when should the patient follow up", LOOKUP), ("what is the follow up plan", LOOKUP),
+    ("what differential diagnoses were considered", LOOKUP),
+    ("summarize the record", SUMMARIZER), ("give me an overview of the patient", SUMMARIZER),
+    ("summary of the encounter", SUMMARIZER), ("brief history of the patient", SUMMARIZER),
+    ("what happened during the visit", SUMMARIZER), ("recap the case", SUMMARIZER),
+    ("why was the medication prescribed", GENERAL), ("explain the treatment plan", GENERAL),
+    ("what could cause these symptoms", GENERAL), ("compare the two patients", GENERAL),
+    ("how should the condition be managed", GENERAL), ("is the treatment appropriate", GENERAL),
+    ("which patients have hypertension", GENERAL), ("what are the possible causes considered", GENERAL),
+]
+
+# Questions asking for reasoning rather than a recorded value always go to the model;
+# "how many" and "how much" ask for a count.
+_REASONING_PATTERN = re.compile(
+    r"\b(why|how(?!\s+(?:many|much)\b)|explain|compare|appropriate|should i|should we)\b", re.I
+)
+
+# Numeric conditions in aggregate questions, e.g. "How many patients have a heart rate above 90?"
+_CONDITION_PATTERN = re.compile(
+    r"\b(heart rate|hr|pulse|temperature|temp|systolic|diastolic|blood pressure|bp|pain(?: level| score)?)"
+    r"(?:\s+(?:is|was|of))?\s*"
+    r"(>=|<=|>|<|=|at least|at most|above|over|greater than|more than|higher than|below|under|less than|lower than)"
+    r"\s*(\d+(?:\.\d+)?)",
+    re.I,
+)
+_CONDITION_FIELDS = {
+    "heart rate": "heart_rate", "hr": "heart_rate", "pulse": "heart_rate",
+    "temperature": "temperature_f", "temp": "temperature_f",
+    "systolic": "bp_systolic", "blood pressure": "bp_systolic", "bp": "bp_systolic",
+    "diastolic": "bp_diastolic",
+    "pain": "pain_score", "pain level": "pain_score", "pain score": "pain_score",
+}
+_CONDITION_OPERATORS = {
+    "at least": ">=", "at most": "<=",
+    "above": ">", "over": ">", "greater than": ">", "more than": ">", "higher than": ">",
+    "below": "<", "under": "<", "less than": "<", "lower than": "<",
+}
+_COUNT_PATTERN = re.compile(r"\b(how many|number of|count)\b", re.I)
+# Maximum number of matching records listed in an aggregate answer.
+_MAX_LISTED_RECORDS = 20
+
+# Question terms (after synonym normalization) that map to fields of the field store.
+_FIELD_TERMS: Dict[str, List[str]] = {
+    "medication": ["medication"],
+    "pressure": ["bp_systolic"],
+    "heart": ["heart_rate"],
+    "temperature": ["temperature_f"],
+    "vitals": ["bp_systolic", "heart_rate", "temperature_f"],
+    "vital": ["bp_systolic", "heart_rate", "temperature_f"],
+    "diagnosis": ["diagnosis"],
+    "assessment": ["diagnosis"],
+    "differential": ["differential"],
+    "besides": ["differential"],
+    "causes": ["diagnosis", "differential"],
+    "provider": ["provider"],
+    "date": ["date"],
+    "symptom": ["symptom"],
+    "begin": ["onset"],
+    "began": ["onset"],
+    "start": ["onset"],
+    "started": ["onset"],
+    "level": ["pain_score"],
+    "scale": ["pain_score"],
+    "follow": ["follow_up"],
+}
+
+_FIELD_LABELS = {
+    "medication": "Medication",
+    "bp_systolic": "Blood pressure",
+    "bp_diastolic": "Diastolic blood pressure",
+    "heart_rate": "Heart rate",
+    "temperature_f": "Temperature",
+    "diagnosis": "Diagnosis",
+    "differential": "Differential diagnosis",
+    "provider": "Provider",
+    "date": "Date",
+    "symptom": "Presenting complaint",
+    "onset": "Onset",
+    "pain_score": "Pain level",
+    "follow_up": "Follow-up",
+}
+
+
+def _format_field(record: dict, field: str) -> Optional[str]:
+    if field == "bp_systolic":
+        if "bp_systolic" not in record:
+            return None
+        if "bp_diastolic" not in record:
+            return f"{record['bp_systolic']} mmHg systolic"
+        return f"{record['bp_systolic']}/{record['bp_diastolic']} mmHg"
+    if field not in record:
+        return None
+    if field == "heart_rate":
+        return f"{record[field]} bpm"
+    if field == "temperature_f":
+        return f"{record[field]}F"
+    if field == "pain_score":
+        return f"{record[field]}/10"
+    return str(record[field])
+
+
+def _normalized_tokens(text: str) -> List[str]:
+    return [MEDICAL_SYNONYMS.get(t, t) for t in tokenize(text)]
+
+
+class IntentClassifier:
+    """
+    A small multinomial Naive Bayes classifier over normalized question tokens,
+    trained on a handful of seed examples. Classifying a question takes microseconds.
+    """
+    def __init__(self, examples: List[Tuple[str, str]] = _SEED_EXAMPLES):
+        self._token_counts: Dict[str, Counter] = defaultdict(Counter)
+        label_counts: Counter = Counter()
+        for text, label in examples:
+            label_counts[label] += 1
+            self._token_counts[label].update(_normalized_tokens(text))
+        total = sum(label_counts.values())
+        self._priors = {label: math.log(count / total) for label, count in label_counts.items()}
+        self._totals = {label: sum(counts.values()) for label, counts in self._token_counts.items()}
+        self._vocabulary = len({t for counts in self._token_counts.values() for t in counts})
+
+    def classify(self, text: str) -> str:
+        tokens = _normalized_tokens(text)
+        best_label, best_score = GENERAL, -math.inf
+        for label, prior in self._priors.items():
+            counts, total = self._token_counts[label], self._totals[label]
+            score = prior + sum(math.log((counts[t] + 1) / (total + self._vocabulary)) for t in tokens)
+            if score > best_score:
+                best_label, best_score = label, score
+        return best_label
+
+
+@dataclass
+class Route:
+    """
+    The routing decision for a question: `kind` is CHITCHAT, LOOKUP or AGGREGATE when `answer`
+    holds a ready reply, or GENERATE when the agent should run with `persona`.
+    """
+    kind: str
+    persona: str = GENERAL
+    answer: Optional[str] = None
+
+
+class QueryRouter:
+    """
+    Cheap local routing stage in front of the agent.
+
+    1. Common chit-chat is answered with a canned reply, skipping retrieval and the
+       model; other small talk goes to the model without retrieval.
+    2. Structured lookups about a known patient (vitals, medication, diagnosis, ...) and
+       aggregate questions over numeric fields ("How many patients have HR > 90?") are
+       answered directly from the local field store; an aggregate question naming
+       patients only counts their records.
+    3. Everything else goes to the agent with the persona chosen by the classifier;
+       questions asking why/how always use the general persona, even over numeric
+       conditions.
+    """
+    def __init__(self, field_store_path: Optional[str] = None, classifier: Optional[IntentClassifier] = None):
+        self.field_store_path = field_store_path or os.getenv("FIELD_STORE_PATH", "data/processed/fields.npz")
+        self.classifier = classifier or IntentClassifier()
+        self._lock = threading.Lock()
+        self._field_store: Optional[FieldStore] = None
+        self._store_loaded_at = -1.0
+
+    @property
+    def field_store(self) -> Optional[FieldStore]:
+        """The field store, (re)loaded lazily whenever a newer ingestion has completed."""
+        with self._lock:
+            ingested_at = last_ingestion_time()
+            if ingested_at > self._store_loaded_at:
+                self._field_store = FieldStore.load(self.field_store_path)
+                self._store_loaded_at = ingested_at
+            return self._field_store
+
+    def _aggregate(self, question: str) -> Optional[str]:
+        conditions = []
+        for name, operator, value in _CONDITION_PATTERN.findall(question):
+            field = _CONDITION_FIELDS[name.lower()]
+            conditions.append((field, _CONDITION_OPERATORS.get(operator.lower(), operator), float(value)))
+        store = self.field_store
+        if not conditions or store is None:
+            return None
+
+        rows, total, scope = store.where(*conditions), len(store), ""
+        # A question naming patients is answered over their records only.
+        named = store.find_patients(question)
+        if named:
+            own = np.concatenate([store.rows_for(patient) for patient in named])
+            rows, total, scope = rows[np.isin(rows, own)], len(own), f" of {', '.join(named)}"
+        description = " and ".join(f"{_FIELD_LABELS[f].lower()} {op} {v:g}" for f, op, v in conditions)
+        if _COUNT_PATTERN.search(question):
+            patients = len(set(store.column("patient")[rows].tolist()))
+            return f"{len(rows)} of {total} records{scope} ({patients} patients) have {description}."
+        if len(rows) == 0:
+            return f"No records{scope} have {description}."
+        lines = [f"{len(rows)} records{scope} have {description}:"]
+        for record in store.records(rows)[:_MAX_LISTED_RECORDS]:
+            values = ", ".join(v for v in (_format_field(record, f) for f, _, _ in conditions) if v is not None)
+            lines.append(f"- {record.get('patient', 'Unknown')} ({record.get('date', 'undated')}, {record['source_file']}): {values}")
+        if len(rows) > _MAX_LISTED_RECORDS:
+            lines.append(f"... and {len(rows) - _MAX_LISTED_RECORDS} more.")
+        return "\n".join(lines)
+
+    def _lookup(self, question: str) -> Optional[str]:
+        store = self.field_store
+        if store is None:
+            return None
+        fields = []
+        for token in _normalized_tokens(question):
+            for field in _FIELD_TERMS.get(token, []):
+                if field not in fields:
+                    fields.append(field)
+        patients = store.find_patients(question)
+        if not fields or len(patients) != 1:
+            return None
+        records = store.records_for(patients[0])
+        if not records:
+            return None
+
+        lines = []
+        for record in records:
+            values = [(field, _format_field(record, field)) for field in fields]
+            if any(value is None for _, value in values):
+                return None
+            details = "; ".join(f"{_FIELD_LABELS[field]}: {value}" for field, value in values)
+            lines.append(f"{record['patient']} ({record.get('date', 'undated')}, {record['source_file']}): {details}.")
+        return "\n".join(lines)
+
+    def route(self, question: str) -> Route:
+        for pattern, reply in _CHITCHAT_REPLIES:
+            if pattern.match(question):
+                return Route(kind=CHITCHAT, answer=reply)
+
+        if _REASONING_PATTERN.search(question):
+            return Route(kind=GENERATE, persona=GENERAL)
+        answer = self._aggregate(question)
+        if answer:
+            return Route(kind=AGGREGATE, answer=answer)
+        intent = self.classifier.classify(question)
+        if intent == LOOKUP:
+            answer = self._lookup(question)
+            if answer:
+                return Route(kind=LOOKUP, answer=answer)
+            return Route(kind=GENERATE, persona=EXTRACTOR)
+        if intent == SUMMARIZER:
+            return Route(kind=GENERATE, persona=SUMMARIZER)
+        if intent == CHITCHAT and len(tokenize(question)) <= _MAX_SMALL_TALK_TOKENS:
+            return Route(kind=GENERATE, persona=CONVERSATIONAL)
+        return Route(kind=GENERATE, persona=GENERAL)
+
+
+router = QueryRouter()
+
+
+def before_agent(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Routes the turn; answers it directly when neither retrieval nor generation is needed."""
+    content = callback_context.user_content
+    question = "".join(p.text for p in content.parts if p.text).strip() if content and content.parts else ""
+    if not question:
+        return None
+    decision = router.route(question)
+    metrics.counter(f"router_{decision.kind}_total").inc()
+    logger.info(f"Routed '{question}' to {decision.kind} (persona: {decision.persona}).")
+    if decision.answer is not None:
+        return types.Content(role="model", parts=[types.Part(text=decision.answer)])
+    callback_context.state[_STATE_PERSONA] = decision.persona
+    return None
+
+
+def instruction(context: ReadonlyContext) -> str:
+    """Returns the instruction of the persona selected by the router for this turn."""
+    return PERSONAS[context.state.get(_STATE_PERSONA, GENERAL)]
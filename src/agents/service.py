@@ -0,0 +1,229 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from src.agents.adk_agent import agent_config, app_name, memory_enabled
+from src.agents.memory import memory_policy
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+
+class OverloadedError(Exception):
+    """Raised when a request is rejected because the service is at capacity."""
+
+
+@dataclass
+class TurnEvent:
+    """
+    One observable step of a turn.
+
+    `kind` is "text" for reply text (`text` holds the new fragment), "tool_start" when
+    the agent calls a tool and "tool_end" when the tool returns (`duration` holds the
+    tool's run time). `elapsed` is the time in seconds since the turn started.
+    """
+    kind: str
+    elapsed: float
+    text: str = ""
+    tool: str = ""
+    duration: float = 0.0
+
+
+class AgentService:
+    """
+    Runs the ADK agent for many concurrent users within one process.
+
+    All sessions share a single runner, session service and the warm search clients
+    behind the agent's tools. At most `max_concurrency` turns run at once; up to
+    `max_pending` further turns wait for a slot, and anything beyond that is rejected
+    with `OverloadedError` so callers can shed load instead of queueing without bound.
+
+    Turns of the same session run one at a time, in arrival order: each turn reads the
+    history left by the previous one, and compacting a session replaces it, which must
+    not happen while another turn appends to it.
+    """
+    def __init__(
+        self,
+        agent: Agent = agent_config,
+        max_concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.app_name = app_name
+        self.max_concurrency = max_concurrency or int(os.getenv("AGENT_MAX_CONCURRENCY", "32"))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("AGENT_MAX_PENDING", "256"))
+        self.session_service = InMemorySessionService()
+        self.runner = Runner(agent=agent, app_name=self.app_name, session_service=self.session_service)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._admitted = 0
+        # The lock of each session with a turn running or waiting, and the number of such turns.
+        self._session_locks: Dict[Tuple[str, str], List] = {}
+
+    @property
+    def admitted(self) -> int:
+        """The number of turns currently running or waiting for a slot."""
+        return self._admitted
+
+    def at_capacity(self) -> bool:
+        """Whether a new turn would currently be rejected."""
+        return self._admitted >= self.max_concurrency + self.max_pending
+
+    def _admit(self):
+        if self.at_capacity():
+            metrics.counter("agent_rejected_total").inc()
+            raise OverloadedError("Too many concurrent requests.")
+        self._admitted += 1
+        metrics.gauge("agent_admitted").set(self._admitted)
+
+    def _release(self):
+        self._admitted -= 1
+        metrics.gauge("agent_admitted").set(self._admitted)
+
+    @asynccontextmanager
+    async def _session_lock(self, user_id: str, session_id: str):
+        """Serializes the turns of a session. Locks are dropped once no turn needs them."""
+        key = (user_id, session_id)
+        entry = self._session_locks.get(key)
+        if entry is None:
+            entry = self._session_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._session_locks[key]
+
+    async def create_session(self, user_id: str, session_id: Optional[str] = None) -> str:
+        session = await self.session_service.create_session(
+            app_name=self.app_name, user_id=user_id, session_id=session_id or uuid.uuid4().hex
+        )
+        metrics.counter("agent_sessions_created_total").inc()
+        return session.id
+
+    async def delete_session(self, user_id: str, session_id: str):
+        async with self._session_lock(user_id, session_id):
+            await self.session_service.delete_session(app_name=self.app_name, user_id=user_id, session_id=session_id)
+
+    async def _ensure_session(self, user_id: str, session_id: str):
+        session = await self.session_service.get_session(
+            app_name=self.app_name, user_id=user_id, session_id=session_id
+        )
+        if session is None:
+            await self.create_session(user_id, session_id)
+
+    async def _compact_session(self, user_id: str, session_id: str):
+        session = await self.session_service.get_session(
+            app_name=self.app_name, user_id=user_id, session_id=session_id
+        )
+        if session is not None:
+            await memory_policy.compact_session(self.session_service, session)
+
+    async def stream_events(self, user_id: str, session_id: str, message: str) -> AsyncIterator[TurnEvent]:
+        """
+        Runs one conversational turn and yields its reply text and tool calls as they happen.
+
+        Time-to-first-token, tool durations and the total turn latency are recorded in
+        the `agent_ttft_seconds`, `agent_tool_seconds` and `agent_turn_seconds` metrics.
+        After the turn, a session whose history has outgrown the memory budget is
+        compacted (see `memory.py`). Turns of the same session are serialized.
+
+        Args:
+            user_id (str): The caller's user ID.
+            session_id (str): The session to continue; created if it does not exist.
+            message (str): The user's message.
+
+        Raises:
+            OverloadedError: If the service is at capacity.
+        """
+        self._admit()
+        try:
+            # The session lock is taken first, so that a turn waiting for its session holds no slot.
+            async with self._session_lock(user_id, session_id), self._semaphore:
+                metrics.gauge("agent_inflight").inc()
+                started = time.perf_counter()
+                first_token_at: Optional[float] = None
+                tool_started: Dict[str, float] = {}
+                try:
+                    await self._ensure_session(user_id, session_id)
+                    metrics.counter("agent_turns_total").inc()
+                    # With SSE streaming the model's text arrives as partial events followed by
+                    # one aggregated event; only the aggregate is emitted for non-streamed replies.
+                    streamed = False
+                    async for event in self.runner.run_async(
+                        user_id=user_id,
+                        session_id=session_id,
+                        new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+                        run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+                    ):
+                        now = time.perf_counter()
+                        for call in event.get_function_calls():
+                            tool_started[call.id or call.name] = now
+                            yield TurnEvent(kind="tool_start", elapsed=now - started, tool=call.name)
+                        for response in event.get_function_responses():
+                            duration = now - tool_started.pop(response.id or response.name, now)
+                            metrics.histogram("agent_tool_seconds").observe(duration)
+                            yield TurnEvent(kind="tool_end", elapsed=now - started, tool=response.name, duration=duration)
+
+                        if not event.content or not event.content.parts:
+                            continue
+                        text = "".join(part.text for part in event.content.parts if part.text)
+                        if event.partial:
+                            if not text:
+                                continue
+                            streamed = True
+                        elif streamed:
+                            streamed = False
+                            continue
+                        elif not text:
+                            continue
+
+                        if first_token_at is None:
+                            first_token_at = now
+                            metrics.histogram("agent_ttft_seconds").observe(now - started)
+                        yield TurnEvent(kind="text", elapsed=now - started, text=text)
+
+                    if memory_enabled:
+                        await self._compact_session(user_id, session_id)
+                except Exception:
+                    metrics.counter("agent_turn_errors_total").inc()
+                    raise
+                finally:
+                    metrics.gauge("agent_inflight").dec()
+                    metrics.histogram("agent_turn_seconds").observe(time.perf_counter() - started)
+        finally:
+            self._release()
+
+    async def stream_reply(self, user_id: str, session_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Runs one conversational turn and yields the reply text as it is generated.
+
+        Raises:
+            OverloadedError: If the service is at capacity.
+        """
+        async for event in self.stream_events(user_id, session_id, message):
+            if event.kind == "text":
+                yield event.text
@@ -11,18 +11,53 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from src.search.vertex_client import VertexSearchClient
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from src.search.filters import SearchFilters
+from src.search.backend import get_search_backend
 from src.shared.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-search_client = VertexSearchClient()
+search_client = get_search_backend()
+# Searches are blocking RPCs; they run here so that the event loop keeps serving other turns.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_TOOL_WORKERS", "32")), thread_name_prefix="search-tool"
+)
 
-def search_knowledge_base(query: str) -> str:
+async def search_knowledge_base(
+    query: str,
+    patient: str = "",
+    source_file: str = "",
+    date_from: str = "",
+    date_to: str = "",
+    document_type: str = "",
+) -> str:
     """Searches the knowledge base to find information to answer user questions.
 
+    Use the optional filters to narrow the search whenever the question is about a
+    specific patient, file or time period. Leave a filter empty to not apply it.
+
     Args:
         query: A detailed search query crafted from the user's question.
+        patient: Full name of the patient the question is about, e.g. "Jessica Woodward".
+        source_file: Exact file name of a record, e.g. "medical_record_Jessica_Woodward_0.pdf".
+        date_from: Earliest encounter date to include, formatted YYYY-MM-DD.
+        date_to: Latest encounter date to include, formatted YYYY-MM-DD.
+        document_type: Type of record, e.g. "encounter_note".
     """
-    logger.info(f"Tool call: search_knowledge_base with query: {query}")
-    return search_client.search(query)
+    filters = SearchFilters(
+        patient=patient or None,
+        source_file=source_file or None,
+        date_from=date_from or None,
+        date_to=date_to or None,
+        document_type=document_type or None,
+    )
+    logger.info(f"Tool call: search_knowledge_base with query: {query}, filters: {filters}")
+    return await asyncio.get_running_loop().run_in_executor(_executor, search_client.search, query, filters)
+
+
+def shutdown():
+    """Waits for the searches in flight and stops the tool's threads, at the end of a run."""
+    _executor.shutdown(wait=True)
@@ -0,0 +1,106 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import inspect
+import json
+import os
+from typing import Any, Dict, Optional
+from src.agents.prompts import PERSONAS
+from src.shared.freshness import last_ingestion_time
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Settings that change what the agent retrieves or how a turn is answered.
+AGENT_SETTINGS = (
+    "SEARCH_BACKEND",
+    "SEARCH_TARGETS",
+    "DATA_STORE_ID",
+    "ENGINE_ID",
+    "DOCSTORE_PATH",
+    "ROUTER_ENABLED",
+    "ANSWER_CACHE_ENABLED",
+    "MEMORY_ENABLED",
+    "SEARCH_PREFETCH",
+    "SEARCH_RERANKER",
+    "SEARCH_RERANK_CANDIDATES",
+)
+
+
+def content_hash(*parts: Any) -> str:
+    """Returns the SHA-256 of the parts, serialized as canonical JSON."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def agent_fingerprint(agent: Any) -> str:
+    """
+    Hashes everything that determines the agent's answer to a question: the model, the
+    instruction (all personas when it is chosen per turn), the tools' names, signatures
+    and docstrings, the generation config, the retrieval settings and the time of the
+    last ingestion, so that re-indexed data invalidates cached answers as well.
+    """
+    model = agent.model if isinstance(agent.model, str) else getattr(agent.model, "model", repr(agent.model))
+    instruction = agent.instruction if isinstance(agent.instruction, str) else PERSONAS
+    tools = [
+        {"name": getattr(t, "__name__", getattr(t, "name", repr(t))),
+         "signature": str(inspect.signature(t)) if callable(t) else "",
+         "doc": inspect.getdoc(t) or getattr(t, "description", "")}
+        for t in agent.tools
+    ]
+    config = agent.generate_content_config.model_dump(exclude_none=True) if agent.generate_content_config else {}
+    settings = {name: os.getenv(name) for name in AGENT_SETTINGS}
+    return content_hash(model, instruction, tools, config, settings, last_ingestion_time())
+
+
+class EvalCache:
+    """
+    Content-addressed store of agent responses and metric scores.
+
+    A response is stored under the hash of the question and the agent fingerprint; the
+    scores of a metric under the hash of that response key, the response text, the row
+    being scored and the metric name. Changing the prompt therefore regenerates every
+    response, while editing one dataset row only recomputes that row. Entries are JSON
+    files sharded by the first two hex digits of their key, like the OCR cache.
+    """
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("EVAL_CACHE_DIR", "data/processed/eval_cache")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring corrupt evaluation cache entry {key}.")
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def response_key(question: str, fingerprint: str) -> str:
+        return content_hash("response", question, fingerprint)
+
+    @staticmethod
+    def score_key(response_key: str, response: str, row: Dict[str, Any], metric: str) -> str:
+        return content_hash("score", response_key, response, row, metric)
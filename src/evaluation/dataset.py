@@ -0,0 +1,257 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import json
+import os
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from src.shared.logger import setup_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet datasets are an optional extra: `poetry install --extras dataset`.
+    pa = None
+    pq = None
+
+logger = setup_logger(__name__)
+
+QUESTIONS_FILE = "questions.parquet"
+CONTEXTS_FILE = "contexts.parquet"
+# The column joining a question to the text of the record it was generated from: a hash
+# of the text, so that two versions of a record under the same file name are both kept.
+CONTEXT_ID = "context_id"
+CONTEXT = "context"
+
+# Rows per Parquet row group. Contexts are sorted by id, so a lookup of a few
+# contexts only reads the row groups whose min/max statistics can contain them.
+_QUESTION_ROW_GROUP = 65536
+_CONTEXT_ROW_GROUP = 256
+_CONVERT_BATCH = 10000
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet golden datasets: `poetry install --extras dataset`.")
+
+
+class GoldenDataset:
+    """
+    The golden dataset of evaluation questions, stored normalized and columnar.
+
+    A dataset is a directory of two Parquet files: `questions.parquet` with one row per
+    question (question, reference_answer, source_file, context_id and any extra columns)
+    and `contexts.parquet` with the text of each source record (context_id, source_file,
+    context), stored once however many questions were generated from it. Questions are
+    read column by column, so loading only the questions of 100k rows touches a few
+    megabytes; contexts are read only for the rows that are used.
+
+    The legacy JSONL format, with the context repeated on every row, can be opened too; it
+    is read into memory and needs no pyarrow.
+    """
+    def __init__(self, path: str, questions: Optional[List[Dict[str, Any]]] = None,
+                 contexts: Optional[Dict[str, str]] = None):
+        self.path = path
+        # Only set for datasets held in memory (legacy JSONL).
+        self._questions = questions
+        self._contexts = contexts
+
+    @classmethod
+    def open(cls, path: str) -> "GoldenDataset":
+        """
+        Opens a Parquet dataset directory or a legacy JSONL file. If `path` does not exist
+        but `<path>.jsonl` does, the JSONL file is opened instead.
+
+        Raises:
+            FileNotFoundError: If neither exists.
+            ImportError: If the dataset is Parquet and pyarrow is not installed.
+        """
+        if os.path.isdir(path):
+            _require_pyarrow()
+            return cls(path)
+        if not os.path.exists(path) and os.path.exists(f"{path}.jsonl"):
+            path = f"{path}.jsonl"
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Golden dataset not found: {path}")
+        questions, contexts = [], {}
+        for row in _read_jsonl(path):
+            question, context = _split(row)
+            questions.append(question)
+            if context is not None:
+                contexts[question[CONTEXT_ID]] = context
+        return cls(path, questions, contexts)
+
+    @property
+    def _questions_path(self) -> str:
+        return os.path.join(self.path, QUESTIONS_FILE)
+
+    @property
+    def _contexts_path(self) -> str:
+        return os.path.join(self.path, CONTEXTS_FILE)
+
+    def __len__(self) -> int:
+        if self._questions is not None:
+            return len(self._questions)
+        # Read from the file footer; no data pages are loaded.
+        return pq.ParquetFile(self._questions_path).metadata.num_rows
+
+    def questions(self, columns: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+                  sample: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+        """
+        Loads questions without their contexts.
+
+        Args:
+            columns (Optional[Sequence[str]]): The columns to load (all by default).
+            limit (Optional[int]): Load only the first `limit` questions.
+            sample (Optional[int]): Load `sample` questions drawn uniformly at random, in
+                dataset order. Applied after `limit`.
+            seed (int): The seed of the sample, so that runs compare the same questions.
+        """
+        if self._questions is not None:
+            rows = self._questions[:limit] if limit else self._questions
+            if sample is not None and sample < len(rows):
+                rows = [rows[i] for i in sorted(random.Random(seed).sample(range(len(rows)), sample))]
+            return [{k: v for k, v in row.items() if columns is None or k in columns} for row in rows]
+
+        parquet = pq.ParquetFile(self._questions_path)
+        columns = list(columns) if columns is not None else None
+        if limit and limit < parquet.metadata.num_rows:
+            batches, remaining = [], limit
+            for batch in parquet.iter_batches(batch_size=min(limit, _QUESTION_ROW_GROUP), columns=columns):
+                batches.append(batch.slice(0, remaining))
+                remaining -= batches[-1].num_rows
+                if remaining <= 0:
+                    break
+            table = pa.Table.from_batches(batches)
+        else:
+            table = parquet.read(columns=columns)
+        if sample is not None and sample < table.num_rows:
+            table = table.take(sorted(random.Random(seed).sample(range(table.num_rows), sample)))
+        return table.to_pylist()
+
+    def contexts(self, context_ids: Iterable[str]) -> Dict[str, str]:
+        """Loads the contexts with the given ids."""
+        wanted = sorted({i for i in context_ids if i is not None})
+        if self._contexts is not None:
+            return {i: self._contexts[i] for i in wanted if i in self._contexts}
+        if not wanted or not os.path.exists(self._contexts_path):
+            return {}
+        table = pq.read_table(self._contexts_path, columns=[CONTEXT_ID, CONTEXT], filters=[(CONTEXT_ID, "in", wanted)])
+        return dict(zip(table.column(CONTEXT_ID).to_pylist(), table.column(CONTEXT).to_pylist()))
+
+    def rows(self, limit: Optional[int] = None, sample: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+        """
+        Loads questions with their `context` column joined back in, the row format of the
+        legacy JSONL file and of the evaluation service. Arguments are as for `questions`.
+        """
+        questions = self.questions(limit=limit, sample=sample, seed=seed)
+        contexts = self.contexts(q.get(CONTEXT_ID) for q in questions)
+        return [{CONTEXT: contexts.get(q.get(CONTEXT_ID)), **{k: v for k, v in q.items() if k != CONTEXT_ID}}
+                for q in questions]
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _split(row: Dict[str, Any]):
+    """Separates a denormalized row into its question, referencing the context by id, and its context."""
+    question = {k: v for k, v in row.items() if k != CONTEXT}
+    context = row.get(CONTEXT)
+    question[CONTEXT_ID] = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16] if context is not None else None
+    return question, context
+
+
+def write_dataset(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Writes denormalized rows (with a `context` column, as produced by the generator or
+    found in the legacy JSONL file) as a normalized Parquet dataset. Rows are written in
+    batches, so the input can be streamed; each distinct context is kept in memory once.
+
+    Args:
+        path (str): The dataset directory, created if needed. Existing files are replaced.
+        rows (Iterable[Dict[str, Any]]): The rows to write.
+
+    Returns:
+        int: The number of questions written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    _require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    contexts: Dict[str, tuple] = {}
+    writer, batch, count = None, [], 0
+    questions_path = os.path.join(path, QUESTIONS_FILE)
+    tmp_path = f"{questions_path}.tmp"
+    try:
+        for row in rows:
+            question, context = _split(row)
+            if context is not None:
+                contexts.setdefault(question[CONTEXT_ID], (question.get("source_file"), context))
+            batch.append(question)
+            if len(batch) >= _CONVERT_BATCH:
+                writer = _write_questions(writer, tmp_path, batch)
+                count, batch = count + len(batch), []
+        if batch or writer is None:
+            writer = _write_questions(writer, tmp_path, batch)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, questions_path)
+
+    ids = sorted(contexts)
+    table = pa.table({
+        CONTEXT_ID: ids,
+        "source_file": [contexts[i][0] for i in ids],
+        CONTEXT: [contexts[i][1] for i in ids],
+    })
+    pq.write_table(table, os.path.join(path, CONTEXTS_FILE), row_group_size=_CONTEXT_ROW_GROUP, compression="zstd")
+    logger.info(f"Wrote {count} questions and {len(ids)} contexts to {path}.")
+    return count
+
+
+def _write_questions(writer, path: str, batch: List[Dict[str, Any]]):
+    table = pa.Table.from_pylist(batch) if batch else pa.table({"question": pa.array([], pa.string())})
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+    else:
+        # The first batch sets the schema: missing columns are filled with nulls and
+        # columns that only appear in later batches are dropped.
+        schema = writer.schema
+        table = pa.Table.from_arrays(
+            [table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+             for f in schema],
+            schema=schema,
+        )
+    writer.write_table(table, row_group_size=_QUESTION_ROW_GROUP)
+    return writer
+
+
+def convert_jsonl(jsonl_path: str, path: str) -> int:
+    """Converts a legacy JSONL golden dataset to a Parquet dataset, streaming its rows."""
+    return write_dataset(path, _read_jsonl(jsonl_path))
+
+
+def export_jsonl(dataset: GoldenDataset, jsonl_path: str) -> int:
+    """Writes a dataset back to the denormalized JSONL format. Returns the number of rows."""
+    rows = dataset.rows()
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return len(rows)
@@ -0,0 +1,255 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from google.api_core import exceptions as google_exceptions
+from google.cloud import discoveryengine_v1 as discoveryengine
+from src.search.local_client import LocalSearchClient
+from src.shared.logger import setup_logger
+from src.shared.metrics import percentile
+
+logger = setup_logger(__name__)
+
+# Interval at which the event loop is sampled for scheduling lag.
+_LAG_SAMPLE_SECONDS = 0.05
+
+
+class FakeSearchService:
+    """
+    Local stand-in for the Discovery Engine `SearchServiceClient`, installed with
+    `ClientRegistry.override(SEARCH, ...)` so that the real search code path runs
+    without any remote call or quota.
+
+    Each call blocks for a log-normally distributed latency (median `latency_ms`, spread
+    `latency_sigma`) and fails with `ServiceUnavailable` with probability `error_rate`.
+    Results are real `SearchResponse` messages ranked with BM25 over the local document
+    store when one is available, and empty otherwise.
+    """
+    def __init__(self, latency_ms: float = 150.0, latency_sigma: float = 0.5, error_rate: float = 0.0,
+                 corpus: Optional[LocalSearchClient] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.corpus = corpus
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.injected_errors = 0
+
+    def serving_config_path(self, project: str, location: str, data_store: str, serving_config: str) -> str:
+        return discoveryengine.SearchServiceClient.serving_config_path(project, location, data_store, serving_config)
+
+    def _draw(self) -> tuple:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms * math.exp(self._random.gauss(0.0, self.latency_sigma)) / 1000.0
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        return delay, fail
+
+    def search(self, request: discoveryengine.SearchRequest, timeout: Optional[float] = None,
+               **kwargs) -> discoveryengine.SearchResponse:
+        delay, fail = self._draw()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded(f"Fake search exceeded its {timeout:.2f}s deadline.")
+        time.sleep(delay)
+        if fail:
+            raise google_exceptions.ServiceUnavailable("Injected failure from the fake search service.")
+
+        hits = self.corpus.retrieve(request.query, top_k=request.page_size or 10) if self.corpus else []
+        return discoveryengine.SearchResponse(results=[
+            discoveryengine.SearchResponse.SearchResult(
+                id=hit.doc_id,
+                document=discoveryengine.Document(
+                    id=hit.doc_id,
+                    struct_data={"source_file": hit.source_file},
+                    derived_struct_data={
+                        "link": f"gs://fake-bucket/{hit.source_file}",
+                        "snippets": [{"snippet": s} for s in hit.snippets],
+                    },
+                ),
+            )
+            for hit in hits
+        ])
+
+
+@dataclass
+class LoadReport:
+    """The measurements of a load test run."""
+    target: str
+    rate: float
+    duration: float
+    sent: int = 0
+    completed: int = 0
+    rejected: int = 0
+    errors: Counter = field(default_factory=Counter)
+    latencies: List[float] = field(default_factory=list)
+    first_token_latencies: List[float] = field(default_factory=list)
+    loop_lags: List[float] = field(default_factory=list)
+    peak_inflight: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(values: List[float]) -> Dict[str, float]:
+            return {
+                "p50": percentile(values, 50) * 1000.0,
+                "p95": percentile(values, 95) * 1000.0,
+                "p99": percentile(values, 99) * 1000.0,
+                "max": max(values, default=0.0) * 1000.0,
+            }
+
+        failed = sum(self.errors.values())
+        result = {
+            "target": self.target,
+            "arrival_rate": self.rate,
+            "duration_seconds": self.duration,
+            "elapsed_seconds": self.elapsed,
+            "sent": self.sent,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "errors": failed,
+            "errors_by_type": dict(self.errors),
+            "error_rate": (failed + self.rejected) / self.sent if self.sent else 0.0,
+            "throughput": self.completed / self.elapsed if self.elapsed > 0 else 0.0,
+            "peak_inflight": self.peak_inflight,
+            "latency_ms": ms(self.latencies),
+            "event_loop_lag_ms": ms(self.loop_lags),
+        }
+        if self.first_token_latencies:
+            result["ttft_ms"] = ms(self.first_token_latencies)
+        return result
+
+
+async def _monitor_loop_lag(report: LoadReport, stop: asyncio.Event):
+    # A sleep that wakes up late means the loop was busy: the overshoot is the lag any
+    # coroutine ready at that moment would have suffered.
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(_LAG_SAMPLE_SECONDS)
+        report.loop_lags.append(max(0.0, time.perf_counter() - started - _LAG_SAMPLE_SECONDS))
+
+
+async def run_load(
+    target: str,
+    request: Callable[[str], Awaitable[Optional[float]]],
+    questions: List[str],
+    rate: float,
+    duration: float,
+    seed: Optional[int] = None,
+    is_rejection: Callable[[Exception], bool] = lambda e: False,
+) -> LoadReport:
+    """
+    Drives `request` with an open-loop Poisson arrival process.
+
+    Arrivals do not wait for earlier requests to finish, so the offered load stays at
+    `rate` whatever the latency of the system under test, as with real users.
+
+    Args:
+        target (str): A name for the system under test, recorded in the report.
+        request (Callable[[str], Awaitable[Optional[float]]]): Sends one question; may
+            return the time to first token in seconds.
+        questions (List[str]): The question mix, sampled uniformly with replacement.
+        rate (float): The mean arrival rate, in requests per second.
+        duration (float): How long to keep sending requests, in seconds.
+        seed (Optional[int]): Seed for the arrivals and question sampling.
+        is_rejection (Callable[[Exception], bool]): Tells load shedding apart from errors.
+    """
+    rng = random.Random(seed)
+    report = LoadReport(target=target, rate=rate, duration=duration)
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(report, stop))
+    inflight = 0
+
+    async def send(question: str):
+        nonlocal inflight
+        inflight += 1
+        report.peak_inflight = max(report.peak_inflight, inflight)
+        started = time.perf_counter()
+        try:
+            first_token = await request(question)
+            report.latencies.append(time.perf_counter() - started)
+            if first_token is not None:
+                report.first_token_latencies.append(first_token)
+            report.completed += 1
+        except Exception as e:
+            if is_rejection(e):
+                report.rejected += 1
+            else:
+                report.errors[type(e).__name__] += 1
+        finally:
+            inflight -= 1
+
+    started = time.perf_counter()
+    tasks = []
+    next_arrival = started
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - started >= duration:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        report.sent += 1
+        tasks.append(asyncio.create_task(send(rng.choice(questions))))
+
+    await asyncio.gather(*tasks)
+    report.elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    logger.info(f"Load test of '{target}' finished: {report.completed}/{report.sent} requests completed.")
+    return report
+
+
+def tool_request() -> Callable[[str], Awaitable[None]]:
+    """
+    Returns a request function awaiting the `search_knowledge_base` tool exactly as the
+    agent does: the blocking search runs on the tool's pool of `SEARCH_TOOL_WORKERS`
+    threads, so the event loop lag measured is the one the server has.
+    """
+    from src.agents.tools import search_knowledge_base
+
+    async def request(question: str) -> None:
+        result = await search_knowledge_base(question)
+        if result.startswith("Error retrieving documents"):
+            raise RuntimeError(result)
+
+    return request
+
+
+def agent_request(service: Any) -> Callable[[str], Awaitable[float]]:
+    """
+    Returns a request function running one full agent turn through an `AgentService`,
+    each in a new session. Returns the time to first token.
+    """
+    async def request(question: str) -> float:
+        user_id = f"load-{uuid.uuid4().hex[:8]}"
+        session_id = await service.create_session(user_id)
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async for event in service.stream_events(user_id, session_id, question):
+                if event.kind == "text" and first_token is None:
+                    first_token = time.perf_counter() - started
+        finally:
+            await service.delete_session(user_id, session_id)
+        return first_token if first_token is not None else time.perf_counter() - started
+
+    return request
@@ -0,0 +1,153 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+from src.evaluation.dataset import GoldenDataset
+from src.search.backend import SearchBackend, SearchHit
+from src.shared.logger import setup_logger
+from src.shared.metrics import percentile
+
+logger = setup_logger(__name__)
+
+DEFAULT_KS = (1, 3, 5, 10)
+DEFAULT_CONCURRENCY_LEVELS = (1, 4, 16)
+
+
+@dataclass
+class RetrievalCase:
+    """A golden question and the file it was generated from."""
+    question: str
+    source_file: str
+
+
+@dataclass
+class QueryResult:
+    case: RetrievalCase
+    latency: float
+    ranked_files: List[str]
+    error: Optional[str] = None
+
+
+def load_cases(path: str, limit: Optional[int] = None) -> List[RetrievalCase]:
+    """
+    Loads the questions of the golden dataset that have a `source_file`. Contexts are
+    not read.
+
+    Args:
+        path (str): The golden dataset directory or legacy JSONL file.
+        limit (Optional[int]): The maximum number of cases to load.
+
+    Raises:
+        FileNotFoundError: If the dataset does not exist.
+    """
+    entries = GoldenDataset.open(path).questions(columns=["question", "source_file"])
+    cases = [RetrievalCase(e["question"], e["source_file"]) for e in entries if e.get("question") and e.get("source_file")]
+    return cases[:limit] if limit is not None else cases
+
+
+def ranked_files(hits: List[SearchHit]) -> List[str]:
+    """The distinct source files of the hits, in rank order."""
+    return list(dict.fromkeys(hit.source_file for hit in hits))
+
+
+def recall_at_k(ranked: List[str], expected: str, k: int) -> float:
+    return 1.0 if expected in ranked[:k] else 0.0
+
+
+def reciprocal_rank(ranked: List[str], expected: str) -> float:
+    return 1.0 / (ranked.index(expected) + 1) if expected in ranked else 0.0
+
+
+def _run_query(backend: SearchBackend, case: RetrievalCase, top_k: int) -> QueryResult:
+    start = time.perf_counter()
+    try:
+        hits = backend.retrieve(case.question, top_k=top_k)
+        return QueryResult(case, time.perf_counter() - start, ranked_files(hits))
+    except Exception as e:
+        return QueryResult(case, time.perf_counter() - start, [], error=str(e))
+
+
+def run_level(backend: SearchBackend, cases: List[RetrievalCase], concurrency: int,
+              ks: Sequence[int] = DEFAULT_KS, top_k: int = 10) -> Dict[str, Any]:
+    """
+    Replays every case through the backend with `concurrency` queries in flight.
+
+    Returns:
+        Dict[str, Any]: Quality metrics (recall@k, MRR, over all cases, failed queries
+        counting as misses), latency percentiles in milliseconds and throughput.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda case: _run_query(backend, case, top_k), cases))
+    elapsed = time.perf_counter() - start
+
+    latencies = [r.latency * 1000.0 for r in results if r.error is None]
+    errors = [r for r in results if r.error is not None]
+    for result in errors[:3]:
+        logger.warning(f"Query '{result.case.question[:50]}' failed: {result.error}")
+
+    count = len(results) or 1
+    return {
+        "concurrency": concurrency,
+        "queries": len(results),
+        "errors": len(errors),
+        "recall": {
+            f"@{k}": sum(recall_at_k(r.ranked_files, r.case.source_file, k) for r in results) / count
+            for k in ks
+        },
+        "mrr": sum(reciprocal_rank(r.ranked_files, r.case.source_file) for r in results) / count,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        },
+        "qps": len(results) / elapsed if elapsed > 0 else 0.0,
+        "elapsed_seconds": elapsed,
+    }
+
+
+def run_benchmark(backend: SearchBackend, cases: List[RetrievalCase], ks: Sequence[int] = DEFAULT_KS,
+                  concurrency_levels: Sequence[int] = DEFAULT_CONCURRENCY_LEVELS,
+                  top_k: Optional[int] = None, warmup: int = 3) -> Dict[str, Any]:
+    """
+    Runs the retrieval benchmark at each concurrency level.
+
+    Args:
+        backend (SearchBackend): The search backend under test.
+        cases (List[RetrievalCase]): The golden questions.
+        ks (Sequence[int]): The cutoffs at which recall is computed.
+        concurrency_levels (Sequence[int]): The numbers of queries in flight to measure.
+        top_k (Optional[int]): The number of documents requested per query (the largest k by default).
+        warmup (int): The number of queries sent before measuring, to establish connections.
+
+    Returns:
+        Dict[str, Any]: One result per concurrency level, under "levels".
+    """
+    top_k = top_k or max(ks)
+    for case in cases[:warmup]:
+        _run_query(backend, case, top_k)
+
+    levels = []
+    for concurrency in concurrency_levels:
+        logger.info(f"Benchmarking {len(cases)} queries at concurrency {concurrency}...")
+        level = run_level(backend, cases, concurrency, ks, top_k)
+        logger.info(
+            f"Concurrency {concurrency}: MRR {level['mrr']:.3f}, p95 {level['latency_ms']['p95']:.1f} ms, "
+            f"{level['qps']:.1f} QPS, {level['errors']} errors."
+        )
+        levels.append(level)
+    return {"cases": len(cases), "top_k": top_k, "ks": list(ks), "levels": levels}
@@ -11,7 +11,10 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import List
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 from src.shared.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -68,3 +71,81 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100) -> List[st
 
     logger.info(f"Chunked text into {len(chunks)} segments with chunk_size={chunk_size} and overlap={overlap}.")
     return chunks
+
+
+# Section headers of clinical notes (SOAP and similar): a line holding only an upper-case
+# title followed by a colon, e.g. "SUBJECTIVE:" or "PLAN:".
+_SECTION_PATTERN = re.compile(r"^[ \t]*([A-Z][A-Z /&-]{2,40}):[ \t]*$", re.MULTILINE)
+
+
+@dataclass
+class Chunk:
+    """
+    A chunk of a document.
+
+    Attributes:
+        text (str): The text of the chunk.
+        offset (int): The character offset of the chunk in the document text.
+        page (Optional[int]): The 1-based page the chunk starts on, for paged documents.
+        section (Optional[str]): The section header the chunk belongs to, e.g. "ASSESSMENT".
+    """
+    text: str
+    offset: int
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+
+def chunk_id(doc_id: str, offset: int) -> str:
+    """The stable id of the chunk of a document starting at `offset`."""
+    return f"{doc_id}-{offset}"
+
+
+def _sections(text: str) -> List[Tuple[int, int, Optional[str]]]:
+    headers = list(_SECTION_PATTERN.finditer(text))
+    spans = []
+    if not headers or headers[0].start() > 0:
+        spans.append((0, headers[0].start() if headers else len(text), None))
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        spans.append((header.start(), end, header.group(1).strip()))
+    return spans
+
+
+def chunk_document(text: str, page_offsets: Optional[List[int]] = None,
+                   chunk_size: int = 1000, overlap: int = 100) -> List[Chunk]:
+    """
+    Splits a document into chunks that never cross a section boundary, anchored to their
+    offset, page and section.
+
+    Sections longer than `chunk_size` are split with `overlap` characters of overlap,
+    preferably at a line break. Offsets only depend on the text, so chunk ids stay stable
+    when the same document is ingested again.
+
+    Args:
+        text (str): The document text.
+        page_offsets (Optional[List[int]]): The offset at which each page starts, as
+            recorded by the parser in `ParseReport.page_offsets`.
+        chunk_size (int): The maximum size of a chunk, in characters.
+        overlap (int): The overlap between consecutive chunks of a section.
+    """
+    overlap = min(overlap, chunk_size // 2)
+    chunks = []
+    for start, end, section in _sections(text):
+        position = start
+        while position < end:
+            stop = min(position + chunk_size, end)
+            if stop < end:
+                # Break at the last line break of the window's second half, if any.
+                newline = text.rfind("\n", position + chunk_size // 2, stop)
+                if newline > position:
+                    stop = newline + 1
+            segment = text[position:stop]
+            stripped = segment.strip()
+            if stripped:
+                offset = position + (len(segment) - len(segment.lstrip()))
+                page = bisect_right(page_offsets, offset) if page_offsets else None
+                chunks.append(Chunk(stripped, offset, page or None, section))
+            if stop >= end:
+                break
+            position = max(stop - overlap, position + 1)
+    return chunks
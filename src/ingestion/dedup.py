@@ -0,0 +1,240 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard similarity are likely to share a bucket.
+LSH_BANDS = 16
+# Maximum number of candidates fetched per LSH bucket, to bound the work on very common templates.
+_MAX_BUCKET_CANDIDATES = 50
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Fixed permutations, so that signatures stay comparable across runs.
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+@dataclass
+class Fingerprint:
+    """
+    Attributes:
+        exact_hash (str): SHA-256 of the normalized text (lowercased words).
+        signature (np.ndarray): The MinHash signature of the text's word shingles.
+        tokens (int): The number of words in the text.
+    """
+    exact_hash: str
+    signature: np.ndarray
+    tokens: int
+
+
+class Fingerprinter:
+    """
+    Computes the fingerprint of a text fed block by block, in constant memory.
+    Blocks may split words; the normalized text does not depend on block boundaries.
+    """
+    def __init__(self):
+        self._digest = hashlib.sha256()
+        self._signature = np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+        self._window: List[str] = []
+        self._carry = ""
+        self._tokens = 0
+
+    def update(self, block: str):
+        text = self._carry + block.lower()
+        tokens = _TOKEN_PATTERN.findall(text)
+        # A word at the very end of the block may continue in the next one.
+        self._carry = ""
+        if tokens and text and (text[-1].isalnum() or text[-1] == "_"):
+            self._carry = tokens.pop()
+        self._add(tokens)
+
+    def _add(self, tokens: List[str]):
+        if not tokens:
+            return
+        self._tokens += len(tokens)
+        self._digest.update((" ".join(tokens) + " ").encode("utf-8"))
+        window = self._window + tokens
+        shingles = [" ".join(window[i:i + SHINGLE_SIZE]) for i in range(len(window) - SHINGLE_SIZE + 1)]
+        self._window = window[-(SHINGLE_SIZE - 1):]
+        if shingles:
+            hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+            permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(self._signature, permuted.min(axis=1), out=self._signature)
+
+    def finish(self) -> Fingerprint:
+        if self._carry:
+            self._add([self._carry])
+            self._carry = ""
+        if self._tokens < SHINGLE_SIZE and self._window:
+            # Texts shorter than one shingle are hashed as a single shingle.
+            hashes = np.array([zlib.crc32(" ".join(self._window).encode("utf-8"))], dtype=np.uint64)
+            permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(self._signature, permuted.min(axis=1), out=self._signature)
+        return Fingerprint(self._digest.hexdigest(), self._signature.astype(np.uint32), self._tokens)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(a == b))
+
+
+@dataclass
+class DedupDecision:
+    """
+    The outcome of checking a document: `canonical` is None for a canonical document,
+    otherwise the id of the document it duplicates, with `kind` "exact" or "near".
+    """
+    doc_id: str
+    canonical: Optional[str] = None
+    kind: Optional[str] = None
+    similarity: float = 1.0
+
+
+class Deduplicator:
+    """
+    Ingest-time deduplication backed by a SQLite database, so that memory stays bounded
+    however many documents have been ingested and duplicates are detected across runs.
+
+    Exact duplicates share the hash of their normalized text. Near duplicates are found
+    with MinHash/LSH: candidates sharing an LSH band bucket are verified by the estimated
+    Jaccard similarity of their signatures. Records of different patients or dates are
+    never merged, since templated notes can be very similar.
+    """
+    def __init__(self, db_path: Optional[str] = None, threshold: Optional[float] = None):
+        self.db_path = db_path or os.getenv("DEDUP_DB_PATH", "data/processed/dedup.sqlite")
+        self.threshold = threshold if threshold is not None else float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # The connection is used by the dedup stage thread of the ingestion pipeline.
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                exact_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                patient TEXT,
+                date TEXT,
+                struct_data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_exact_hash ON documents (exact_hash);
+            CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, doc_id TEXT);
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc_id);
+            CREATE TABLE IF NOT EXISTS aliases (canonical TEXT, alias TEXT, PRIMARY KEY (canonical, alias));
+        """)
+
+    @staticmethod
+    def _band_buckets(signature: np.ndarray) -> List[int]:
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        return [
+            int.from_bytes(hashlib.blake2b(signature[i * rows:(i + 1) * rows].tobytes(), digest_size=7).digest(), "big")
+            for i in range(LSH_BANDS)
+        ]
+
+    @staticmethod
+    def _compatible(candidate_patient: Optional[str], candidate_date: Optional[str], struct_data: dict) -> bool:
+        for stored, value in ((candidate_patient, struct_data.get("patient")), (candidate_date, struct_data.get("date"))):
+            if stored and value and stored.lower() != value.lower():
+                return False
+        return True
+
+    def check(self, doc_id: str, fingerprint: Fingerprint, struct_data: dict) -> DedupDecision:
+        """
+        Checks a document against every document seen so far, and registers it as
+        canonical if it is not a duplicate. A document re-ingested under the same id
+        replaces its previous fingerprint. A canonical that then fails to be ingested is
+        unregistered with `forget`.
+        """
+        row = self._db.execute(
+            "SELECT doc_id FROM documents WHERE exact_hash = ? AND doc_id != ? LIMIT 1",
+            (fingerprint.exact_hash, doc_id),
+        ).fetchone()
+        if row:
+            return DedupDecision(doc_id, canonical=row[0], kind="exact")
+
+        buckets = self._band_buckets(fingerprint.signature)
+        best: Optional[DedupDecision] = None
+        seen = set()
+        for band, bucket in enumerate(buckets):
+            candidates = self._db.execute(
+                "SELECT d.doc_id, d.signature, d.patient, d.date FROM buckets b JOIN documents d ON d.doc_id = b.doc_id "
+                "WHERE b.band = ? AND b.bucket = ? AND b.doc_id != ? LIMIT ?",
+                (band, bucket, doc_id, _MAX_BUCKET_CANDIDATES),
+            ).fetchall()
+            for candidate, signature, patient, date in candidates:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                score = similarity(fingerprint.signature, np.frombuffer(signature, dtype=np.uint32))
+                if score >= self.threshold and self._compatible(patient, date, struct_data):
+                    if best is None or score > best.similarity:
+                        best = DedupDecision(doc_id, canonical=candidate, kind="near", similarity=score)
+        if best:
+            return best
+
+        with self._db:
+            self._db.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, fingerprint.exact_hash, fingerprint.signature.tobytes(),
+                 struct_data.get("patient"), struct_data.get("date"), json.dumps(struct_data)),
+            )
+            self._db.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?)",
+                [(band, bucket, doc_id) for band, bucket in enumerate(buckets)],
+            )
+        return DedupDecision(doc_id)
+
+    def forget(self, doc_id: str, aliases: List[str] = ()):
+        """
+        Unregisters a canonical document that did not reach the index (e.g. its upload
+        failed), with the given aliases, so that none of them is skipped as its duplicate
+        when they are ingested again.
+        """
+        with self._db:
+            self._db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            self._db.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+            self._db.executemany("DELETE FROM aliases WHERE canonical = ? AND alias = ?",
+                                 [(doc_id, alias) for alias in aliases])
+
+    def add_alias(self, canonical: str, alias: str):
+        with self._db:
+            self._db.execute("INSERT OR IGNORE INTO aliases VALUES (?, ?)", (canonical, alias))
+
+    def aliases(self, canonical: str) -> List[str]:
+        rows = self._db.execute("SELECT alias FROM aliases WHERE canonical = ? ORDER BY alias", (canonical,))
+        return [alias for (alias,) in rows]
+
+    def struct_data(self, doc_id: str) -> Optional[dict]:
+        """Returns the `structData` a canonical document was registered with."""
+        row = self._db.execute("SELECT struct_data FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self._db.close()
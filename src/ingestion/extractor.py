@@ -0,0 +1,103 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import re
+from typing import Dict, Union
+
+_HEADER_FIELDS = {
+    "patient": re.compile(r"^\s*Patient:\s*(.+?)\s*$", re.MULTILINE),
+    "date": re.compile(r"^\s*Date:\s*(\d{4}-\d{2}-\d{2})\s*$", re.MULTILINE),
+    "provider": re.compile(r"^\s*Provider:\s*(.+?)\s*$", re.MULTILINE),
+}
+
+_DOCUMENT_TYPES = {
+    "PATIENT ENCOUNTER NOTE": "encounter_note",
+}
+
+# Clinical fields of the SOAP-format encounter notes, matched on whitespace-normalized text.
+_CLINICAL_FIELDS = {
+    "symptom": re.compile(r"complaining of (.+?) which started"),
+    "onset": re.compile(r"which started (.+?)\. They"),
+    "pain_score": re.compile(r"discomfort as a (\d+)/10"),
+    "vitals": re.compile(r"BP (\d+)/(\d+), HR (\d+), Temp ([\d.]+)F"),
+    "diagnosis": re.compile(r"consistent with (.+?)\. Differential"),
+    "differential": re.compile(r"Differential diagnosis includes (.+?)\. PLAN"),
+    "medication": re.compile(r"Start (.+?) once daily"),
+    "follow_up": re.compile(r"\d\. (Follow up .+?)\."),
+}
+
+# Generated records are named `medical_record_<First>_<Last>_<n>.pdf`.
+_FILE_NAME_PATTERN = re.compile(r"^medical_record_(.+)_\d+$")
+
+
+def extract_record_metadata(text: str, file_name: str) -> Dict[str, str]:
+    """
+    Extracts filterable metadata (patient, date, provider, document type) from a record.
+
+    Header fields are read from the document text; the patient name falls back to the
+    file naming convention when the text does not contain one.
+
+    Args:
+        text (str): The parsed document text. May be empty.
+        file_name (str): The base name of the source file.
+
+    Returns:
+        Dict[str, str]: The metadata fields that could be extracted.
+    """
+    metadata: Dict[str, str] = {}
+    for field, pattern in _HEADER_FIELDS.items():
+        match = pattern.search(text)
+        if match:
+            metadata[field] = match.group(1)
+
+    if "patient" not in metadata:
+        match = _FILE_NAME_PATTERN.match(os.path.splitext(file_name)[0])
+        if match:
+            metadata["patient"] = match.group(1).replace("_", " ")
+
+    for marker, document_type in _DOCUMENT_TYPES.items():
+        if marker in text:
+            metadata["document_type"] = document_type
+            break
+
+    return metadata
+
+
+def extract_record_fields(text: str) -> Dict[str, Union[str, int, float]]:
+    """
+    Extracts the clinical fields of a SOAP-format encounter note.
+
+    Args:
+        text (str): The parsed document text.
+
+    Returns:
+        Dict[str, Union[str, int, float]]: The fields that could be extracted. Vitals are
+        returned as numbers (`bp_systolic`, `bp_diastolic`, `heart_rate`, `temperature_f`).
+    """
+    flat = " ".join(text.split())
+    fields: Dict[str, Union[str, int, float]] = {}
+    for field, pattern in _CLINICAL_FIELDS.items():
+        match = pattern.search(flat)
+        if not match:
+            continue
+        if field == "vitals":
+            fields["bp_systolic"] = int(match.group(1))
+            fields["bp_diastolic"] = int(match.group(2))
+            fields["heart_rate"] = int(match.group(3))
+            fields["temperature_f"] = float(match.group(4))
+        elif field == "pain_score":
+            fields[field] = int(match.group(1))
+        else:
+            fields[field] = match.group(1)
+    return fields
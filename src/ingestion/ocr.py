@@ -0,0 +1,181 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import atexit
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import List, Optional
+from src.shared.logger import setup_logger
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # OCR is an optional extra: `poetry install --extras ocr`.
+    pytesseract = None
+    Image = None
+
+logger = setup_logger(__name__)
+
+# Pages with less extracted text than this are considered scanned.
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "32"))
+OCR_PAGE_TIMEOUT_SECONDS = float(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", "30"))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "data/processed/ocr_cache")
+# Extra time allowed for a worker to start and return before a page is given up on.
+_RESULT_GRACE_SECONDS = 5.0
+# How often a page still queued for a worker is checked for having started.
+_QUEUED_POLL_SECONDS = 0.5
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_warned_unavailable = False
+
+
+def ocr_enabled() -> bool:
+    """Returns whether OCR is enabled and the OCR engine is installed."""
+    global _warned_unavailable
+    if os.getenv("OCR_ENABLED", "true").lower() != "true":
+        return False
+    if pytesseract is None:
+        if not _warned_unavailable:
+            logger.warning("pytesseract is not installed; scanned pages will not be OCRed.")
+            _warned_unavailable = True
+        return False
+    return True
+
+
+def is_low_text(text: str) -> bool:
+    """
+    Cheap page triage: only pages with (almost) no extractable text are candidates for OCR.
+    """
+    return len(text.strip()) < OCR_MIN_PAGE_CHARS
+
+
+def page_hash(images: List[bytes]) -> str:
+    digest = hashlib.sha256()
+    for data in images:
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def _read_cache(key: str) -> Optional[str]:
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cache(key: str, text: str):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _ocr_images(images: List[bytes], timeout: float) -> str:
+    # Runs in a worker process. The page deadline starts here, when the job runs, and
+    # Tesseract is killed once the time left for the page has passed.
+    deadline = time.monotonic() + timeout
+    texts = []
+    for data in images:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"page not done after {timeout}s")
+        with Image.open(io.BytesIO(data)) as image:
+            try:
+                texts.append(pytesseract.image_to_string(image, timeout=remaining))
+            except RuntimeError as e:
+                if "timeout" in str(e).lower():
+                    raise TimeoutError(f"page not done after {timeout}s") from e
+                raise
+    return "\n".join(t.strip() for t in texts if t.strip())
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("OCR_WORKERS", "0")) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(_pool.shutdown, cancel_futures=True)
+        return _pool
+
+
+class PendingPage:
+    """
+    An OCR request for one page, served from the cache or computed in the worker pool.
+    `fallback_text` is the text extracted without OCR, used if OCR fails.
+    """
+    def __init__(self, page_number: int, images: List[bytes], fallback_text: str = ""):
+        self.page_number = page_number
+        self.fallback_text = fallback_text
+        self._key = page_hash(images)
+        self._text = _read_cache(self._key)
+        self._future: Optional[Future] = None
+        if self._text is None:
+            self._future = _get_pool().submit(_ocr_images, images, OCR_PAGE_TIMEOUT_SECONDS)
+
+    def done(self) -> bool:
+        return self._future is None or self._future.done()
+
+    def _wait(self) -> bool:
+        """
+        Waits for the OCR job, however long it stays queued behind other pages. The worker
+        enforces the page timeout itself; once the job has been handed to a worker, it is
+        given up on only if the worker does not answer within that timeout, twice over
+        since a job is handed out while the job before it may still be running.
+        """
+        deadline = None
+        while not self._future.done():
+            if deadline is None and self._future.running():
+                deadline = time.monotonic() + 2 * OCR_PAGE_TIMEOUT_SECONDS + _RESULT_GRACE_SECONDS
+            remaining = _QUEUED_POLL_SECONDS if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            wait_futures([self._future], timeout=remaining)
+        return True
+
+    def result(self) -> Optional[str]:
+        """
+        Returns the OCR text of the page, or None if OCR failed or timed out.
+        """
+        if self._future is None:
+            return self._text
+        try:
+            if not self._wait():
+                raise TimeoutError()
+            text = self._future.result()
+        except TimeoutError:
+            self._future.cancel()
+            logger.warning(f"OCR of page {self.page_number} timed out after {OCR_PAGE_TIMEOUT_SECONDS}s.")
+            return None
+        except Exception as e:
+            logger.warning(f"OCR of page {self.page_number} failed: {e}")
+            return None
+        finally:
+            self._future = None
+        _write_cache(self._key, text)
+        self._text = text
+        return text
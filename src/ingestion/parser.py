@@ -11,11 +11,182 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import csv
+import mimetypes
+import os
+import zipfile
+from collections import deque
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
 import pypdf
+from src.ingestion import ocr
 from src.shared.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Size of the blocks read from text-based files.
+_READ_BLOCK_SIZE = 64 * 1024
+# Number of CSV rows rendered per yielded text block.
+CSV_BATCH_ROWS = 1000
+
+_DOCX_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@dataclass
+class ParseReport:
+    """
+    Per-document details recorded by a parser while it streams a file.
+
+    Attributes:
+        pages (int): The number of pages read (paged formats only).
+        rows (int): The number of data rows read (tabular formats only).
+        ocr_pages (List[int]): The 1-based numbers of the pages whose text comes from OCR.
+        page_offsets (List[int]): The character offset in the document text at which each
+            page starts (paged formats only).
+    """
+    pages: int = 0
+    rows: int = 0
+    ocr_pages: List[int] = field(default_factory=list)
+    page_offsets: List[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Parser:
+    """
+    A registered parser.
+
+    Attributes:
+        name (str): A short name for logs.
+        extensions (Tuple[str, ...]): The lowercase file extensions handled, including the dot.
+        mime_types (Tuple[str, ...]): The mime types handled.
+        import_mime_type (str): The `mimeType` the document is imported into the data store with.
+        stream (Callable[[str, ParseReport], Iterator[str]]): Yields the text of a file in
+            blocks, so that large files are never held in memory as a whole, and records
+            per-document details in the report.
+    """
+    name: str
+    extensions: Tuple[str, ...]
+    mime_types: Tuple[str, ...]
+    import_mime_type: str
+    stream: Callable[[str, ParseReport], Iterator[str]]
+
+
+_BY_EXTENSION: Dict[str, Parser] = {}
+_BY_MIME_TYPE: Dict[str, Parser] = {}
+
+
+def register_parser(name: str, extensions: Tuple[str, ...], mime_types: Tuple[str, ...], import_mime_type: Optional[str] = None):
+    """
+    Registers a streaming parser function for the given extensions and mime types.
+    Use as a decorator; a later registration for the same extension replaces the earlier one.
+    """
+    def decorator(stream: Callable[[str, ParseReport], Iterator[str]]) -> Callable[[str, ParseReport], Iterator[str]]:
+        parser = Parser(name, extensions, mime_types, import_mime_type or mime_types[0], stream)
+        for extension in extensions:
+            _BY_EXTENSION[extension.lower()] = parser
+        for mime_type in mime_types:
+            _BY_MIME_TYPE[mime_type] = parser
+        return stream
+    return decorator
+
+
+def get_parser(file_path: str, mime_type: Optional[str] = None) -> Optional[Parser]:
+    """
+    Returns the parser for a file, selected by its mime type if given, then by its
+    extension, then by the mime type guessed from its name.
+    """
+    if mime_type and mime_type in _BY_MIME_TYPE:
+        return _BY_MIME_TYPE[mime_type]
+    parser = _BY_EXTENSION.get(os.path.splitext(file_path)[1].lower())
+    if parser:
+        return parser
+    guessed, _ = mimetypes.guess_type(file_path)
+    return _BY_MIME_TYPE.get(guessed) if guessed else None
+
+
+def supported_extensions() -> List[str]:
+    return sorted(_BY_EXTENSION)
+
+
+def iter_text(file_path: str, report: Optional[ParseReport] = None) -> Iterator[str]:
+    """
+    Yields the text of a file in blocks, using the registered parser.
+
+    Args:
+        file_path (str): The path to the file.
+        report (Optional[ParseReport]): Filled with per-document details while streaming.
+
+    Raises:
+        ValueError: If no parser is registered for the file type.
+    """
+    parser = get_parser(file_path)
+    if parser is None:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return parser.stream(file_path, report if report is not None else ParseReport())
+
+
+def parse_file(file_path: str) -> str:
+    """
+    Extracts the full text of a file with the registered parser. Prefer `iter_text` for
+    files that may be large.
+    """
+    text = "".join(iter_text(file_path))
+    logger.info(f"Successfully parsed {file_path}")
+    return text
+
+
+def _page_images(page: pypdf.PageObject, number: int) -> List[bytes]:
+    try:
+        return [image.data for image in page.images]
+    except Exception as e:
+        logger.warning(f"Could not extract the images of page {number}: {e}")
+        return []
+
+
+@register_parser("pdf", (".pdf",), ("application/pdf",))
+def stream_pdf(file_path: str, report: ParseReport) -> Iterator[str]:
+    """
+    Yields the text of a PDF file page by page.
+
+    Text-native pages are extracted directly. Pages with embedded images but (almost) no
+    text are scanned pages: their images are OCRed in a worker pool while the following
+    pages are read, and their text is yielded in page order once available.
+    """
+    reader = pypdf.PdfReader(file_path)
+    use_ocr = ocr.ocr_enabled()
+    # Pages read ahead of the next page to yield: extracted text, or a pending OCR request.
+    pending: deque = deque()
+    max_pending = 2 * (os.cpu_count() or 1)
+    position = 0
+
+    def resolve(item) -> str:
+        nonlocal position
+        if isinstance(item, str):
+            text = item
+        else:
+            text = item.result()
+            if text is None:
+                text = item.fallback_text
+            else:
+                report.ocr_pages.append(item.page_number)
+                text += "\n"
+        report.page_offsets.append(position)
+        position += len(text)
+        return text
+
+    for number, page in enumerate(reader.pages, start=1):
+        report.pages += 1
+        text = page.extract_text() + "\n"
+        images = _page_images(page, number) if use_ocr and ocr.is_low_text(text) else []
+        pending.append(ocr.PendingPage(number, images, fallback_text=text) if images else text)
+        while pending and (isinstance(pending[0], str) or pending[0].done() or len(pending) > max_pending):
+            yield resolve(pending.popleft())
+    while pending:
+        yield resolve(pending.popleft())
+
+
 def parse_pdf(file_path: str) -> str:
     """
     Extracts text from a PDF file.
@@ -27,47 +198,130 @@ def parse_pdf(file_path: str) -> str:
         str: A single string containing the full document text.
     """
     try:
-        reader = pypdf.PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
+        report = ParseReport()
+        text = "".join(stream_pdf(file_path, report))
         logger.info(f"Successfully parsed PDF: {file_path}")
-        # TODO: HACKATHON CHALLENGE (Optional, but good for completeness)
-        # If you want to handle scanned PDFs (images of text), you would integrate an OCR (Optical Character Recognition)
-        # library here, such as Google Cloud Vision AI or Tesseract. This is not a core requirement for the hackathon,
-        # but a valuable extension for real-world unstructured data.
+        if report.ocr_pages:
+            logger.info(f"OCRed {len(report.ocr_pages)} of {report.pages} pages: {report.ocr_pages}")
         return text
     except Exception as e:
         logger.error(f"Error parsing PDF {file_path}: {e}")
         raise
 
+@register_parser("text", (".txt", ".md"), ("text/plain", "text/markdown"), import_mime_type="text/plain")
+def stream_text(file_path: str, report: ParseReport) -> Iterator[str]:
+    """Yields the content of a plain text file in fixed-size blocks."""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(_READ_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+# Vertex AI Search does not accept CSV as unstructured content, so CSV files are
+# imported as plain text.
+@register_parser("csv", (".csv",), ("text/csv",), import_mime_type="text/plain")
+def stream_csv(file_path: str, report: ParseReport) -> Iterator[str]:
+    """
+    Yields the rows of a CSV file in batches of `CSV_BATCH_ROWS`, rendered as
+    `column: value` lines. Rows are read one at a time, so the file is never loaded whole.
+    """
+    with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        batch = []
+        for row in reader:
+            report.rows += 1
+            batch.append("; ".join(f"{column}: {value}" for column, value in zip(header, row) if value))
+            if len(batch) >= CSV_BATCH_ROWS:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document as it is fed."""
+    _SKIPPED_TAGS = {"script", "style", "noscript", "template", "head"}
+    _BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth and data.strip():
+            self.parts.append(data)
+
+    def drain(self) -> str:
+        text, self.parts = "".join(self.parts), []
+        return text
+
+
+@register_parser("html", (".html", ".htm"), ("text/html",))
+def stream_html(file_path: str, report: ParseReport) -> Iterator[str]:
+    """Parses an HTML file incrementally and yields its visible text as it is read."""
+    extractor = _HTMLTextExtractor()
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(_READ_BLOCK_SIZE)
+            if not block:
+                break
+            extractor.feed(block)
+            text = extractor.drain()
+            if text:
+                yield text
+    extractor.close()
+    text = extractor.drain()
+    if text:
+        yield text
+
+
+@register_parser(
+    "docx", (".docx",), ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",)
+)
+def stream_docx(file_path: str, report: ParseReport) -> Iterator[str]:
+    """
+    Yields the paragraphs of a Word document. The document XML is read from the archive
+    with an incremental XML parser, and each paragraph is discarded once yielded.
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as document:
+        for _, element in ElementTree.iterparse(document, events=("end",)):
+            if element.tag != f"{_DOCX_NAMESPACE}p":
+                continue
+            text = "".join(node.text or "" for node in element.iter(f"{_DOCX_NAMESPACE}t"))
+            element.clear()
+            yield text + "\n"
+
+
 def parse_other_format(file_path: str) -> str:
     """
-    Placeholder for parsing other document formats.
+    Parses any non-PDF document format registered in the parser registry
+    (plain text, CSV, HTML, DOCX).
 
     Args:
         file_path (str): The absolute path to the file.
 
     Returns:
         str: The extracted text content.
+
+    Raises:
+        ValueError: If no parser is registered for the file type.
     """
-    # =================================================================================================
-    # TODO: HACKATHON CHALLENGE (Pillar 2: Extensibility)
-    #
-    # This function is a placeholder. Your challenge is to implement logic to parse at least one
-    # new file format (e.g., .txt, .csv, .docx, .html) beyond PDFs.
-    #
-    # REQUIREMENTS:
-    #   1. Choose a new file format to support (e.g., plain text, CSV, Word document, HTML).
-    #   2. Implement the necessary code to read the content of that file type and return it as a string.
-    #   3. You may need to install new libraries (e.g., `python-docx` for .docx, `pandas` for .csv).
-    #      Remember to add any new dependencies to `pyproject.toml` and install them with `poetry install`.
-    #   4. Ensure robust error handling for unsupported formats or corrupted files.
-    #
-    # HINT: For simple text files, you can just read the file content directly.
-    #       For CSV, you might read it into a pandas DataFrame and then convert it to a string representation.
-    #       For HTML, you could use BeautifulSoup to extract visible text.
-    #
-    # =================================================================================================
-    logger.warning(f"Parsing for {file_path} is not yet implemented. Returning empty string.")
-    return "" # Placeholder, replace with actual parsing logic
+    return parse_file(file_path)
@@ -11,146 +11,405 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import base64
 import os
 import json
+from collections import Counter, defaultdict
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import List, Optional
+from itertools import chain
 from glob import glob
-import pypdf
-from google.cloud import storage
+from src.shared.clients import get_storage_client
+from src.shared.docstore import DocStore, DocStoreWriter
+from src.shared.freshness import mark_ingestion_complete
 from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
 from src.search.vertex_client import VertexSearchClient
 from src.shared.sanitizer import sanitize_id
-from src.ingestion.parser import parse_pdf, parse_other_format # Import the new parser
+from src.ingestion.chunker import chunk_document, chunk_id
+from src.ingestion.parser import ParseReport, get_parser, iter_text
+from src.ingestion.dedup import Deduplicator, Fingerprinter
+from src.ingestion.extractor import extract_record_fields, extract_record_metadata
+from src.ingestion.stages import Stage, log_stage_stats, run_stages
+from src.ingestion.uploader import SKIPPED, upload_file
+from src.search.field_store import FieldStore
 
 logger = setup_logger(__name__)
+metrics = get_metrics()
 
-def run_ingestion(input_dir: str, output_dir: str):
+# Maximum number of characters of a document kept in memory for metadata extraction.
+MAX_EXTRACTION_CHARS = 1_000_000
+# Chunk-level import: each document is imported as chunks of about CHUNK_SIZE characters.
+CHUNK_IMPORT_ENABLED = os.getenv("CHUNK_IMPORT_ENABLED", "false").lower() == "true"
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+# Worker threads of each pipeline stage, and capacity of the queues between stages.
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", "2"))
+UPLOAD_WORKERS = int(os.getenv("INGEST_UPLOAD_WORKERS", "8"))
+STAGE_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+
+
+@dataclass
+class _IngestItem:
+    """The state of one file as it moves through the ingestion stages."""
+    file_path: str
+    text: str = ""
+    complete: bool = False
+    report: ParseReport = field(default_factory=ParseReport)
+    fingerprinter: Optional[Fingerprinter] = None
+    struct_data: dict = field(default_factory=dict)
+    fields: Optional[dict] = None
+    chunks: Optional[list] = None
+    gcs_uri: str = ""
+    upload_result: str = ""
+
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(self.file_path)
+
+    @property
+    def doc_id(self) -> str:
+        return sanitize_id(os.path.splitext(self.file_name)[0])
+
+    def __repr__(self) -> str:
+        return self.file_name
+
+
+def run_ingestion(input_dir: str, output_dir: str, files: Optional[List[str]] = None) -> List[str]:
     """
     Orchestrates the GCS-based ingestion process for Vertex AI Search.
-    1. Uploads raw PDFs to GCS.
-    2. Creates a metadata JSONL file pointing to the GCS URIs of the PDFs.
-    3. Uploads the metadata file to GCS.
-    4. Triggers the import job in Vertex AI Search.
+
+    Without `files`, every file of `input_dir` is ingested and the local metadata file, field
+    store and document store are rebuilt from them. With `files`, only those files are ingested: their
+    entries are merged into the existing local metadata file and field store, and only
+    they are imported into Vertex AI Search (used by the watch mode, see `watcher.py`).
+
+    1. Runs every file through a staged pipeline whose stages work concurrently, connected
+       by bounded queues (see `stages.py`):
+       -   parse: extracts the text and the dedup fingerprint of the file in one streaming
+           pass, and the filterable fields (patient, date, provider, document type) plus the
+           pages of scanned PDFs whose text was recovered with OCR (`ocr_pages`);
+       -   dedup: skips exact and near duplicates of already ingested documents, writing
+           them to `dedup_report.jsonl`; canonical documents list their duplicates in
+           `structData.aliases`;
+       -   chunk: extracts the structured fields of each record (vitals, diagnosis,
+           medication, ...) and, in chunk mode, splits the text into chunks (documents longer
+           than `MAX_EXTRACTION_CHARS` are read from the file again for this);
+       -   upload: uploads the raw file to GCS, unless an identical object is already there;
+       -   write: records the document's metadata entry and appends its parsed text to the
+           local document store.
+       Per-stage utilization is logged and saved to `ingestion_stats.json`.
+    2. Creates a metadata JSONL file pointing to the GCS URIs of the documents. The same
+       file backs the local metadata index used to pre-filter searches.
+    3. Saves the structured fields to a local columnar field store used to answer lookups
+       and aggregate questions.
+    4. Uploads the metadata file to GCS.
+    5. Triggers the import job in Vertex AI Search.
+
+    With `CHUNK_IMPORT_ENABLED=true`, documents are imported as section-aware chunks instead
+    of whole files. Each chunk has the id `<doc id>-<offset>` and carries its `page` and
+    `section` in `structData`, so that search results point back to the precise passage.
+
+    A file that fails in a stage (e.g. its upload is refused) is left out of the import
+    and returned, so that the caller can retry it; the other files are imported.
+
+    Returns:
+        List[str]: The paths of the files that failed.
+
+    Raises:
+        ValueError: If `GCS_BUCKET_NAME` is not set.
+        Exception: Any error of the upload of the metadata file or of the Vertex AI Search
+            import, so that callers (the watch mode) do not consider the files ingested.
     """
     gcs_bucket_name = os.getenv("GCS_BUCKET_NAME")
     if not gcs_bucket_name:
-        logger.error("GCS_BUCKET_NAME environment variable not set.")
-        return
+        raise ValueError("GCS_BUCKET_NAME environment variable not set.")
 
     os.makedirs(output_dir, exist_ok=True)
     
-    # =================================================================================================
-    # TODO: HACKATHON CHALLENGE (Pillar 2: Extensibility)
-    #
-    # The current pipeline only processes PDF files. Your challenge is to extend it to support
-    # the new file format you implemented in `src/ingestion/parser.py`.
-    #
-    # REQUIREMENTS:
-    #   1. Modify the `glob` pattern below to include your new file type (e.g., "*.pdf", "*.txt").
-    #   2. Implement logic within the loop to detect the file type and call the appropriate
-    #      parser function (`parse_pdf` or `parse_other_format`).
-    #   3. Ensure the `mimeType` in the `metadata_list` entry is correctly set for your new file type.
-    #
-    # HINT: You can use `file_name.lower().endswith(".your_extension")` to check the file type.
-    # =================================================================================================
-    all_files = glob(os.path.join(input_dir, "*.pdf")) # Extend this glob to include your new file type
+    # Every file type with a registered parser is ingested (PDF, text, CSV, HTML, DOCX).
+    incremental = files is not None
+    candidates = files if incremental else glob(os.path.join(input_dir, "*"))
+    all_files = sorted(p for p in candidates if os.path.isfile(p) and get_parser(p))
 
     if not all_files:
         logger.warning(f"No files found in input directory: {input_dir}")
-        return
+        return []
 
-    storage_client = storage.Client()
+    storage_client = get_storage_client()
     bucket = storage_client.bucket(gcs_bucket_name)
-    metadata_list = []
+    field_records = {}
+
+    deduplicator = Deduplicator() if os.getenv("DEDUP_ENABLED", "true").lower() == "true" else None
+    entries_by_id = {}
+    chunks_by_id = {}
+    new_aliases = set()
+    # The documents registered as canonical in this run, and the files skipped as their duplicates.
+    registered = set()
+    skipped_duplicates = defaultdict(list)
+    duplicates = 0
+    canonicals = 0
+    upload_results = Counter()
+    dedup_report_path = os.path.join(output_dir, "dedup_report.jsonl")
+    store_path = os.path.join(output_dir, "docstore")
 
-    logger.info(f"--- Uploading {len(all_files)} files to GCS ---")
-    for file_path in all_files:
+    def parse(item: _IngestItem) -> _IngestItem:
+        # The dedup fingerprint is computed in the same streaming pass as the text.
+        item.fingerprinter = Fingerprinter() if deduplicator else None
         try:
-            file_name = os.path.basename(file_path)
-            gcs_raw_path = f"raw/{file_name}"
-            
-            blob = bucket.blob(gcs_raw_path)
-            blob.upload_from_filename(file_path)
-            gcs_uri = f"gs://{gcs_bucket_name}/{gcs_raw_path}"
-            logger.info(f"Uploaded {file_name} to {gcs_uri}")
-
-            base_name = os.path.splitext(file_name)[0]
-            doc_id = sanitize_id(base_name)
-            
-            # Determine mimeType based on file extension
-            mime_type = "application/pdf" # Default to PDF, update this based on your new file type logic
-            # if file_name.lower().endswith(".txt"):
-            #     mime_type = "text/plain"
-            # elif file_name.lower().endswith(".csv"):
-            #     mime_type = "text/csv"
-
-            metadata_list.append({
-                "id": doc_id,
-                "structData": {"source_file": file_name},
-                "content": {
-                    "mimeType": mime_type,
-                    "uri": gcs_uri
-                }
-            })
+            item.text, item.complete = _read_text(item.file_path, MAX_EXTRACTION_CHARS, item.report, item.fingerprinter)
         except Exception as e:
-            logger.error(f"Failed to upload or process {file_path}: {e}")
-    
+            logger.warning(f"Could not parse {item.file_name} for metadata extraction: {e}")
+        item.struct_data = {"source_file": item.file_name, **extract_record_metadata(item.text, item.file_name)}
+        if item.report.ocr_pages:
+            item.struct_data["ocr_pages"] = item.report.ocr_pages
+        return item
+
+    def dedup(item: _IngestItem) -> Optional[_IngestItem]:
+        # Duplicates are neither uploaded nor imported; they are recorded as aliases of the canonical document.
+        nonlocal duplicates
+        if not item.text:
+            return item
+        decision = deduplicator.check(item.doc_id, item.fingerprinter.finish(), item.struct_data)
+        if not decision.canonical:
+            registered.add(item.doc_id)
+            return item
+        deduplicator.add_alias(decision.canonical, item.file_name)
+        skipped_duplicates[decision.canonical].append(item.file_path)
+        new_aliases.add(decision.canonical)
+        duplicates += 1
+        dedup_report.write(json.dumps({
+            "doc_id": item.doc_id,
+            "source_file": item.file_name,
+            "canonical": decision.canonical,
+            "kind": decision.kind,
+            "similarity": round(decision.similarity, 4),
+        }) + "\n")
+        logger.info(f"Skipping {item.file_name}: {decision.kind} duplicate of {decision.canonical} "
+                    f"(similarity {decision.similarity:.2f}).")
+        return None
+
+    def chunk(item: _IngestItem) -> _IngestItem:
+        if item.text:
+            item.fields = {**item.struct_data, **extract_record_fields(item.text)}
+            if CHUNK_IMPORT_ENABLED:
+                text, page_offsets = item.text, item.report.page_offsets
+                if not item.complete:
+                    # The text kept in memory is truncated; the chunks have to cover the whole document.
+                    report = ParseReport()
+                    text = "".join(iter_text(item.file_path, report))
+                    page_offsets = report.page_offsets
+                    metrics.counter("ingestion_chunk_restreamed_total").inc()
+                    logger.info(f"Chunking {item.file_name} from a second pass over the file "
+                                f"({len(text)} characters, above MAX_EXTRACTION_CHARS).")
+                item.chunks = chunk_document(text, page_offsets, CHUNK_SIZE, CHUNK_OVERLAP)
+        return item
+
+    def upload(item: _IngestItem) -> _IngestItem:
+        gcs_raw_path = f"raw/{item.file_name}"
+        item.upload_result = upload_file(bucket, gcs_raw_path, item.file_path)
+        item.gcs_uri = f"gs://{gcs_bucket_name}/{gcs_raw_path}"
+        if item.upload_result != SKIPPED:
+            logger.info(f"Uploaded {item.file_name} to {item.gcs_uri}")
+        return item
+
+    def write(item: _IngestItem) -> _IngestItem:
+        nonlocal canonicals
+        upload_results[item.upload_result] += 1
+        if item.fields is not None:
+            field_records[item.doc_id] = item.fields
+        if item.chunks is not None:
+            chunks_by_id[item.doc_id] = item.chunks
+        entries_by_id[item.doc_id] = {
+            "id": item.doc_id,
+            "structData": item.struct_data,
+            "content": {
+                "mimeType": get_parser(item.file_path).import_mime_type,
+                "uri": item.gcs_uri
+            }
+        }
+        canonicals += 1
+        # Also keep the parsed text of every document in the local document store. Texts too
+        # large to keep in memory are streamed from the file again.
+        blocks = iter([item.text]) if item.complete else iter_text(item.file_path)
+        first = next((block for block in blocks if block), None)
+        if first is not None:
+            docstore.add(item.doc_id, chain([first], blocks), item.struct_data)
+        item.text = ""
+        return item
+
+    stages = [Stage("parse", parse, workers=PARSE_WORKERS, queue_size=STAGE_QUEUE_SIZE)]
+    if deduplicator:
+        # Decisions are taken in file order, so the same file wins as canonical on every run.
+        stages.append(Stage("dedup", dedup, ordered=True, queue_size=STAGE_QUEUE_SIZE))
+    stages += [
+        Stage("chunk", chunk, workers=CHUNK_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+        Stage("upload", upload, workers=UPLOAD_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+        Stage("write", write, ordered=True, queue_size=STAGE_QUEUE_SIZE),
+    ]
+
+    logger.info(f"--- Ingesting {len(all_files)} files ---")
+    with open(dedup_report_path, "a" if incremental else "w", encoding="utf-8") as dedup_report, DocStoreWriter(store_path, rebuild=not incremental) as docstore:
+        stats = run_stages((_IngestItem(file_path) for file_path in all_files), stages)
+    log_stage_stats(stats)
+    failed_items = [item for s in stats.values() for item, _ in s.failed]
+    failed = [item.file_path for item in failed_items]
+    if deduplicator:
+        # A canonical document that failed after the dedup stage never reached the index:
+        # it is unregistered, and the files skipped as its duplicates are retried with it.
+        for item in failed_items:
+            if item.doc_id in registered:
+                retried = skipped_duplicates.pop(item.doc_id, [])
+                deduplicator.forget(item.doc_id, [os.path.basename(path) for path in retried])
+                new_aliases.discard(item.doc_id)
+                duplicates -= len(retried)
+                failed += retried
+    failed = sorted(failed)
+    if failed:
+        metrics.counter("ingestion_failed_files_total").inc(len(failed))
+        logger.error(f"{len(failed)} file(s) failed and are not imported: {', '.join(map(os.path.basename, failed))}")
+    logger.info("Uploads: " + ", ".join(f"{count} {result}" for result, count in sorted(upload_results.items())) + ".")
+    with open(os.path.join(output_dir, "ingestion_stats.json"), "w", encoding="utf-8") as f:
+        json.dump({name: s.to_dict() for name, s in stats.items()}, f, indent=2)
+
+    if deduplicator:
+        # Canonical documents that gained aliases are (re-)imported with their alias list.
+        for canonical in sorted(new_aliases):
+            entry = entries_by_id.get(canonical)
+            if entry is None:
+                struct_data = deduplicator.struct_data(canonical)
+                entry = entries_by_id[canonical] = {
+                    "id": canonical,
+                    "structData": struct_data,
+                    "content": {
+                        "mimeType": get_parser(struct_data["source_file"]).import_mime_type,
+                        "uri": f"gs://{gcs_bucket_name}/raw/{struct_data['source_file']}"
+                    }
+                }
+            entry["structData"]["aliases"] = deduplicator.aliases(canonical)
+        deduplicator.close()
+        logger.info(f"Deduplication: {canonicals} canonical documents, {duplicates} duplicates skipped. "
+                    f"Report saved to: {dedup_report_path}")
+    metadata_list = list(entries_by_id.values())
+    if CHUNK_IMPORT_ENABLED:
+        metadata_list = _chunk_entries(metadata_list, chunks_by_id, store_path)
+
+    if incremental and not metadata_list:
+        logger.warning("No document of the batch is left to import.")
+        return failed
+
     metadata_file_path = os.path.join(output_dir, "metadata.jsonl")
-    with open(metadata_file_path, "w", encoding="utf-8") as f:
-        for entry in metadata_list:
-            f.write(json.dumps(entry) + "\n")
+    field_store_path = os.path.join(output_dir, "fields.npz")
+    import_file_path = metadata_file_path
+    if incremental:
+        # Only the batch is imported; the local files keep covering the whole corpus.
+        import_file_path = os.path.join(output_dir, "metadata_batch.jsonl")
+        _write_jsonl(import_file_path, metadata_list)
+        metadata_list = _merge_entries(metadata_file_path, metadata_list)
+        existing_fields = FieldStore.load(field_store_path)
+        if existing_fields is not None:
+            field_records = {**existing_fields.to_records(), **field_records}
+    _write_jsonl(metadata_file_path, metadata_list)
     logger.info(f"Metadata file created at: {metadata_file_path}")
 
-    gcs_metadata_path = "metadata/metadata.jsonl"
-    metadata_blob = bucket.blob(gcs_metadata_path)
-    metadata_blob.upload_from_filename(metadata_file_path)
+    FieldStore.from_records(field_records).save(field_store_path)
+
+    gcs_metadata_path = "metadata/metadata_batch.jsonl" if incremental else "metadata/metadata.jsonl"
+    upload_file(bucket, gcs_metadata_path, import_file_path)
     metadata_gcs_uri = f"gs://{gcs_bucket_name}/{gcs_metadata_path}"
     logger.info(f"Uploaded metadata file to {metadata_gcs_uri}")
 
     try:
         vertex_client = VertexSearchClient()
         vertex_client.import_from_gcs(metadata_gcs_uri)
+        # Invalidates answers cached from the previous state of the data store.
+        mark_ingestion_complete()
     except Exception as e:
         logger.error(f"Failed to trigger Vertex AI import: {e}")
+        raise
+    return failed
+
+def _write_jsonl(path: str, entries: list[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
 
-    # Also generate a local processed_data.json for chunking visibility
-    _generate_local_processed_data(all_files, output_dir)
 
-def _generate_local_processed_data(files: list[str], output_dir: str):
+def _merge_entries(path: str, entries: list[dict]) -> list[dict]:
     """
-    Parses files locally and saves the output to a JSON file for inspection.
-    This is a simulation of the chunking that Vertex AI would perform.
+    Merges new metadata entries into those of an existing metadata file. All earlier
+    entries of a re-ingested document, including its chunks, are replaced.
     """
-    logger.info("--- Generating local processed_data.json for chunking visibility ---")
-    processed_data = []
+    if not os.path.exists(path):
+        return entries
+    replaced = {entry["structData"].get("doc_id", entry["id"]) for entry in entries}
+    merged = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["structData"].get("doc_id", entry["id"]) not in replaced:
+                merged.append(entry)
+    return merged + entries
 
-    for file_path in files:
-        try:
-            file_name = os.path.basename(file_path)
-            text_content = ""
-            if file_name.lower().endswith(".pdf"):
-                reader = pypdf.PdfReader(file_path)
-                for page in reader.pages:
-                    text_content += page.extract_text() + "\n"
-            else:
-                # TODO: HACKATHON CHALLENGE (Pillar 2: Extensibility)
-                # Call your new parser function here for other file types.
-                # Example: text_content = parse_other_format(file_path)
-                text_content = parse_other_format(file_path) # Placeholder
-
-            if text_content:
-                processed_data.append({
-                    "id": sanitize_id(f"{file_name}"),
-                    "structData": {
-                        "text_content": text_content,
-                        "source_file": file_name,
-                    }
+
+def _chunk_entries(entries: list[dict], chunks_by_id: dict, store_path: str) -> list[dict]:
+    """
+    Replaces each document entry with one inline text entry per chunk. Documents ingested in
+    an earlier run (canonicals re-imported with new aliases) are chunked from the document
+    store; documents without text are kept whole.
+    """
+    store = DocStore.open(store_path)
+    chunk_entries = []
+    try:
+        for entry in entries:
+            doc_id = entry["id"]
+            chunks = chunks_by_id.get(doc_id)
+            if chunks is None and store is not None and doc_id in store:
+                chunks = chunk_document(store.text(doc_id), None, CHUNK_SIZE, CHUNK_OVERLAP)
+            if not chunks:
+                chunk_entries.append(entry)
+                continue
+            for chunk in chunks:
+                struct_data = {**entry["structData"], "doc_id": doc_id, "chunk_offset": chunk.offset}
+                if chunk.page is not None:
+                    struct_data["page"] = chunk.page
+                if chunk.section:
+                    struct_data["section"] = chunk.section
+                chunk_entries.append({
+                    "id": chunk_id(doc_id, chunk.offset),
+                    "structData": struct_data,
+                    "content": {
+                        "mimeType": "text/plain",
+                        "rawBytes": base64.b64encode(chunk.text.encode("utf-8")).decode("ascii"),
+                    },
                 })
-        except Exception as e:
-            logger.error(f"Failed to parse {file_path}: {e}")
+    finally:
+        if store is not None:
+            store.close()
+    logger.info(f"Chunk import: {len(entries)} documents split into {len(chunk_entries)} entries.")
+    return chunk_entries
 
-    output_file_path = os.path.join(output_dir, "processed_data.json")
-    with open(output_file_path, "w", encoding="utf-8") as f:
-        for entry in processed_data:
-            f.write(json.dumps(entry) + "\n")
-    
-    logger.info(f"Local processed data saved to: {output_file_path}")
+def _read_text(file_path: str, max_chars: int, report: ParseReport | None = None,
+               fingerprinter: Fingerprinter | None = None) -> tuple[str, bool]:
+    """
+    Reads the text of a file up to `max_chars` characters, recording parse details in `report`.
+    With a `fingerprinter`, the whole file is streamed through it.
+
+    Returns:
+        tuple[str, bool]: The text, and whether it is the complete text of the file.
+    """
+    parts, size = [], 0
+    with closing(iter_text(file_path, report)) as blocks:
+        for block in blocks:
+            if fingerprinter is not None:
+                fingerprinter.update(block)
+            if size <= max_chars:
+                parts.append(block)
+                size += len(block)
+            elif fingerprinter is None:
+                break
+    return "".join(parts)[:max_chars], size <= max_chars
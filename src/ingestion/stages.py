@@ -0,0 +1,270 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a staged pipeline.
+
+    Attributes:
+        name (str): The stage name, used in logs and stats.
+        fn (Callable[[Any], Any]): Processes one item and returns the item passed to the
+            next stage, or None to drop it (e.g. a duplicate). An item on which `fn` raises
+            is dropped too, and reported in `StageStats.failed`.
+        workers (int): The number of threads running `fn`.
+        queue_size (int): The capacity of the stage's input queue. A full queue blocks the
+            previous stage, which bounds the number of items in flight.
+        ordered (bool): Process items in source order. Requires a single worker. At most
+            `queue_size` items are let into the stages leading up to an ordered stage
+            before it has processed the oldest of them, which bounds the number of items
+            it holds for reordering when one item is slow.
+    """
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 16
+    ordered: bool = False
+
+
+@dataclass
+class StageStats:
+    """
+    Time accounting of a stage, summed over its workers.
+
+    `busy` is time spent in the stage function, `starved` time spent waiting for input
+    and `blocked` time spent waiting for room in the next stage's queue. A stage with
+    utilization close to 1 is the bottleneck; stages before it show blocked time and
+    stages after it show starved time. `failed` lists the items the stage function
+    raised on, with the error, so that callers can retry them.
+    """
+    name: str
+    workers: int
+    processed: int = 0
+    dropped: int = 0
+    busy: float = 0.0
+    starved: float = 0.0
+    blocked: float = 0.0
+    elapsed: float = 0.0
+    # The largest number of items an ordered stage held back waiting for an earlier one.
+    reorder_peak: int = 0
+    failed: List[Tuple[Any, Exception]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0, processed: int = 0, dropped: int = 0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.processed += processed
+            self.dropped += dropped
+
+    def fail(self, item: Any, error: Exception):
+        with self._lock:
+            self.failed.append((item, error))
+
+    @property
+    def utilization(self) -> float:
+        capacity = self.elapsed * self.workers
+        return self.busy / capacity if capacity > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": len(self.failed),
+            "busy_seconds": round(self.busy, 3),
+            "starved_seconds": round(self.starved, 3),
+            "blocked_seconds": round(self.blocked, 3),
+            "utilization": round(self.utilization, 3),
+            "reorder_peak": self.reorder_peak,
+        }
+
+
+class _Worker:
+    """
+    Runs a stage function on the items of an inbox.
+
+    An ordered worker releases a slot of its `window` for every item it has processed; the
+    slots are taken, in source order, by whoever sends items towards it (the source or the
+    previous ordered stage). It also takes a slot of `next_window`, the window of the next
+    ordered stage, before sending an item on.
+    """
+    def __init__(self, stage: Stage, stats: StageStats, inbox: queue.Queue, outbox: Optional[queue.Queue],
+                 on_exit: Callable[[], None], window: Optional[threading.Semaphore] = None,
+                 next_window: Optional[threading.Semaphore] = None):
+        self.stage = stage
+        self.stats = stats
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_exit = on_exit
+        self.window = window
+        self.next_window = next_window
+        self._next_seq = 0
+        self._reorder: List = []
+
+    def _emit(self, seq: int, item: Any):
+        if self.outbox is None:
+            return
+        started = time.perf_counter()
+        if self.next_window is not None:
+            self.next_window.acquire()
+        self.outbox.put((seq, item))
+        self.stats.add(blocked=time.perf_counter() - started)
+
+    def _process(self, seq: int, item: Any):
+        # Dropped items still travel downstream as None, so that ordered stages see every sequence number.
+        result = None
+        if item is not None:
+            started = time.perf_counter()
+            try:
+                result = self.stage.fn(item)
+            except Exception as e:
+                logger.error(f"Stage '{self.stage.name}' failed on {item!r}: {e}")
+                self.stats.fail(item, e)
+            self.stats.add(busy=time.perf_counter() - started, processed=1, dropped=int(result is None))
+        self._emit(seq, result)
+
+    def run(self):
+        try:
+            while True:
+                started = time.perf_counter()
+                entry = self.inbox.get()
+                self.stats.add(starved=time.perf_counter() - started)
+                if entry is _DONE:
+                    break
+                if not self.stage.ordered:
+                    self._process(*entry)
+                    continue
+                heapq.heappush(self._reorder, entry)
+                while self._reorder and self._reorder[0][0] == self._next_seq:
+                    self._process(*heapq.heappop(self._reorder))
+                    self._next_seq += 1
+                    if self.window is not None:
+                        self.window.release()
+                if len(self._reorder) > self.stats.reorder_peak:
+                    self.stats.reorder_peak = len(self._reorder)
+        finally:
+            self.on_exit()
+
+
+def run_stages(source: Iterable[Any], stages: List[Stage]) -> Dict[str, StageStats]:
+    """
+    Runs items from `source` through the stages, each stage in its own threads and
+    connected by bounded queues, so that all stages work at the same time and the total
+    wall time approaches that of the slowest stage.
+
+    Args:
+        source (Iterable[Any]): The items to process, read lazily by a "discover" stage.
+        stages (List[Stage]): The processing stages, in order.
+
+    Returns:
+        Dict[str, StageStats]: The time accounting of each stage, including "discover",
+            with the items each stage failed on.
+    """
+    for stage in stages:
+        if stage.ordered and stage.workers != 1:
+            raise ValueError(f"Ordered stage '{stage.name}' must have a single worker.")
+
+    inboxes = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    # The window of sequence numbers let towards each ordered stage, and the window that
+    # the source, or each ordered stage, has to take a slot of before sending an item on.
+    windows = [threading.Semaphore(stage.queue_size) if stage.ordered else None for stage in stages]
+    next_ordered = [next((w for w in windows[index + 1:] if w is not None), None) for index in range(len(stages))]
+    source_window = next((w for w in windows if w is not None), None)
+    stats = {"discover": StageStats("discover", 1)}
+    stats.update({stage.name: StageStats(stage.name, stage.workers) for stage in stages})
+    threads = []
+    started = time.perf_counter()
+
+    def finisher(index: int) -> Callable[[], None]:
+        # The last worker of a stage to exit tells every worker of the next stage to stop.
+        remaining = [stages[index].workers]
+        lock = threading.Lock()
+
+        def on_exit():
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                stats[stages[index].name].elapsed = time.perf_counter() - started
+                if index + 1 < len(stages):
+                    for _ in range(stages[index + 1].workers):
+                        inboxes[index + 1].put(_DONE)
+        return on_exit
+
+    for index, stage in enumerate(stages):
+        outbox = inboxes[index + 1] if index + 1 < len(stages) else None
+        on_exit = finisher(index)
+        for n in range(stage.workers):
+            worker = _Worker(stage, stats[stage.name], inboxes[index], outbox, on_exit, window=windows[index],
+                             next_window=next_ordered[index] if stage.ordered else None)
+            thread = threading.Thread(target=worker.run, name=f"ingest-{stage.name}-{n}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    discover = stats["discover"]
+    try:
+        iterator = iter(source)
+        seq = 0
+        while True:
+            begin = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            discover.add(busy=time.perf_counter() - begin, processed=1)
+            begin = time.perf_counter()
+            if source_window is not None:
+                source_window.acquire()
+            inboxes[0].put((seq, item))
+            discover.add(blocked=time.perf_counter() - begin)
+            seq += 1
+    finally:
+        discover.elapsed = time.perf_counter() - started
+        for _ in range(stages[0].workers):
+            inboxes[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    for stage_stats in stats.values():
+        metrics.gauge(f"ingestion_stage_{stage_stats.name}_utilization").set(stage_stats.utilization)
+    return stats
+
+
+def log_stage_stats(stats: Dict[str, StageStats]):
+    """Logs the time accounting of each stage and names the bottleneck."""
+    for s in stats.values():
+        logger.info(
+            f"Stage {s.name:<9} workers={s.workers:<3} processed={s.processed:<6} dropped={s.dropped:<5} "
+            f"failed={len(s.failed):<4} "
+            f"busy={s.busy:8.2f}s starved={s.starved:8.2f}s blocked={s.blocked:8.2f}s "
+            f"utilization={s.utilization:5.1%}"
+        )
+    bottleneck = max(stats.values(), key=lambda s: s.utilization)
+    logger.info(f"Bottleneck stage: {bottleneck.name} ({bottleneck.utilization:.1%} utilized).")
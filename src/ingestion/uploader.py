@@ -0,0 +1,192 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import base64
+import hashlib
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import google_crc32c
+from google.api_core import exceptions as google_exceptions
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+from src.shared.rate_limit import GCS, get_limiter
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# Attempts per upload when Cloud Storage answers with a quota or transient error.
+UPLOAD_ATTEMPTS = 3
+# Files at least this large are uploaded as parallel slices composed server-side.
+COMPOSITE_THRESHOLD_BYTES = int(float(os.getenv("UPLOAD_COMPOSITE_THRESHOLD_MB", "150")) * 1024 * 1024)
+SLICE_BYTES = int(float(os.getenv("UPLOAD_SLICE_MB", "32")) * 1024 * 1024)
+SLICE_WORKERS = int(os.getenv("UPLOAD_SLICE_WORKERS", "8"))
+# A single compose request accepts at most 32 source objects.
+MAX_COMPOSE_SOURCES = 32
+_READ_BYTES = 8 * 1024 * 1024
+
+SKIPPED = "skipped"
+UPLOADED = "uploaded"
+COMPOSED = "composed"
+
+_TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+)
+
+
+def _encode(digest: bytes) -> str:
+    # Cloud Storage reports checksums as base64 of the big-endian digest.
+    return base64.b64encode(digest).decode("ascii")
+
+
+def file_checksums(file_path: str, offset: int = 0, length: int = -1) -> Tuple[str, str]:
+    """
+    Computes the CRC32C and MD5 of a file, or of `length` bytes from `offset`, in the
+    format of the `crc32c` and `md5_hash` properties of a Cloud Storage blob.
+    """
+    crc, md5 = google_crc32c.Checksum(), hashlib.md5()
+    remaining = length if length >= 0 else math.inf
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        while remaining > 0:
+            block = f.read(int(min(_READ_BYTES, remaining)))
+            if not block:
+                break
+            crc.update(block)
+            md5.update(block)
+            remaining -= len(block)
+    return _encode(crc.digest()), _encode(md5.digest())
+
+
+def _matches(blob, size: int, crc32c: str, md5: str) -> bool:
+    """Whether a remote object has the given content. Composite objects only have a CRC32C."""
+    if blob is None or blob.size != size:
+        return False
+    if blob.crc32c:
+        return blob.crc32c == crc32c
+    return blob.md5_hash == md5
+
+
+def _with_retries(call, description: str):
+    """
+    Runs a Cloud Storage call within the rate limit. On a quota error the shared budget is
+    paused before trying again, so that concurrent uploaders back off together; transient
+    errors are retried as they are.
+    """
+    limiter = get_limiter(GCS)
+    for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+        limiter.acquire()
+        try:
+            return call()
+        except google_exceptions.TooManyRequests:
+            limiter.penalize()
+            if attempt == UPLOAD_ATTEMPTS:
+                raise
+        except _TRANSIENT_ERRORS as e:
+            if attempt == UPLOAD_ATTEMPTS:
+                raise
+            logger.warning(f"{description} failed ({type(e).__name__}); retrying.")
+
+
+def _upload_slice(bucket, name: str, file_path: str, offset: int, length: int) -> object:
+    blob = bucket.blob(name)
+    crc32c, md5 = file_checksums(file_path, offset, length)
+    # Slices left by an interrupted upload are reused, so only the missing ones are sent again.
+    if _matches(_with_retries(lambda: bucket.get_blob(name), f"Lookup of {name}"), length, crc32c, md5):
+        metrics.counter("ingestion_upload_slices_reused_total").inc()
+        return blob
+
+    def send():
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            blob.upload_from_file(f, size=length, checksum="crc32c")
+
+    _with_retries(send, f"Upload of slice {name}")
+    return blob
+
+
+def _upload_composite(bucket, name: str, file_path: str, size: int, crc32c: str):
+    slice_bytes = max(SLICE_BYTES, math.ceil(size / MAX_COMPOSE_SOURCES))
+    slices = [(offset, min(slice_bytes, size - offset)) for offset in range(0, size, slice_bytes)]
+    # Slices are named after the content of the whole file, so a restarted upload of the
+    # same file finds them while a changed file never mixes with stale slices.
+    prefix = f"{name}.slices/{base64.b64decode(crc32c).hex()}"
+    with ThreadPoolExecutor(max_workers=min(SLICE_WORKERS, len(slices)), thread_name_prefix="gcs-slice") as pool:
+        futures = [pool.submit(_upload_slice, bucket, f"{prefix}/{i:04d}", file_path, offset, length)
+                   for i, (offset, length) in enumerate(slices)]
+        parts: List = [future.result() for future in futures]
+
+    blob = bucket.blob(name)
+    _with_retries(lambda: blob.compose(parts), f"Compose of {name}")
+    blob.reload()
+    if blob.crc32c != crc32c:
+        # Reusing these slices would compose the same wrong object again, so the next
+        # attempt starts over.
+        _delete(parts + [blob])
+        metrics.counter("ingestion_upload_compose_mismatch_total").inc()
+        raise ValueError(f"Composed object {name} does not match {file_path} (CRC32C {blob.crc32c} != {crc32c}).")
+    _delete(parts)
+
+
+def _delete(blobs: List):
+    for blob in blobs:
+        try:
+            _with_retries(blob.delete, f"Delete of {blob.name}")
+        except google_exceptions.NotFound:
+            pass
+
+
+def upload_file(bucket, name: str, file_path: str) -> str:
+    """
+    Uploads a file to `name` in the bucket unless an identical object is already there.
+
+    The local CRC32C and MD5 are compared with the remote object's metadata first, so
+    unchanged files cost a single metadata request. Files of at least
+    `UPLOAD_COMPOSITE_THRESHOLD_MB` are split into slices uploaded in parallel and composed
+    server-side; slices that were uploaded before a failure are reused on the next attempt,
+    unless the composed object did not match the file, in which case all are deleted.
+    All requests respect the shared Cloud Storage rate limit.
+
+    Args:
+        bucket (google.cloud.storage.Bucket): The destination bucket.
+        name (str): The object name.
+        file_path (str): The local file.
+
+    Returns:
+        str: "skipped", "uploaded" or "composed".
+
+    Raises:
+        google.api_core.exceptions.GoogleAPICallError: If the upload fails after retries.
+        ValueError: If the composed object does not match the local file.
+    """
+    size = os.path.getsize(file_path)
+    crc32c, md5 = file_checksums(file_path)
+    if _matches(_with_retries(lambda: bucket.get_blob(name), f"Lookup of {name}"), size, crc32c, md5):
+        metrics.counter("ingestion_upload_skipped_total").inc()
+        logger.info(f"Skipped upload of {file_path}: gs://{bucket.name}/{name} is identical.")
+        return SKIPPED
+
+    if size >= COMPOSITE_THRESHOLD_BYTES:
+        _upload_composite(bucket, name, file_path, size, crc32c)
+        result = COMPOSED
+    else:
+        blob = bucket.blob(name)
+        _with_retries(lambda: blob.upload_from_filename(file_path, checksum="crc32c"), f"Upload of {name}")
+        result = UPLOADED
+    metrics.counter(f"ingestion_upload_{result}_total").inc()
+    metrics.counter("ingestion_upload_bytes_total").inc(size)
+    return result
@@ -0,0 +1,126 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Protocol
+from src.search.filters import SearchFilters
+
+NO_RESULTS = "No relevant documents found."
+
+VERTEX = "vertex"
+LOCAL = "local"
+
+
+@dataclass
+class SearchHit:
+    """
+    A single search result.
+
+    Attributes:
+        doc_id (str): The id of the matching document.
+        source_file (str): The name of the file the document was ingested from.
+        snippets (List[str]): The relevant passages of the document.
+        score (float): The relevance score assigned by the backend (higher is better).
+        page (Optional[int]): The page the passage is on, for chunk-level documents.
+        section (Optional[str]): The section the passage belongs to, for chunk-level documents.
+    """
+    doc_id: str
+    source_file: str
+    snippets: List[str] = field(default_factory=list)
+    score: float = 0.0
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+    def anchor(self) -> str:
+        """A citation of the passage, e.g. "medical_record_Jane_Doe_0.pdf, page 2, ASSESSMENT"."""
+        parts = [self.source_file]
+        if self.page is not None:
+            parts.append(f"page {self.page}")
+        if self.section:
+            parts.append(self.section)
+        return ", ".join(parts)
+
+
+class SearchBackend(Protocol):
+    """The interface shared by all search backends."""
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """Returns the `top_k` most relevant documents, best first. Raises on backend errors."""
+        ...
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """Returns the consolidated text of the most relevant passages, for the agent."""
+        ...
+
+
+def format_hits(hits: List[SearchHit]) -> str:
+    """
+    Consolidates the snippets of the hits into the context text passed to the agent.
+    Snippets of chunk-level documents are preceded by their anchor in brackets.
+    """
+    snippets = []
+    for hit in hits:
+        texts = [s for s in hit.snippets if s]
+        if texts and (hit.page is not None or hit.section):
+            texts[0] = f"[{hit.anchor()}]\n{texts[0]}"
+        snippets.extend(texts)
+    return "\n\n".join(snippets) if snippets else NO_RESULTS
+
+
+def get_search_backend(name: Optional[str] = None) -> SearchBackend:
+    """
+    Creates the search backend selected by `name` or the `SEARCH_BACKEND` environment
+    variable: "vertex" (Vertex AI Search, the default) or "local" (BM25 over the local
+    document store).
+
+    When `SEARCH_TARGETS` names a JSON file of shards, Vertex AI Search queries fan out
+    to all of them and their results are merged. Unless `SEARCH_RESILIENCE_ENABLED` is
+    "false", Vertex AI Search is wrapped with deadlines, retries and a circuit breaker,
+    failing over to the local backend unless `SEARCH_FALLBACK_LOCAL` is "false". The
+    local index is built on the first failover and rebuilt after each ingestion.
+
+    When `SEARCH_RERANKER` names a reranker (e.g. "lexical"), the backend fetches
+    `SEARCH_RERANK_CANDIDATES` hits per query and the reranker keeps the best of them.
+
+    Raises:
+        ValueError: If the backend or reranker name is unknown.
+    """
+    backend = _create_backend((name or os.getenv("SEARCH_BACKEND", VERTEX)).lower())
+    reranker = os.getenv("SEARCH_RERANKER")
+    if reranker:
+        from src.search.rerank import RerankingSearchBackend, get_reranker
+        return RerankingSearchBackend(backend, get_reranker(reranker))
+    return backend
+
+
+def _create_backend(name: str) -> SearchBackend:
+    if name == VERTEX:
+        if os.getenv("SEARCH_TARGETS"):
+            from src.search.fanout import FanOutSearchClient
+            client = FanOutSearchClient.from_config(os.getenv("SEARCH_TARGETS"))
+        else:
+            from src.search.vertex_client import VertexSearchClient
+            client = VertexSearchClient()
+        if os.getenv("SEARCH_RESILIENCE_ENABLED", "true").lower() != "true":
+            return client
+        from src.search.resilience import ResilientSearchBackend
+        fallback = None
+        if os.getenv("SEARCH_FALLBACK_LOCAL", "true").lower() == "true":
+            from src.search.local_client import LocalFallbackClient
+            fallback = LocalFallbackClient()
+        return ResilientSearchBackend(client, fallback)
+    if name == LOCAL:
+        from src.search.local_client import LocalSearchClient
+        return LocalSearchClient()
+    raise ValueError(f"Unknown search backend: {name}")
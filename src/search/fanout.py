@@ -0,0 +1,240 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from src.search.backend import SearchBackend, SearchHit, format_hits
+from src.search.filters import SearchFilters
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+_SHARD_METRIC_PREFIX = "search_shard_"
+
+
+@dataclass
+class SearchTarget:
+    """
+    One shard of the corpus: a data store (or the engine serving it) holding a subset of
+    the records, e.g. those of one facility and year.
+
+    Attributes:
+        name (str): A short name of the shard, used in logs and metric names.
+        data_store_id (str): The Vertex AI Search data store holding the shard.
+        engine_id (Optional[str]): The engine serving the data store, if any.
+        date_from (Optional[str]): The earliest record date held by the shard (YYYY-MM-DD).
+        date_to (Optional[str]): The latest record date held by the shard (YYYY-MM-DD).
+        document_types (List[str]): The document types held by the shard; empty for all.
+        timeout (Optional[float]): The deadline of a query to this shard, in seconds.
+    """
+    name: str
+    data_store_id: str
+    engine_id: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    document_types: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+
+    @property
+    def metric_name(self) -> str:
+        return _SHARD_METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", self.name)
+
+    def may_match(self, filters: Optional[SearchFilters]) -> bool:
+        """Whether the shard can hold documents matching the filters."""
+        if filters is None:
+            return True
+        # ISO-8601 dates compare correctly as strings.
+        if filters.date_from and self.date_to and filters.date_from > self.date_to:
+            return False
+        if filters.date_to and self.date_from and filters.date_to < self.date_from:
+            return False
+        if filters.document_type and self.document_types:
+            wanted = filters.document_type.lower()
+            return any(t.lower() == wanted for t in self.document_types)
+        return True
+
+
+def load_targets(path: str) -> List[SearchTarget]:
+    """
+    Loads the shard list from a JSON file, e.g.:
+
+        [{"name": "north-2024", "data_store_id": "records-north-2024",
+          "date_from": "2024-01-01", "date_to": "2024-12-31", "timeout": 3}]
+
+    Raises:
+        ValueError: If the file lists no shards or a shard has no name or data store.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    targets = []
+    for entry in entries:
+        if not entry.get("name") or not entry.get("data_store_id"):
+            raise ValueError(f"Search target without a name or data_store_id in {path}: {entry}")
+        targets.append(SearchTarget(**entry))
+    if not targets:
+        raise ValueError(f"No search targets listed in {path}.")
+    return targets
+
+
+def merge_hits(results: List[List[SearchHit]], top_k: int) -> List[SearchHit]:
+    """
+    Merges the ranked hits of several shards by score, keeping the best-scored hit of a
+    document returned by more than one shard (e.g. while records move between shards).
+    Equal scores keep the order of the shards.
+    """
+    best: Dict[str, Tuple[float, int, SearchHit]] = {}
+    order = 0
+    for hits in results:
+        for hit in hits:
+            current = best.get(hit.doc_id)
+            if current is None or hit.score > current[0]:
+                best[hit.doc_id] = (hit.score, order, hit)
+            order += 1
+    ranked = sorted(best.values(), key=lambda entry: (-entry[0], entry[1]))
+    return [hit for _, _, hit in ranked[:top_k]]
+
+
+class FanOutSearchClient:
+    """
+    Searches several data stores at once and merges their results.
+
+    Each query is routed to the shards whose date span and document types can match its
+    filters, sent to all of them concurrently, and bounded by each shard's own deadline.
+    Shards that fail or miss their deadline are left out of the merged results; the query
+    fails only if every routed shard does. The latency of every shard is recorded in the
+    `search_shard_<name>_seconds` histogram.
+    """
+    def __init__(self, targets: List[SearchTarget], clients: Dict[str, SearchBackend]):
+        self.targets = targets
+        self.clients = clients
+        self.default_timeout = float(os.getenv("SEARCH_SHARD_TIMEOUT_SECONDS", "5"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SEARCH_FANOUT_WORKERS", str(max(4, 4 * len(targets))))),
+            thread_name_prefix="search-fanout",
+        )
+
+    @classmethod
+    def from_config(cls, path: str) -> "FanOutSearchClient":
+        """Creates a Vertex AI Search client per shard listed in the JSON file at `path`."""
+        from src.search.metadata_index import MetadataIndexFile
+        from src.search.vertex_client import VertexSearchClient
+
+        targets = load_targets(path)
+        # One index shared by the shards, reloaded after each ingestion.
+        metadata_index_file = MetadataIndexFile(os.getenv("METADATA_INDEX_PATH", "data/processed/metadata.jsonl"))
+        clients = {
+            t.name: VertexSearchClient(data_store_id=t.data_store_id, engine_id=t.engine_id,
+                                       metadata_index_file=metadata_index_file)
+            for t in targets
+        }
+        logger.info(f"Fan-out search over {len(targets)} shard(s): {', '.join(t.name for t in targets)}.")
+        return cls(targets, clients)
+
+    def route(self, filters: Optional[SearchFilters]) -> List[SearchTarget]:
+        """Returns the shards a query with these filters has to be sent to."""
+        return [t for t in self.targets if t.may_match(filters)]
+
+    def _query_shard(self, target: SearchTarget, query: str, filters: Optional[SearchFilters], top_k: int,
+                     timeout: float) -> List[SearchHit]:
+        started = time.perf_counter()
+        try:
+            return self.clients[target.name].retrieve(query, filters, top_k, timeout=timeout)
+        except Exception:
+            metrics.counter(f"{target.metric_name}_errors_total").inc()
+            raise
+        finally:
+            metrics.histogram(f"{target.metric_name}_seconds").observe(time.perf_counter() - started)
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """
+        Retrieves the most relevant documents across the routed shards, best first.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters, also used for routing.
+            top_k (int): The maximum number of documents to return.
+            timeout (Optional[float]): The overall deadline in seconds, capping every shard's own.
+
+        Raises:
+            Exception: The error of the first shard if every routed shard failed.
+            TimeoutError: If no routed shard answered within its deadline.
+        """
+        targets = self.route(filters)
+        if not targets:
+            logger.info(f"Search query '{query}' matches no shard for {filters}.")
+            return []
+        metrics.counter("search_fanout_shards_total").inc(len(targets))
+
+        started = time.monotonic()
+        futures = {}
+        for target in targets:
+            shard_timeout = target.timeout or self.default_timeout
+            if timeout is not None:
+                shard_timeout = min(shard_timeout, timeout)
+            futures[target.name] = (self._executor.submit(self._query_shard, target, query, filters, top_k,
+                                                          shard_timeout), shard_timeout)
+
+        results, report, errors = [], [], []
+        for target in targets:
+            future, shard_timeout = futures[target.name]
+            done, _ = wait([future], timeout=max(0.0, shard_timeout - (time.monotonic() - started)))
+            if not done:
+                metrics.counter(f"{target.metric_name}_timeouts_total").inc()
+                report.append(f"{target.name}=timeout")
+                errors.append(TimeoutError(f"Shard '{target.name}' missed its {shard_timeout:.2f}s deadline."))
+                continue
+            if future.exception() is not None:
+                report.append(f"{target.name}=error")
+                errors.append(future.exception())
+                continue
+            results.append(future.result())
+            report.append(f"{target.name}={len(results[-1])} hits")
+
+        logger.info(f"Fan-out search '{query}' in {(time.monotonic() - started) * 1000:.0f}ms: {', '.join(report)}.")
+        if not results:
+            raise errors[0]
+        if errors:
+            metrics.counter("search_fanout_partial_total").inc()
+        return merge_hits(results, top_k)
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """
+        Executes a search query across the shards and returns the consolidated context text.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+        """
+        try:
+            return format_hits(self.retrieve(query, filters))
+        except Exception as e:
+            logger.error(f"Error during fan-out search for query '{query}': {e}")
+            return "Error retrieving documents from Vertex AI Search."
+
+
+def shard_latency_report() -> Dict[str, Dict[str, float]]:
+    """Returns the latency summary (count, p50, p95, p99 in seconds) of every shard queried so far."""
+    suffix = "_seconds"
+    return {
+        name[len(_SHARD_METRIC_PREFIX):-len(suffix)]: value
+        for name, value in metrics.snapshot().items()
+        if name.startswith(_SHARD_METRIC_PREFIX) and name.endswith(suffix) and isinstance(value, dict)
+    }
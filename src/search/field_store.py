@@ -0,0 +1,195 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import re
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+NUMERIC_FIELDS = ("bp_systolic", "bp_diastolic", "heart_rate", "temperature_f", "pain_score")
+TEXT_FIELDS = (
+    "source_file", "patient", "date", "provider", "document_type",
+    "symptom", "onset", "diagnosis", "differential", "medication", "follow_up",
+)
+# Numeric fields stored as floats (to allow NaN for missing values) but reported as integers.
+_INTEGER_FIELDS = {"bp_systolic", "bp_diastolic", "heart_rate", "pain_score"}
+
+_OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": np.equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+_MAX_NAME_TOKENS = 4
+
+Value = Union[str, int, float]
+Condition = Tuple[str, str, Value]
+
+
+def _name_key(name: str) -> Tuple[str, ...]:
+    return tuple(_WORD_PATTERN.findall(name.lower()))
+
+
+class FieldStore:
+    """
+    Columnar store of the structured fields extracted from every record at ingest time,
+    keyed by document id.
+
+    Each field is a NumPy array with one row per document: numeric fields (vitals, pain
+    score) as float64 with NaN for missing values, text fields as unicode arrays with ""
+    for missing values. The store supports indexed lookup by patient and vectorized
+    filters such as `("heart_rate", ">", 90)`, so that lookups and aggregate questions
+    over thousands of records are answered locally without a search or model call.
+    """
+    def __init__(self, doc_ids: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.doc_ids = doc_ids
+        self._columns = columns
+        self._row_of = {doc_id: row for row, doc_id in enumerate(doc_ids.tolist())}
+
+        # Sorted patient keys for binary-search lookups by patient.
+        patient_keys = np.array([" ".join(_name_key(p)) for p in columns["patient"].tolist()], dtype=str)
+        self._patient_order = np.argsort(patient_keys, kind="stable")
+        self._sorted_patient_keys = patient_keys[self._patient_order]
+        self._names = {_name_key(p): p for p in columns["patient"].tolist() if p}
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict[str, Value]]) -> "FieldStore":
+        """
+        Builds the store from the extracted fields of each document.
+
+        Args:
+            records (Dict[str, Dict[str, Value]]): The fields of each record, by document id.
+        """
+        doc_ids = np.array(list(records), dtype=str)
+        rows = list(records.values())
+        columns: Dict[str, np.ndarray] = {}
+        for field in NUMERIC_FIELDS:
+            columns[field] = np.array([float(r.get(field, np.nan)) for r in rows], dtype=np.float64)
+        for field in TEXT_FIELDS:
+            columns[field] = np.array([str(r.get(field, "")) for r in rows], dtype=str)
+        return cls(doc_ids, columns)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["FieldStore"]:
+        """
+        Loads the store from the `.npz` file written by the ingestion pipeline.
+
+        Returns:
+            Optional[FieldStore]: The store, or None if the file does not exist.
+        """
+        if not os.path.exists(path):
+            logger.info(f"No field store found at {path}; local record lookups are disabled.")
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files if name != "doc_id"}
+            store = cls(data["doc_id"], columns)
+        logger.info(f"Loaded field store with {len(store)} records from {path}.")
+        return store
+
+    def save(self, path: str):
+        """Writes the store to a compressed `.npz` file, replacing any previous version atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, doc_id=self.doc_ids, **self._columns)
+        os.replace(tmp_path, path)
+        logger.info(f"Field store with {len(self)} records saved to: {path}")
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def column(self, field: str) -> np.ndarray:
+        return self._columns[field]
+
+    def _record(self, row: int) -> Dict[str, Value]:
+        record: Dict[str, Value] = {"doc_id": str(self.doc_ids[row])}
+        for field in TEXT_FIELDS:
+            value = str(self._columns[field][row])
+            if value:
+                record[field] = value
+        for field in NUMERIC_FIELDS:
+            value = float(self._columns[field][row])
+            if not np.isnan(value):
+                record[field] = int(value) if field in _INTEGER_FIELDS else value
+        return record
+
+    def records(self, rows: np.ndarray) -> List[Dict[str, Value]]:
+        """Returns the fields of the given rows as dicts, most recent first."""
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return []
+        rows = rows[np.argsort(self._columns["date"][rows], kind="stable")[::-1]]
+        return [self._record(int(row)) for row in rows]
+
+    def to_records(self) -> Dict[str, Dict[str, Value]]:
+        """Returns the fields of every record by document id, the input of `from_records`."""
+        return {str(self.doc_ids[row]): self._record(row) for row in range(len(self))}
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Value]]:
+        row = self._row_of.get(doc_id)
+        return None if row is None else self._record(row)
+
+    def find_patients(self, text: str) -> List[str]:
+        """Returns the names of all stored patients mentioned in the text."""
+        tokens = _WORD_PATTERN.findall(text.lower())
+        found = []
+        for n in range(_MAX_NAME_TOKENS, 1, -1):
+            for i in range(len(tokens) - n + 1):
+                name = self._names.get(tuple(tokens[i:i + n]))
+                if name and name not in found:
+                    found.append(name)
+        return found
+
+    def rows_for(self, patient: str) -> np.ndarray:
+        """Returns the rows of a patient's records."""
+        key = " ".join(_name_key(patient))
+        lo = np.searchsorted(self._sorted_patient_keys, key, side="left")
+        hi = np.searchsorted(self._sorted_patient_keys, key, side="right")
+        return self._patient_order[lo:hi]
+
+    def records_for(self, patient: str) -> List[Dict[str, Value]]:
+        """Returns the records of a patient, most recent first."""
+        return self.records(self.rows_for(patient))
+
+    def where(self, *conditions: Condition) -> np.ndarray:
+        """
+        Returns the rows matching all conditions.
+
+        Args:
+            *conditions (Condition): `(field, operator, value)` triples, e.g.
+                `("heart_rate", ">", 90)` or `("diagnosis", "=", "Osteoarthritis")`.
+                Text fields are compared case-insensitively; missing values never match.
+
+        Raises:
+            ValueError: If a field or operator is unknown.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for field, operator, value in conditions:
+            if field not in self._columns:
+                raise ValueError(f"Unknown field: {field}")
+            if operator not in _OPERATORS:
+                raise ValueError(f"Unknown operator: {operator}")
+            column = self._columns[field]
+            if field in NUMERIC_FIELDS:
+                matched = _OPERATORS[operator](column, float(value)) & ~np.isnan(column)
+            else:
+                matched = _OPERATORS[operator](np.char.lower(column), str(value).lower()) & (column != "")
+            mask &= matched
+        return np.flatnonzero(mask)
@@ -0,0 +1,66 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+
+def _quote(value: str) -> str:
+    """Quotes a literal for use inside a Discovery Engine filter expression."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def any_of(field: str, values: Iterable[str]) -> str:
+    """Builds an `ANY(...)` clause matching any of the given string values."""
+    return f"{field}: ANY({', '.join(_quote(v) for v in values)})"
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Structured metadata filters for a search request.
+
+    All fields are optional; unset fields do not constrain the search. Dates are
+    ISO-8601 strings (YYYY-MM-DD) and the range is inclusive on both ends.
+    """
+    patient: Optional[str] = None
+    source_file: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    document_type: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not any([self.patient, self.source_file, self.date_from, self.date_to, self.document_type])
+
+    def to_expression(self) -> str:
+        """
+        Compiles the filters into a Discovery Engine filter expression.
+
+        The field names match the `structData` keys written by the ingestion pipeline,
+        e.g. `patient: ANY("Jessica Woodward") AND date >= "2025-01-01"`.
+
+        Returns:
+            str: The filter expression, or an empty string if no filter is set.
+        """
+        clauses: List[str] = []
+        if self.patient:
+            clauses.append(any_of("patient", [self.patient]))
+        if self.source_file:
+            clauses.append(any_of("source_file", [self.source_file]))
+        if self.document_type:
+            clauses.append(any_of("document_type", [self.document_type]))
+        if self.date_from:
+            clauses.append(f"date >= {_quote(self.date_from)}")
+        if self.date_to:
+            clauses.append(f"date <= {_quote(self.date_to)}")
+        return " AND ".join(clauses)
@@ -0,0 +1,181 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+import numpy as np
+from google.api_core import exceptions as google_exceptions
+from src.search.backend import SearchHit, format_hits
+from src.search.filters import SearchFilters
+from src.search.metadata_index import MetadataIndex
+from src.shared.docstore import DocStore
+from src.shared.embeddings import tokenize
+from src.shared.freshness import last_ingestion_time
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Standard BM25 parameters.
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Number of best-matching lines returned as snippets for each hit.
+_SNIPPET_LINES = 2
+
+
+class LocalSearchClient:
+    """
+    Handles search queries with BM25 over the local document store, without any remote call.
+
+    The inverted index is built in memory when the client is created: postings are kept
+    as NumPy arrays grouped by term, so a query only touches the postings of its terms.
+    It is meant for offline evaluation and development; the agent uses Vertex AI Search
+    unless `SEARCH_BACKEND=local` is set.
+    """
+    def __init__(self, store_path: Optional[str] = None):
+        self.store = DocStore.open(store_path)
+        self.doc_ids: List[str] = []
+        self.source_files: List[str] = []
+        vocabulary: Dict[str, int] = {}
+        terms, docs, freqs, lengths, entries = [], [], [], [], []
+
+        if self.store is not None:
+            for row, document in enumerate(self.store.scan()):
+                self.doc_ids.append(document.doc_id)
+                self.source_files.append(document.metadata.get("source_file", document.doc_id))
+                entries.append({"structData": {**document.metadata, "source_file": self.source_files[-1]}})
+                counts = Counter(tokenize(document.text))
+                lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                    docs.append(row)
+                    freqs.append(count)
+
+        term_ids = np.array(terms, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._vocabulary = vocabulary
+        self._postings_docs = np.array(docs, dtype=np.int64)[order]
+        self._postings_freqs = np.array(freqs, dtype=np.float64)[order]
+        self._term_offsets = np.searchsorted(term_ids[order], np.arange(len(vocabulary) + 1))
+        self._lengths = np.array(lengths, dtype=np.float64)
+        self._average_length = float(self._lengths.mean()) if len(lengths) else 0.0
+        document_freqs = np.diff(self._term_offsets).astype(np.float64)
+        self._idf = np.log(1.0 + (len(lengths) - document_freqs + 0.5) / (document_freqs + 0.5))
+        self._row_of_source = {source: row for row, source in enumerate(self.source_files)}
+        self.metadata_index = MetadataIndex(entries)
+        logger.info(f"LocalSearchClient indexed {len(self.doc_ids)} documents ({len(vocabulary)} terms).")
+
+    def _allowed_rows(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        if filters is None or filters.is_empty():
+            return None
+        matches = self.metadata_index.resolve(filters)
+        return np.array(sorted(self._row_of_source[s] for s in matches), dtype=np.int64)
+
+    def _snippets(self, doc_id: str, query_terms: set) -> List[str]:
+        lines = [line.strip() for line in (self.store.text(doc_id) or "").splitlines() if line.strip()]
+        scored = [(len(query_terms.intersection(tokenize(line))), i) for i, line in enumerate(lines)]
+        best = sorted((i for score, i in sorted(scored, reverse=True)[:_SNIPPET_LINES] if score > 0))
+        return [lines[i] for i in best] or lines[:1]
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """
+        Ranks the documents of the local store against the query with BM25.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+            top_k (int): The maximum number of documents to return.
+            timeout (Optional[float]): Unused; local queries do not block on I/O.
+        """
+        scores = np.zeros(len(self.doc_ids), dtype=np.float64)
+        query_terms = set(tokenize(query))
+        for term in query_terms:
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._term_offsets[term_id], self._term_offsets[term_id + 1]
+            docs, freqs = self._postings_docs[start:end], self._postings_freqs[start:end]
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._lengths[docs] / self._average_length)
+            scores[docs] += self._idf[term_id] * freqs * (BM25_K1 + 1.0) / (freqs + norm)
+
+        candidates = np.flatnonzero(scores > 0)
+        allowed = self._allowed_rows(filters)
+        if allowed is not None:
+            candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [
+            SearchHit(
+                doc_id=self.doc_ids[row],
+                source_file=self.source_files[row],
+                snippets=self._snippets(self.doc_ids[row], query_terms),
+                score=float(scores[row]),
+            )
+            for row in candidates.tolist()
+        ]
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """
+        Executes a search query against the local document store.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+        """
+        try:
+            return format_hits(self.retrieve(query, filters))
+        except Exception as e:
+            logger.error(f"Error during local search for query '{query}': {e}")
+            return "Error retrieving documents from the local search index."
+
+
+class LocalFallbackClient:
+    """
+    The local BM25 backend that Vertex AI Search fails over to. The index is only built on
+    the first failover, so processes whose searches never fail do not hold the document
+    store in memory, and it is rebuilt once a newer ingestion has completed, so that
+    fallback results do not go stale in long-running processes.
+    """
+    def __init__(self, store_path: Optional[str] = None):
+        self.store_path = store_path
+        self._client: Optional[LocalSearchClient] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Optional[LocalSearchClient]:
+        """The current index, or None while the local document store is empty."""
+        ingested_at = last_ingestion_time()
+        if ingested_at != self._loaded_at:
+            with self._lock:
+                if ingested_at != self._loaded_at:
+                    client = LocalSearchClient(self.store_path)
+                    self._client = client if client.doc_ids else None
+                    self._loaded_at = ingested_at
+        return self._client
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """
+        Ranks the documents of the local store against the query with BM25.
+
+        Raises:
+            google.api_core.exceptions.ServiceUnavailable: If the local document store is empty.
+        """
+        client = self.client
+        if client is None:
+            raise google_exceptions.ServiceUnavailable("The local document store is empty.")
+        return client.retrieve(query, filters, top_k, timeout=timeout)
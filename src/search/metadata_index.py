@@ -0,0 +1,132 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from src.search.filters import SearchFilters
+from src.shared.freshness import last_ingestion_time
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+class MetadataIndex:
+    """
+    In-memory index over the `structData` of the documents written to `metadata.jsonl`
+    at ingest time. Used to resolve structured filters locally before a search request
+    is sent, so that queries which cannot match any document never leave the process.
+    """
+    def __init__(self, entries: List[dict]):
+        self._all: Set[str] = set()
+        self._by_patient: Dict[str, Set[str]] = defaultdict(set)
+        self._by_type: Dict[str, Set[str]] = defaultdict(set)
+        dated: List[Tuple[str, str]] = []
+
+        for entry in entries:
+            data = entry.get("structData", {})
+            source_file = data.get("source_file")
+            if not source_file:
+                continue
+            self._all.add(source_file)
+            if data.get("patient"):
+                self._by_patient[_normalize(data["patient"])].add(source_file)
+            if data.get("document_type"):
+                self._by_type[_normalize(data["document_type"])].add(source_file)
+            if data.get("date"):
+                dated.append((data["date"], source_file))
+
+        dated.sort()
+        self._dates = [d for d, _ in dated]
+        self._dated_sources = [s for _, s in dated]
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MetadataIndex"]:
+        """
+        Loads the index from a metadata JSONL file.
+
+        Returns:
+            Optional[MetadataIndex]: The index, or None if the file does not exist.
+        """
+        if not os.path.exists(path):
+            logger.info(f"No metadata index found at {path}; filters will be applied remotely only.")
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        logger.info(f"Loaded metadata index with {len(entries)} documents from {path}.")
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def resolve(self, filters: SearchFilters) -> Set[str]:
+        """
+        Resolves the filters to the set of matching source files.
+
+        Args:
+            filters (SearchFilters): The filters to apply.
+
+        Returns:
+            Set[str]: The source files matching every set filter. An empty set means
+            the query cannot match any indexed document.
+        """
+        candidates = set(self._all)
+        if filters.source_file:
+            candidates &= {filters.source_file}
+        if filters.patient:
+            candidates &= self._by_patient.get(_normalize(filters.patient), set())
+        if filters.document_type:
+            candidates &= self._by_type.get(_normalize(filters.document_type), set())
+        if filters.date_from or filters.date_to:
+            lo = bisect_left(self._dates, filters.date_from) if filters.date_from else 0
+            hi = bisect_right(self._dates, filters.date_to) if filters.date_to else len(self._dates)
+            candidates &= set(self._dated_sources[lo:hi])
+        return candidates
+
+
+class MetadataIndexFile:
+    """
+    The metadata index stored at `path`, reloaded when the file is rewritten or a new
+    ingestion completes. A stale index would short-circuit queries about records that
+    were ingested after the process started, so every lookup compares the file's
+    modification time and the ingestion marker against the loaded version.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[MetadataIndex] = None
+        self._version: Optional[Tuple[int, float]] = None
+        self._lock = threading.Lock()
+
+    def _current_version(self) -> Tuple[int, float]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        return mtime, last_ingestion_time()
+
+    def get(self) -> Optional[MetadataIndex]:
+        """Returns the current index, or None if the file does not exist."""
+        version = self._current_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._index = MetadataIndex.load(self.path)
+                    self._version = version
+        return self._index
@@ -0,0 +1,198 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import time
+from collections import Counter
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+import numpy as np
+from src.search.backend import SearchBackend, SearchHit, format_hits
+from src.search.filters import SearchFilters
+from src.shared.embeddings import MEDICAL_SYNONYMS, HashingEmbedder, tokenize
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# BM25 parameters, as in the local search backend.
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class Reranker(Protocol):
+    """The interface of a second-stage reranker."""
+    def rerank(self, query: str, hits: List[SearchHit], top_k: int) -> List[SearchHit]:
+        """Returns the `top_k` hits most relevant to the query, best first, with their new scores."""
+        ...
+
+
+_RERANKERS: Dict[str, Callable[[], Reranker]] = {}
+
+
+def register_reranker(name: str):
+    """
+    Registers a reranker factory under a name selectable with `SEARCH_RERANKER`. Use as a
+    decorator on a class or function returning a `Reranker`; heavier rerankers (a
+    cross-encoder, a ranking API) plug in the same way as the built-in lexical one.
+    """
+    def decorator(factory: Callable[[], Reranker]) -> Callable[[], Reranker]:
+        _RERANKERS[name.lower()] = factory
+        return factory
+    return decorator
+
+
+def get_reranker(name: str) -> Reranker:
+    """
+    Creates the reranker registered under `name`.
+
+    Raises:
+        ValueError: If no reranker is registered under the name.
+    """
+    factory = _RERANKERS.get(name.lower())
+    if factory is None:
+        raise ValueError(f"Unknown reranker: {name}. Registered: {', '.join(sorted(_RERANKERS))}")
+    return factory()
+
+
+def _terms(text: str) -> List[str]:
+    return [MEDICAL_SYNONYMS.get(t, t) for t in tokenize(text)]
+
+
+@register_reranker("lexical")
+class LexicalReranker:
+    """
+    Reranks the candidates with BM25 over their snippets, blended with the cosine
+    similarity of hashed embeddings and the first-stage rank.
+
+    Each snippet is scored on its own: term frequencies of the query terms are gathered
+    into a matrix and scored in one vectorized pass, with document frequencies taken from
+    the candidate set itself. A hit scores as its best snippet, and only the snippets that
+    contain a query term are kept (the best one if none does), so fewer and more relevant
+    passages reach the model. Fifty candidates take a few milliseconds on a CPU.
+    """
+    def __init__(self, embedding_weight: float = 0.3, rank_weight: float = 0.1, embedder: Optional[HashingEmbedder] = None):
+        self.embedding_weight = embedding_weight
+        self.rank_weight = rank_weight
+        self.embedder = embedder or HashingEmbedder()
+
+    def _score(self, query: str, snippets: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the relevance of each snippet, between 0 and 1, and whether it contains a query term."""
+        if not snippets:
+            return np.zeros(0), np.zeros(0, dtype=bool)
+        query_terms = sorted(set(_terms(query)))
+        column = {term: j for j, term in enumerate(query_terms)}
+        freqs = np.zeros((len(snippets), len(query_terms)))
+        lengths = np.zeros(len(snippets))
+        for i, snippet in enumerate(snippets):
+            terms = _terms(snippet)
+            lengths[i] = len(terms)
+            for term, count in Counter(t for t in terms if t in column).items():
+                freqs[i, column[term]] = count
+
+        document_freqs = np.count_nonzero(freqs, axis=0)
+        idf = np.log(1.0 + (len(snippets) - document_freqs + 0.5) / (document_freqs + 0.5))
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+        bm25 = (idf * freqs * (BM25_K1 + 1.0) / (freqs + norm[:, None])).sum(axis=1)
+        lexical = bm25 / bm25.max() if bm25.max() > 0 else bm25
+
+        semantic = np.clip(self.embedder.embed_many(snippets) @ self.embedder.embed(query), 0.0, 1.0)
+        scores = (1.0 - self.embedding_weight) * lexical + self.embedding_weight * semantic
+        return scores, bm25 > 0
+
+    def rerank(self, query: str, hits: List[SearchHit], top_k: int) -> List[SearchHit]:
+        if not hits:
+            return []
+        owners, snippets = [], []
+        for index, hit in enumerate(hits):
+            for snippet in hit.snippets:
+                owners.append(index)
+                snippets.append(snippet)
+        scores, matched = self._score(query, snippets)
+
+        owners = np.array(owners, dtype=np.int64)
+        best = np.zeros(len(hits))
+        np.maximum.at(best, owners, scores)
+        # The first-stage order breaks ties and keeps documents the remote ranker found
+        # through signals other than the snippet text.
+        best += self.rank_weight / (np.arange(len(hits)) + 1.0)
+        order = np.argsort(-best, kind="stable")[:top_k]
+
+        reranked = []
+        for index in order.tolist():
+            mine = np.flatnonzero(owners == index)
+            kept = [snippets[i] for i in mine if matched[i]]
+            if not kept and len(mine):
+                kept = [snippets[mine[np.argmax(scores[mine])]]]
+            reranked.append(replace(hits[index], snippets=kept, score=float(best[index])))
+        return reranked
+
+
+@register_reranker("none")
+class NoReranker:
+    """Keeps the first-stage order; the baseline for comparing rerankers."""
+    def rerank(self, query: str, hits: List[SearchHit], top_k: int) -> List[SearchHit]:
+        return hits[:top_k]
+
+
+class RerankingSearchBackend:
+    """
+    Two-stage retrieval: fetches `candidates` hits from a search backend and keeps the
+    best `top_k` according to a local reranker.
+
+    A relevant passage ranked below the first page by the backend can still reach the
+    agent, while the agent receives no more passages than before. The time spent
+    reranking is recorded separately from the search in `search_rerank_seconds`.
+    """
+    def __init__(self, backend: SearchBackend, reranker: Reranker, candidates: Optional[int] = None):
+        self.backend = backend
+        self.reranker = reranker
+        self.candidates = candidates or int(os.getenv("SEARCH_RERANK_CANDIDATES", "50"))
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """
+        Returns the `top_k` most relevant documents after reranking, best first.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+            top_k (int): The maximum number of documents to return.
+            timeout (Optional[float]): Deadline of the first-stage search in seconds.
+
+        Raises:
+            Exception: Any error of the underlying backend.
+        """
+        hits = self.backend.retrieve(query, filters, max(top_k, self.candidates), timeout=timeout)
+        started = time.perf_counter()
+        reranked = self.reranker.rerank(query, hits, top_k)
+        metrics.histogram("search_rerank_seconds").observe(time.perf_counter() - started)
+        metrics.histogram("search_rerank_candidates").observe(len(hits))
+        return reranked
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """
+        Executes a two-stage search and returns the consolidated context text for the agent.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+        """
+        try:
+            hits = self.retrieve(query, filters)
+            logger.info(f"Search query '{query}' returned {sum(len(h.snippets) for h in hits)} context snippets after reranking.")
+            return format_hits(hits)
+        except Exception as e:
+            logger.error(f"Error during reranked search for query '{query}': {e}")
+            return "Error retrieving documents from the search backend."
@@ -0,0 +1,306 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+from google.api_core import exceptions as google_exceptions
+from src.search.backend import SearchBackend, SearchHit, format_hits
+from src.search.filters import SearchFilters
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+from src.shared.rate_limit import RateLimitTimeout
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# Errors worth retrying: the request may succeed if sent again. A RateLimitTimeout, although
+# a TimeoutError, is not: the request was never sent, and the local budget will not admit
+# it within the deadline.
+RETRYABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.Aborted,
+    TimeoutError,
+)
+
+# Hedging starts once this many attempt latencies have been observed.
+_MIN_HEDGE_SAMPLES = 20
+_ATTEMPT_LATENCY = "search_attempt_seconds"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls are
+    refused for `reset_seconds`. Then a single trial call is let through (half-open):
+    its success closes the breaker, its failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, name: str = "search"):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            # Half-open: only one trial call at a time.
+            if self._trial_in_flight:
+                return False
+            self._state = HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed.")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+        metrics.gauge(f"{self.name}_breaker_open").set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit breaker '{self.name}' opened after {self._failures} failure(s).")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+        if self._state == OPEN:
+            metrics.gauge(f"{self.name}_breaker_open").set(1)
+
+    def release(self):
+        """Ends a call that says nothing about the dependency's health, e.g. one never sent."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class _ResultCache:
+    """LRU cache of recent successful results, served when the primary backend is unavailable."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, List[SearchHit]]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[List[SearchHit]]:
+        with self._lock:
+            hits = self._entries.get(key)
+            if hits is not None:
+                self._entries.move_to_end(key)
+            return hits
+
+    def put(self, key: Tuple, hits: List[SearchHit]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = hits
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ResilientSearchBackend:
+    """
+    Wraps a remote search backend with deadlines, retries, hedging and a circuit breaker,
+    so that one slow or failed RPC does not fail the agent's turn.
+
+    -   Every attempt gets a per-call timeout, and all attempts of a query share an
+        overall deadline, which bounds the query's latency.
+    -   Retryable errors (unavailable, deadline exceeded, throttled, ...) are retried with
+        exponential backoff and full jitter while time remains.
+    -   With hedging enabled, a second identical request is sent if the first has not
+        answered within the p95 latency observed so far; the first answer wins.
+    -   After repeated failures the circuit breaker opens and queries go straight to the
+        fallbacks: the last result seen for the same query, then the `fallback` backend
+        (e.g. the local BM25 index) if one is given.
+
+    The primary backend's `retrieve` must accept a `timeout` keyword argument.
+    """
+    def __init__(self, primary: SearchBackend, fallback: Optional[SearchBackend] = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "5"))
+        self.deadline = float(os.getenv("SEARCH_DEADLINE_SECONDS", "10"))
+        self.max_attempts = max(1, int(os.getenv("SEARCH_MAX_ATTEMPTS", "3")))
+        self.backoff_base = float(os.getenv("SEARCH_RETRY_BACKOFF_SECONDS", "0.1"))
+        self.backoff_max = float(os.getenv("SEARCH_RETRY_BACKOFF_MAX_SECONDS", "2"))
+        self.hedging = os.getenv("SEARCH_HEDGE_ENABLED", "false").lower() == "true"
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("SEARCH_BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.getenv("SEARCH_BREAKER_RESET_SECONDS", "30")),
+        )
+        self._cache = _ResultCache(int(os.getenv("SEARCH_FALLBACK_CACHE_SIZE", "1024")))
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_HEDGE_WORKERS", "16")),
+                                            thread_name_prefix="search-hedge") if self.hedging else None
+
+    def _hedge_delay(self) -> Optional[float]:
+        latency = metrics.histogram(_ATTEMPT_LATENCY)
+        if latency.count < _MIN_HEDGE_SAMPLES:
+            return None
+        return latency.percentile(95)
+
+    def _attempt(self, query: str, filters: Optional[SearchFilters], top_k: int, timeout: float) -> List[SearchHit]:
+        started = time.perf_counter()
+        hits = self.primary.retrieve(query, filters, top_k, timeout=timeout)
+        metrics.histogram(_ATTEMPT_LATENCY).observe(time.perf_counter() - started)
+        return hits
+
+    def _hedged_attempt(self, query: str, filters: Optional[SearchFilters], top_k: int, timeout: float) -> List[SearchHit]:
+        delay = self._hedge_delay()
+        if self._executor is None or delay is None or delay >= timeout:
+            return self._attempt(query, filters, top_k, timeout)
+
+        started = time.monotonic()
+        futures: List[Future] = [self._executor.submit(self._attempt, query, filters, top_k, timeout)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            metrics.counter("search_hedges_total").inc()
+            futures.append(self._executor.submit(
+                self._attempt, query, filters, top_k, max(0.0, timeout - (time.monotonic() - started))
+            ))
+
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        metrics.counter("search_hedge_wins_total").inc()
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError(f"Search attempt timed out after {timeout:.2f}s.")
+
+    def _call_primary(self, query: str, filters: Optional[SearchFilters], top_k: int, budget: float) -> List[SearchHit]:
+        deadline = time.monotonic() + budget
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return self._hedged_attempt(query, filters, top_k, min(self.timeout, remaining))
+            except RateLimitTimeout:
+                raise
+            except RETRYABLE_ERRORS as e:
+                backoff = random.uniform(0.0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                if attempt == self.max_attempts or deadline - time.monotonic() <= backoff:
+                    raise
+                logger.warning(f"Search attempt {attempt} failed ({type(e).__name__}); retrying in {backoff:.2f}s.")
+                metrics.counter("search_retries_total").inc()
+                time.sleep(backoff)
+        raise TimeoutError("Search deadline exceeded.")
+
+    def _fall_back(self, key: Tuple, query: str, filters: Optional[SearchFilters], top_k: int) -> List[SearchHit]:
+        hits = self._cache.get(key)
+        if hits is not None:
+            metrics.counter("search_fallback_cache_total").inc()
+            logger.info(f"Serving search query '{query}' from the fallback cache.")
+            return hits
+        if self.fallback is not None:
+            hits = self.fallback.retrieve(query, filters, top_k)
+            metrics.counter("search_fallback_backend_total").inc()
+            logger.info(f"Serving search query '{query}' from the fallback backend.")
+            return hits
+        raise google_exceptions.ServiceUnavailable("Search is unavailable and no fallback can answer the query.")
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
+        """
+        Retrieves the most relevant documents from the primary backend, falling back to
+        recent results or the fallback backend when it is failing.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+            top_k (int): The maximum number of documents to return.
+            timeout (Optional[float]): Overall deadline of the query in seconds, shared by
+                all attempts. Capped at `SEARCH_DEADLINE_SECONDS`.
+
+        Raises:
+            google.api_core.exceptions.GoogleAPICallError: If the primary backend fails
+                and no fallback can answer the query.
+        """
+        key = (query, repr(filters), top_k)
+        if not self.breaker.allow():
+            metrics.counter("search_breaker_rejections_total").inc()
+            return self._fall_back(key, query, filters, top_k)
+        try:
+            budget = self.deadline if timeout is None else min(self.deadline, timeout)
+            hits = self._call_primary(query, filters, top_k, budget)
+        except RateLimitTimeout as e:
+            # Refused by the local quota budget before reaching the service.
+            self.breaker.release()
+            metrics.counter("search_rate_limited_total").inc()
+            logger.warning(f"Search query '{query}' not sent: {e}")
+            return self._fall_back(key, query, filters, top_k)
+        except RETRYABLE_ERRORS as e:
+            self.breaker.record_failure()
+            logger.error(f"Search query '{query}' failed after retries: {e}")
+            return self._fall_back(key, query, filters, top_k)
+        except Exception:
+            # The service answered (e.g. rejected an invalid request), so it is available.
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self._cache.put(key, hits)
+        return hits
+
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """
+        Executes a search query and returns the consolidated context text for the agent.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+        """
+        try:
+            return format_hits(self.retrieve(query, filters))
+        except Exception as e:
+            logger.error(f"Error during search for query '{query}': {e}")
+            return "Error retrieving documents from Vertex AI Search."
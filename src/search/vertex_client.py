@@ -12,35 +12,57 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import time
+from typing import List, Optional
 from dotenv import load_dotenv
-from google.api_core.client_options import ClientOptions
+from google.api_core import exceptions as google_exceptions
 from google.cloud import discoveryengine_v1 as discoveryengine
+from src.search.backend import SearchHit, format_hits
+from src.search.filters import SearchFilters, any_of
+from src.search.metadata_index import MetadataIndex, MetadataIndexFile
+from src.shared.clients import discovery_engine_endpoint, get_document_client, get_search_client
 from src.shared.logger import setup_logger
+from src.shared.rate_limit import DISCOVERY_ENGINE, RateLimitTimeout, get_limiter
 
 logger = setup_logger(__name__)
 load_dotenv()
 
+# Above this many locally resolved source files, the structured filter expression is sent
+# instead of an explicit source_file list to keep the request small.
+MAX_SOURCE_FILE_FILTER = 100
+
 class VertexSearchClient:
     """
     Handles search queries to Vertex AI Search.
     """
-    def __init__(self):
+    def __init__(self, data_store_id: Optional[str] = None, engine_id: Optional[str] = None,
+                 metadata_index: Optional[MetadataIndex] = None,
+                 metadata_index_file: Optional[MetadataIndexFile] = None):
+        """
+        Args:
+            data_store_id (Optional[str]): The data store to search, with the optional
+                `engine_id` serving it. Both default to `DATA_STORE_ID` and `ENGINE_ID`.
+            metadata_index (Optional[MetadataIndex]): A fixed index resolving filters locally.
+            metadata_index_file (Optional[MetadataIndexFile]): The index file to resolve
+                filters with when no fixed index is given, reloaded after each ingestion.
+                Defaults to `METADATA_INDEX_PATH`.
+        """
         self.project_id = os.getenv("PROJECT_ID")
         self.location = os.getenv("LOCATION")
-        self.data_store_id = os.getenv("DATA_STORE_ID")
-        self.engine_id = os.getenv("ENGINE_ID")
+        if data_store_id:
+            self.data_store_id, self.engine_id = data_store_id, engine_id
+        else:
+            self.data_store_id = os.getenv("DATA_STORE_ID")
+            self.engine_id = os.getenv("ENGINE_ID")
 
         if not all([self.project_id, self.location, self.data_store_id]):
             logger.error("Missing one or more environment variables: PROJECT_ID, LOCATION, DATA_STORE_ID")
             raise ValueError("Missing required environment variables for VertexSearchClient.")
 
         # Set the API endpoint based on the location from .env
-        self.api_endpoint = f"{self.location}-discoveryengine.googleapis.com"
-        self.client_options = ClientOptions(api_endpoint=self.api_endpoint)
-
+        self.api_endpoint = discovery_engine_endpoint(self.location)
         logger.info(f"VertexSearchClient initializing with endpoint: {self.api_endpoint}")
-        self.search_client = discoveryengine.SearchServiceClient(client_options=self.client_options)
-        
+
         # Construct the serving_config path to target the data store directly
         # The serving config depends on whether an Engine is being used.
         if self.engine_id:
@@ -59,79 +81,177 @@ class VertexSearchClient:
                 serving_config="default_config",
             )
         logger.info(f"Using serving config: {self.serving_config}")
+
+        self._metadata_index = metadata_index
+        if metadata_index is None:
+            self._metadata_index_file = metadata_index_file or MetadataIndexFile(
+                os.getenv("METADATA_INDEX_PATH", "data/processed/metadata.jsonl")
+            )
         logger.info("VertexSearchClient initialized.")
 
-    def search(self, query: str) -> str:
+    @property
+    def metadata_index(self) -> Optional[MetadataIndex]:
+        """The index resolving filters locally, or None if there is none."""
+        if self._metadata_index is not None:
+            return self._metadata_index
+        return self._metadata_index_file.get()
+
+    @property
+    def search_client(self) -> discoveryengine.SearchServiceClient:
+        """The search client, taken from the shared client pool on every access."""
+        return get_search_client(self.location)
+
+    def _build_filter(self, filters: Optional[SearchFilters]) -> Optional[str]:
         """
-        Executes a search query against the Vertex AI Search data store.
+        Compiles structured filters into a filter expression, resolving them against the
+        local metadata index first when one is available.
+
+        Returns:
+            Optional[str]: The filter expression ("" for no filter), or None if the local
+            index proves that no document can match.
+        """
+        if filters is None or filters.is_empty():
+            return ""
+        metadata_index = self.metadata_index
+        if metadata_index is None:
+            return filters.to_expression()
+
+        matches = metadata_index.resolve(filters)
+        if not matches:
+            return None
+        if len(matches) > MAX_SOURCE_FILE_FILTER:
+            return filters.to_expression()
+        return any_of("source_file", sorted(matches))
+
+    def retrieve(self, query: str, filters: Optional[SearchFilters] = None, top_k: int = 5,
+                 timeout: Optional[float] = None) -> List[SearchHit]:
         """
+        Executes a search query against the Vertex AI Search data store and returns the
+        matching documents with their snippets, best first.
+
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+            top_k (int): The maximum number of documents to return.
+            timeout (Optional[float]): Deadline of the call in seconds, including any wait for
+                the search quota budget. When set, the client library's own retries are
+                disabled so that the caller controls retries.
+
+        Raises:
+            google.api_core.exceptions.GoogleAPICallError: If the search request fails.
+            src.shared.rate_limit.RateLimitTimeout: If the search quota budget cannot
+                admit the request within `timeout`.
+        """
+        filter_expression = self._build_filter(filters)
+        if filter_expression is None:
+            logger.info(f"Search query '{query}' short-circuited: no indexed document matches {filters}.")
+            return []
+
+        # =================================================================================================
+        # TODO: HACKATHON CHALLENGE (Pillar 1: Completeness)
+        #
+        # The current search is a basic keyword search. Your challenge is to enhance it using
+        # Vertex AI Search's advanced capabilities.
+        #
+        # REQUIREMENT: You must implement ONE of the following search enhancements:
+        #
+        #   1. HYBRID SEARCH:
+        #      - Combine keyword-based search with vector-based (semantic) search.
+        #      - This typically involves setting `query_expansion_spec` and `spell_correction_spec`
+        #        in the `SearchRequest` to leverage Vertex AI's built-in capabilities.
+        #      - HINT: Explore `query_expansion_spec` and `spell_correction_spec` within
+        #        `discoveryengine.SearchRequest`.
+        #
+        #   2. METADATA FILTERING:
+        #      - Allow the search to be filtered based on document metadata (e.g., `source_file`, `page_number`).
+        #      - This requires adding a `filter` parameter to the `SearchRequest`.
+        #      - HINT: The `filter` parameter accepts a string with filter conditions, e.g.,
+        #        `"structData.source_file:exact_match('medical_record_John_Doe.pdf')"`.
+        #
+        # =================================================================================================
+
+        content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
+            snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
+                return_snippet=True
+            ),
+            extractive_content_spec=discoveryengine.SearchRequest.ContentSearchSpec.ExtractiveContentSpec(
+                max_extractive_answer_count=1,
+                max_extractive_segment_count=1,
+            ),
+        )
+
+        request = discoveryengine.SearchRequest(
+            serving_config=self.serving_config,
+            query=query,
+            page_size=top_k,
+            content_search_spec=content_search_spec,
+            filter=filter_expression,
+        )
+        limiter = get_limiter(DISCOVERY_ENGINE)
+        started = time.monotonic()
+        limiter.acquire(timeout=timeout)
+        if timeout is not None:
+            # The RPC gets what is left of the deadline after waiting for the budget.
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise RateLimitTimeout(f"Rate limit '{DISCOVERY_ENGINE}' used up the whole {timeout:.2f}s deadline.")
         try:
-            # =================================================================================================
-            # TODO: HACKATHON CHALLENGE (Pillar 1: Completeness)
-            #
-            # The current search is a basic keyword search. Your challenge is to enhance it using
-            # Vertex AI Search's advanced capabilities.
-            #
-            # REQUIREMENT: You must implement ONE of the following search enhancements:
-            #
-            #   1. HYBRID SEARCH:
-            #      - Combine keyword-based search with vector-based (semantic) search.
-            #      - This typically involves setting `query_expansion_spec` and `spell_correction_spec`
-            #        in the `SearchRequest` to leverage Vertex AI's built-in capabilities.
-            #      - HINT: Explore `query_expansion_spec` and `spell_correction_spec` within
-            #        `discoveryengine.SearchRequest`.
-            #
-            #   2. METADATA FILTERING:
-            #      - Allow the search to be filtered based on document metadata (e.g., `source_file`, `page_number`).
-            #      - This requires adding a `filter` parameter to the `SearchRequest`.
-            #      - HINT: The `filter` parameter accepts a string with filter conditions, e.g.,
-            #        `"structData.source_file:exact_match('medical_record_John_Doe.pdf')"`.
-            #
-            # =================================================================================================
-
-            content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
-                snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
-                    return_snippet=True
-                ),
-                extractive_content_spec=discoveryengine.SearchRequest.ContentSearchSpec.ExtractiveContentSpec(
-                    max_extractive_answer_count=1,
-                    max_extractive_segment_count=1,
-                ),
-            )
+            if timeout is not None:
+                response = self.search_client.search(request, timeout=remaining, retry=None)
+            else:
+                response = self.search_client.search(request)
+        except google_exceptions.TooManyRequests:
+            limiter.penalize()
+            raise
 
-            request = discoveryengine.SearchRequest(
-                serving_config=self.serving_config,
-                query=query,
-                page_size=5,
-                content_search_spec=content_search_spec,
-            )
-            response = self.search_client.search(request)
+        hits = []
+        for rank, result in enumerate(response.results):
+            if not result.document or not result.document.derived_struct_data:
+                continue
 
-            context_snippets = []
-            for result in response.results:
-                if not result.document or not result.document.derived_struct_data:
-                    continue
+            data = result.document.derived_struct_data
+            snippets = []
 
-                data = result.document.derived_struct_data
+            if data.get("extractive_segments"):
+                for segment in data["extractive_segments"]:
+                    snippets.append(segment.get("content", ""))
 
-                if data.get("extractive_segments"):
-                    for segment in data["extractive_segments"]:
-                        context_snippets.append(segment.get("content", ""))
+            if data.get("extractive_answers"):
+                for answer in data["extractive_answers"]:
+                    snippets.append(answer.get("content", ""))
 
-                if data.get("extractive_answers"):
-                    for answer in data["extractive_answers"]:
-                        context_snippets.append(answer.get("content", ""))
+            if not snippets and data.get("snippets"):
+                for snippet in data["snippets"]:
+                    snippets.append(snippet.get("snippet", ""))
 
-                if not context_snippets and data.get("snippets"):
-                    for snippet in data["snippets"]:
-                        context_snippets.append(snippet.get("snippet", ""))
+            struct_data = result.document.struct_data or {}
+            source_file = struct_data.get("source_file") or os.path.basename(data.get("link", ""))
+            page = struct_data.get("page")
+            hits.append(SearchHit(
+                doc_id=result.document.id,
+                source_file=source_file,
+                # Filter out any potential empty strings from the results
+                snippets=[s for s in snippets if s],
+                # Results come ranked; the score only preserves that order.
+                score=1.0 / (rank + 1),
+                # Anchors of chunk-level documents (CHUNK_IMPORT_ENABLED at ingest time).
+                page=int(page) if page is not None else None,
+                section=struct_data.get("section"),
+            ))
+        return hits
 
-            # Filter out any potential empty strings from the results
-            context_snippets = [s for s in context_snippets if s]
+    def search(self, query: str, filters: Optional[SearchFilters] = None) -> str:
+        """
+        Executes a search query against the Vertex AI Search data store.
 
-            consolidated_context = "\n\n".join(context_snippets)
-            logger.info(f"Search query '{query}' returned {len(context_snippets)} context snippets.")
-            return consolidated_context if consolidated_context else "No relevant documents found."
+        Args:
+            query (str): The search query.
+            filters (Optional[SearchFilters]): Structured metadata filters narrowing the search.
+        """
+        try:
+            hits = self.retrieve(query, filters)
+            logger.info(f"Search query '{query}' returned {sum(len(h.snippets) for h in hits)} context snippets.")
+            return format_hits(hits)
 
         except Exception as e:
             logger.error(f"Error during Vertex AI Search for query '{query}': {e}")
@@ -142,7 +262,7 @@ class VertexSearchClient:
         Imports documents from a GCS URI into the Vertex AI Search data store.
         """
         try:
-            document_service_client = discoveryengine.DocumentServiceClient(client_options=self.client_options)
+            document_service_client = get_document_client(self.location)
             parent = document_service_client.branch_path(
                 project=self.project_id,
                 location=self.location,
@@ -159,6 +279,7 @@ class VertexSearchClient:
                 reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL,
             )
 
+            get_limiter(DISCOVERY_ENGINE).acquire()
             operation = document_service_client.import_documents(request=request)
             logger.info(f"Waiting for document import from GCS to complete: {operation.operation.name}")
             response = operation.result()
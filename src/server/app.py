@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from typing import AsyncIterator, Optional
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from src.agents.service import AgentService, OverloadedError
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+logger = setup_logger(__name__)
+
+DEFAULT_USER_ID = "anonymous"
+
+
+class SessionRequest(BaseModel):
+    user_id: str = DEFAULT_USER_ID
+
+
+class MessageRequest(BaseModel):
+    message: str
+    user_id: str = DEFAULT_USER_ID
+
+
+def _sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_app(service: Optional[AgentService] = None) -> FastAPI:
+    """
+    Builds the HTTP API exposing the agent.
+
+    Endpoints:
+        POST   /sessions                         Creates a session and returns its ID.
+        DELETE /sessions/{session_id}            Deletes a session and its state.
+        POST   /sessions/{session_id}/messages   Runs a turn; the reply is streamed as SSE
+                                                 `delta` events followed by `done` (or `error`).
+        GET    /healthz                          Liveness and current load.
+        GET    /metrics                          Metrics in the Prometheus text format.
+
+    A turn that arrives while the service is at capacity is rejected with 429 so that
+    clients back off instead of piling up behind a growing queue.
+    """
+    service = service or AgentService()
+    app = FastAPI(title=f"{service.app_name} agent")
+
+    @app.post("/sessions")
+    async def create_session(request: SessionRequest):
+        session_id = await service.create_session(request.user_id)
+        return {"session_id": session_id, "user_id": request.user_id}
+
+    @app.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str, user_id: str = DEFAULT_USER_ID):
+        await service.delete_session(user_id, session_id)
+        return {"deleted": session_id}
+
+    @app.post("/sessions/{session_id}/messages")
+    async def send_message(session_id: str, request: MessageRequest):
+        if not request.message.strip():
+            raise HTTPException(status_code=400, detail="Message must not be empty.")
+        if service.at_capacity():
+            raise HTTPException(status_code=429, detail="Server is at capacity.", headers={"Retry-After": "1"})
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                async for text in service.stream_reply(request.user_id, session_id, request.message):
+                    yield _sse("delta", {"text": text})
+                yield _sse("done", {})
+            except OverloadedError:
+                yield _sse("error", {"message": "Server is at capacity."})
+            except Exception as e:
+                logger.error(f"Error while streaming reply for session {session_id}: {e}")
+                yield _sse("error", {"message": "Error generating response."})
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.get("/healthz")
+    async def healthz():
+        return {
+            "status": "ok",
+            "admitted": service.admitted,
+            "max_concurrency": service.max_concurrency,
+            "max_pending": service.max_pending,
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return get_metrics().render_prometheus()
+
+    return app
+
+
+def serve(host: str = "0.0.0.0", port: int = 8080):
+    """Runs the HTTP API with uvicorn until interrupted."""
+    logger.info(f"Serving agent on http://{host}:{port}")
+    uvicorn.run(create_app(), host=host, port=port, log_level="info")
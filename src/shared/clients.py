@@ -0,0 +1,180 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import itertools
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from google.cloud import discoveryengine_v1 as discoveryengine
+from google.cloud import storage
+from google.cloud.discoveryengine_v1.services.data_store_service.transports import DataStoreServiceGrpcTransport
+from google.cloud.discoveryengine_v1.services.document_service.transports import DocumentServiceGrpcTransport
+from google.cloud.discoveryengine_v1.services.search_service.transports import SearchServiceGrpcTransport
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SEARCH = "search"
+DOCUMENT = "document"
+DATA_STORE = "data_store"
+STORAGE = "storage"
+
+# Client class and gRPC transport class for each Discovery Engine service.
+_DISCOVERY_ENGINE_SERVICES: Dict[str, Tuple[Any, Any]] = {
+    SEARCH: (discoveryengine.SearchServiceClient, SearchServiceGrpcTransport),
+    DOCUMENT: (discoveryengine.DocumentServiceClient, DocumentServiceGrpcTransport),
+    DATA_STORE: (discoveryengine.DataStoreServiceClient, DataStoreServiceGrpcTransport),
+}
+
+
+def discovery_engine_endpoint(location: str) -> str:
+    """Returns the Discovery Engine API endpoint for a location."""
+    if location == "global":
+        return "discoveryengine.googleapis.com"
+    return f"{location}-discoveryengine.googleapis.com"
+
+
+def _channel_options() -> List[Tuple[str, int]]:
+    return [
+        ("grpc.keepalive_time_ms", int(os.getenv("GRPC_KEEPALIVE_TIME_MS", "30000"))),
+        ("grpc.keepalive_timeout_ms", int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        ("grpc.max_send_message_length", -1),
+        ("grpc.max_receive_message_length", -1),
+    ]
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of Google Cloud clients.
+
+    Discovery Engine clients share a small pool of long-lived gRPC channels per endpoint,
+    so connection setup and the TLS handshake are paid once per process instead of once
+    per operation. All Discovery Engine services on the same endpoint use the same
+    channels; requests are spread over the pool round-robin.
+
+    Any client can be replaced with a local fake via `override`, e.g. in tests or when
+    running against an emulator.
+    """
+    def __init__(self, pool_size: Optional[int] = None):
+        self.pool_size = max(1, pool_size or int(os.getenv("GRPC_CHANNEL_POOL_SIZE", "1")))
+        self._lock = threading.Lock()
+        self._channels: Dict[str, list] = {}
+        self._clients: Dict[Tuple[str, str], list] = {}
+        self._counters: Dict[Tuple[str, str], Any] = {}
+        self._overrides: Dict[str, Any] = {}
+        self._storage_clients: Dict[Optional[str], storage.Client] = {}
+
+    def override(self, kind: str, client: Any):
+        """
+        Injects a client to be returned for `kind` instead of a real one.
+
+        Args:
+            kind (str): One of SEARCH, DOCUMENT, DATA_STORE or STORAGE.
+            client (Any): The client instance, typically a local fake.
+        """
+        with self._lock:
+            self._overrides[kind] = client
+        logger.info(f"Client override registered for '{kind}'.")
+
+    def clear_overrides(self):
+        with self._lock:
+            self._overrides.clear()
+
+    def _channels_for(self, endpoint: str) -> list:
+        # Callers hold self._lock.
+        channels = self._channels.get(endpoint)
+        if channels is None:
+            logger.info(f"Opening {self.pool_size} gRPC channel(s) to {endpoint}")
+            # Transports add the default port to their host, but `create_channel` does not.
+            target = endpoint if ":" in endpoint else f"{endpoint}:443"
+            channels = [
+                SearchServiceGrpcTransport.create_channel(host=target, options=_channel_options())
+                for _ in range(self.pool_size)
+            ]
+            self._channels[endpoint] = channels
+        return channels
+
+    def discovery_engine(self, kind: str, location: str) -> Any:
+        """
+        Returns a Discovery Engine client of the given kind bound to a shared channel.
+
+        Args:
+            kind (str): One of SEARCH, DOCUMENT or DATA_STORE.
+            location (str): The Discovery Engine location ('us', 'eu' or 'global').
+        """
+        endpoint = discovery_engine_endpoint(location)
+        key = (kind, endpoint)
+        with self._lock:
+            if kind in self._overrides:
+                return self._overrides[kind]
+            clients = self._clients.get(key)
+            if clients is None:
+                client_cls, transport_cls = _DISCOVERY_ENGINE_SERVICES[kind]
+                clients = [
+                    client_cls(transport=transport_cls(host=endpoint, channel=channel))
+                    for channel in self._channels_for(endpoint)
+                ]
+                self._clients[key] = clients
+                self._counters[key] = itertools.count()
+            return clients[next(self._counters[key]) % len(clients)]
+
+    def storage(self, project: Optional[str] = None) -> storage.Client:
+        """
+        Returns a shared Cloud Storage client. `STORAGE_EMULATOR_HOST` is honoured by the
+        underlying library, so the same client also works against a local emulator.
+        """
+        with self._lock:
+            if STORAGE in self._overrides:
+                return self._overrides[STORAGE]
+            client = self._storage_clients.get(project)
+            if client is None:
+                client = storage.Client(project=project)
+                self._storage_clients[project] = client
+            return client
+
+    def close(self):
+        """Closes all pooled channels and forgets cached clients."""
+        with self._lock:
+            for channels in self._channels.values():
+                for channel in channels:
+                    channel.close()
+            self._channels.clear()
+            self._clients.clear()
+            self._counters.clear()
+            self._storage_clients.clear()
+
+
+_registry = ClientRegistry()
+
+
+def get_registry() -> ClientRegistry:
+    """Returns the process-wide client registry."""
+    return _registry
+
+
+def get_search_client(location: str) -> discoveryengine.SearchServiceClient:
+    return _registry.discovery_engine(SEARCH, location)
+
+
+def get_document_client(location: str) -> discoveryengine.DocumentServiceClient:
+    return _registry.discovery_engine(DOCUMENT, location)
+
+
+def get_data_store_client(location: str) -> discoveryengine.DataStoreServiceClient:
+    return _registry.discovery_engine(DATA_STORE, location)
+
+
+def get_storage_client(project: Optional[str] = None) -> storage.Client:
+    return _registry.storage(project)
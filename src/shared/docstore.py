@@ -0,0 +1,346 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import mmap
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from src.shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DATA_FILE = "documents.bin"
+INDEX_FILE = "index.bin"
+
+# One index entry per document, sorted by document id. Each record in the data file is
+# laid out as `<doc id><metadata JSON><text>`, all UTF-8.
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("id_length", "<u4"),
+    ("meta_length", "<u4"),
+    ("text_length", "<u8"),
+])
+
+# Store files of generation N > 0 are named `documents.N.bin` and `index.N.bin`.
+_FILE_PATTERN = re.compile(r"^(documents|index)(?:\.(\d+))?\.bin$")
+# Attempts to open the newest generation while a writer may be removing older ones.
+_OPEN_ATTEMPTS = 3
+_COPY_BLOCK_SIZE = 1 << 20
+
+
+def default_path() -> str:
+    return os.getenv("DOCSTORE_PATH", "data/processed/docstore")
+
+
+def _file_name(name: str, generation: int) -> str:
+    if generation == 0:
+        return name
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{generation}{extension}"
+
+
+def _store_files(path: str) -> List[tuple]:
+    """Returns the `(kind, generation, file name)` of every store file in the directory."""
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    return [(m.group(1), int(m.group(2) or 0), m.group(0)) for m in map(_FILE_PATTERN.match, names) if m]
+
+
+def _current_generation(path: str) -> Optional[int]:
+    """Returns the newest generation whose index has been published, or None if there is none."""
+    generations = [generation for kind, generation, _ in _store_files(path) if kind == "index"]
+    return max(generations) if generations else None
+
+
+def _record_length(entry) -> int:
+    return int(entry["id_length"]) + int(entry["meta_length"]) + int(entry["text_length"])
+
+
+@dataclass
+class Document:
+    doc_id: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class DocStore:
+    """
+    Read-only view of the processed-document store written at ingest time.
+
+    The store is a directory with a data file holding every document's id, metadata and
+    text, and a compact binary index of fixed-size entries sorted by document id. Both
+    files are memory-mapped, so opening the store costs the same regardless of corpus
+    size, lookups by id are a binary search over the index, and reads slice the mapped
+    data without loading anything else.
+
+    Rebuilding or compacting the store writes a new generation of both files next to the
+    current one; the newest generation whose index exists is the one opened.
+
+    A `DocStore` is a snapshot: documents written after it was opened become visible
+    once the store is opened again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        for attempt in range(_OPEN_ATTEMPTS):
+            generation = _current_generation(path)
+            if generation is None:
+                raise FileNotFoundError(f"No document store found at {path}.")
+            try:
+                self._open(generation)
+                return
+            except FileNotFoundError:
+                # A writer removed this generation right after publishing a newer one.
+                if attempt == _OPEN_ATTEMPTS - 1:
+                    raise
+
+    def _open(self, generation: int):
+        index_path = os.path.join(self.path, _file_name(INDEX_FILE, generation))
+        with open(index_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._index = np.memmap(f, dtype=INDEX_DTYPE, mode="r")
+            else:
+                self._index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._data: Optional[mmap.mmap] = None
+        with open(os.path.join(self.path, _file_name(DATA_FILE, generation)), "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, path: Optional[str] = None) -> Optional["DocStore"]:
+        """
+        Opens the store at `path` (`DOCSTORE_PATH` by default).
+
+        Returns:
+            Optional[DocStore]: The store, or None if no store exists at the path.
+        """
+        path = path or default_path()
+        if _current_generation(path) is None:
+            logger.info(f"No document store found at {path}.")
+            return None
+        return cls(path)
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self) -> "DocStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._find(doc_id) is not None
+
+    def _id_at(self, row: int) -> bytes:
+        entry = self._index[row]
+        offset = int(entry["offset"])
+        return self._data[offset:offset + int(entry["id_length"])]
+
+    def _bisect(self, key: bytes) -> int:
+        # The first row whose id is >= key.
+        lo, hi = 0, len(self._index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, doc_id: str) -> Optional[int]:
+        key = doc_id.encode("utf-8")
+        row = self._bisect(key)
+        if row < len(self._index) and self._id_at(row) == key:
+            return row
+        return None
+
+    def raw_text(self, doc_id: str) -> Optional[memoryview]:
+        """Returns the UTF-8 text of a document as a zero-copy view of the mapped file."""
+        row = self._find(doc_id)
+        if row is None:
+            return None
+        entry = self._index[row]
+        start = int(entry["offset"]) + int(entry["id_length"]) + int(entry["meta_length"])
+        return memoryview(self._data)[start:start + int(entry["text_length"])]
+
+    def text(self, doc_id: str) -> Optional[str]:
+        raw = self.raw_text(doc_id)
+        return None if raw is None else str(raw, "utf-8")
+
+    def _document(self, row: int) -> Document:
+        entry = self._index[row]
+        offset, id_length, meta_length = int(entry["offset"]), int(entry["id_length"]), int(entry["meta_length"])
+        text_start = offset + id_length + meta_length
+        return Document(
+            doc_id=self._data[offset:offset + id_length].decode("utf-8"),
+            metadata=json.loads(self._data[offset + id_length:text_start]) if meta_length else {},
+            text=self._data[text_start:text_start + int(entry["text_length"])].decode("utf-8"),
+        )
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        row = self._find(doc_id)
+        return None if row is None else self._document(row)
+
+    def ids(self) -> Iterator[str]:
+        for row in range(len(self._index)):
+            yield self._id_at(row).decode("utf-8")
+
+    def scan(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Document]:
+        """
+        Yields the documents with ids in `[start, end)` in id order; open bounds scan
+        from the first or to the last document.
+        """
+        row = self._bisect(start.encode("utf-8")) if start else 0
+        stop = self._bisect(end.encode("utf-8")) if end else len(self._index)
+        for i in range(row, stop):
+            yield self._document(i)
+
+
+class DocStoreWriter:
+    """
+    Writes documents to the store at `path`, creating it if needed.
+
+    Texts are written block by block, so large documents are never held in memory.
+    The index is rewritten atomically when the writer is closed; a document added
+    again under an existing id replaces the previous version. Only one writer may be
+    open on a store at a time, while any number of readers can keep using it.
+
+    By default documents are appended to the current data file. Replaced versions stay
+    in it until they make up more than `compact_ratio` of its size, at which point the
+    live documents are copied to a new generation of the store. With `rebuild`, the store
+    is written from scratch as a new generation that replaces the current one on close,
+    so documents not written again are dropped. Older generations are removed once the
+    new one is published; readers that still have them open keep their mapping.
+    """
+    def __init__(self, path: Optional[str] = None, rebuild: bool = False, compact_ratio: Optional[float] = None):
+        self.path = path or default_path()
+        self.compact_ratio = compact_ratio if compact_ratio is not None else float(os.getenv("DOCSTORE_COMPACT_RATIO", "0.5"))
+        os.makedirs(self.path, exist_ok=True)
+        current = _current_generation(self.path)
+        self._appending = current is not None and not rebuild
+        self.generation = current if self._appending else (0 if current is None else current + 1)
+        self._data = open(self._data_path(self.generation), "ab" if self._appending else "wb")
+        self._entries: Dict[bytes, tuple] = {}
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.path, _file_name(DATA_FILE, generation))
+
+    def add(self, doc_id: str, blocks: Iterable[str], metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Appends a document whose text is given as an iterable of blocks.
+
+        Returns:
+            int: The size of the text in bytes.
+        """
+        key = doc_id.encode("utf-8")
+        meta = json.dumps(metadata, separators=(",", ":")).encode("utf-8") if metadata else b""
+        offset = self._data.tell()
+        self._data.write(key)
+        self._data.write(meta)
+        text_length = 0
+        for block in blocks:
+            encoded = block.encode("utf-8")
+            self._data.write(encoded)
+            text_length += len(encoded)
+        self._entries[key] = (offset, len(key), len(meta), text_length)
+        return text_length
+
+    def close(self):
+        """Flushes the data file and publishes the merged index, compacting the store if needed."""
+        if self._data.closed:
+            return
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        self._data.close()
+
+        entries: Dict[bytes, tuple] = {}
+        if self._appending:
+            with DocStore(self.path) as existing:
+                for row in range(len(existing)):
+                    entry = existing._index[row]
+                    entries[bytes(existing._id_at(row))] = tuple(int(v) for v in entry.tolist())
+        entries.update(self._entries)
+
+        index = np.array([entries[key] for key in sorted(entries)], dtype=INDEX_DTYPE)
+        self._publish(self.generation, index)
+        logger.info(f"Document store at {self.path} now holds {len(index)} documents ({len(self._entries)} written).")
+
+        if not self._appending:
+            self._remove_older(self.generation)
+            return
+        size = os.path.getsize(self._data_path(self.generation))
+        live = sum(_record_length(entry) for entry in index)
+        if size > 0 and (size - live) / size > self.compact_ratio:
+            self._compact(index, size, live)
+
+    def _publish(self, generation: int, index: np.ndarray):
+        index_path = os.path.join(self.path, _file_name(INDEX_FILE, generation))
+        tmp_path = f"{index_path}.tmp"
+        index.tofile(tmp_path)
+        os.replace(tmp_path, index_path)
+
+    def _compact(self, index: np.ndarray, size: int, live: int):
+        """Copies the live documents to a new generation of the store."""
+        generation = self.generation + 1
+        compacted = index.copy()
+        with DocStore(self.path) as store, open(self._data_path(generation), "wb") as out:
+            for row in range(len(index)):
+                start = int(index[row]["offset"])
+                end = start + _record_length(index[row])
+                compacted[row]["offset"] = out.tell()
+                for block in range(start, end, _COPY_BLOCK_SIZE):
+                    out.write(store._data[block:min(block + _COPY_BLOCK_SIZE, end)])
+            out.flush()
+            os.fsync(out.fileno())
+        self._publish(generation, compacted)
+        self._remove_older(generation)
+        self.generation = generation
+        logger.info(f"Compacted the document store at {self.path}: {size / 1e6:.1f} MB -> {live / 1e6:.1f} MB.")
+
+    def _remove_older(self, generation: int):
+        # Indexes go first, so that a reader never picks a generation whose data is gone.
+        files = sorted(_store_files(self.path), key=lambda f: f[0] != "index")
+        for kind, older, name in files:
+            if older < generation:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError as e:
+                    logger.warning(f"Could not remove {name} from the document store: {e}")
+
+    def discard(self):
+        """Closes the writer without publishing anything written to a new generation."""
+        if self._data.closed:
+            return
+        self._data.close()
+        if not self._appending:
+            os.remove(self._data_path(self.generation))
+
+    def __enter__(self) -> "DocStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # A failed rebuild leaves the current store in place; appended documents are kept.
+        if exc_type is not None and not self._appending:
+            self.discard()
+        else:
+            self.close()
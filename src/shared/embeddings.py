@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how i in is it me of on or "
+    "the their there this to was were what when where which who why with you your about tell "
+    "please show give list patient patients currently taking on".split()
+)
+
+# Abbreviations and near-synonyms common in questions about medical records, mapped to
+# one canonical term so that e.g. "meds" and "medication" embed identically.
+MEDICAL_SYNONYMS = {
+    "med": "medication", "meds": "medication", "medications": "medication", "medicine": "medication",
+    "medicines": "medication", "drug": "medication", "drugs": "medication", "prescribed": "medication",
+    "prescription": "medication", "prescriptions": "medication", "rx": "medication",
+    "bp": "pressure", "hr": "heart", "pulse": "heart", "temp": "temperature", "fever": "temperature",
+    "dx": "diagnosis", "diagnosed": "diagnosis", "diagnoses": "diagnosis", "condition": "diagnosis",
+    "doctor": "provider", "physician": "provider", "dr": "provider",
+    "complaint": "symptom", "complaints": "symptom", "symptoms": "symptom", "complaining": "symptom",
+    "visit": "date", "seen": "date", "encounter": "date",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cases the text and splits it into alphanumeric tokens without stopwords."""
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class HashingEmbedder:
+    """
+    A dependency-free text embedder for short texts such as user questions.
+
+    Words and character trigrams are hashed into a fixed number of dimensions and the
+    result is L2-normalized, so the dot product of two embeddings is their cosine
+    similarity. Common abbreviations are mapped to a canonical term first ("meds" ->
+    "medication", "bp" -> "pressure") and character trigrams bring morphological
+    variants close together. Embedding a question takes microseconds and needs no
+    network call.
+    """
+    def __init__(self, dim: int = 512, synonyms: Optional[Dict[str, str]] = None):
+        self.dim = dim
+        self.synonyms = MEDICAL_SYNONYMS if synonyms is None else synonyms
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for token in tokenize(text):
+            token = self.synonyms.get(token, token)
+            features.append(f"w:{token}")
+            padded = f"^{token}$"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vector[zlib.crc32(feature.encode("utf-8")) % self.dim] += 2.0 if feature.startswith("w:") else 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed(t) for t in texts])
@@ -0,0 +1,37 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import time
+
+# Marker file touched whenever an ingestion run completes. Caches derived from the
+# indexed data compare its modification time against their own to detect staleness.
+INGESTION_MARKER_PATH = os.getenv("INGESTION_MARKER_PATH", "data/processed/.last_ingestion")
+
+
+def mark_ingestion_complete(path: str = INGESTION_MARKER_PATH):
+    """Records that an ingestion run has just completed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{time.time()}\n")
+
+
+def last_ingestion_time(path: str = INGESTION_MARKER_PATH) -> float:
+    """
+    Returns the time of the last completed ingestion as a UNIX timestamp, or 0.0 if
+    no ingestion has been recorded.
+    """
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
@@ -0,0 +1,186 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional
+from src.shared.logger import setup_logger
+from src.shared.metrics import get_metrics
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: budgets are then per process only.
+    fcntl = None
+
+logger = setup_logger(__name__)
+metrics = get_metrics()
+
+# Named budgets, one per quota.
+DISCOVERY_ENGINE = "discovery_engine"
+GCS = "gcs"
+GEMINI = "gemini"
+
+# Default requests per second of each budget, below the default per-project quotas.
+# Override with RATE_LIMIT_<NAME>_QPS (0 disables the limit) and RATE_LIMIT_<NAME>_BURST.
+DEFAULT_QPS = {
+    DISCOVERY_ENGINE: 10.0,
+    GCS: 100.0,
+    GEMINI: 5.0,
+}
+
+# Layout of the shared state file: the token balance and the wall-clock time it was computed at.
+_STATE = struct.Struct("<dd")
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a token cannot be obtained within the caller's timeout."""
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of calls against one quota.
+
+    The bucket holds up to `burst` tokens and refills at `rate` tokens per second. Each
+    call reserves its tokens up front, letting the balance go negative, and then waits
+    until the reservation is covered; callers are therefore served in arrival order and
+    never spin. Use `acquire` from threads and `acquire_async` from coroutines.
+
+    With a `state_path`, the balance is kept in that file and updated under an exclusive
+    file lock, so that every process on the machine using the same path shares one budget.
+    `clock` (wall-clock seconds, shared between processes) and `sleep` can be replaced
+    in tests.
+    """
+    def __init__(self, name: str, rate: float, burst: Optional[float] = None, state_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.state_path = state_path if fcntl is not None else None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def _update(self, change) -> Optional[float]:
+        # Applies `change(tokens) -> (new_tokens, result)` to the current balance atomically.
+        now = self._clock()
+        with self._lock:
+            if not self.state_path:
+                tokens, result = change(self._refill(self._tokens, self._updated, now))
+                self._tokens, self._updated = tokens, now
+                return result
+            with open(os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read(_STATE.size)
+                    tokens, updated = _STATE.unpack(raw) if len(raw) == _STATE.size else (self.burst, now)
+                    tokens, result = change(self._refill(tokens, updated, now))
+                    f.seek(0)
+                    f.truncate()
+                    f.write(_STATE.pack(tokens, now))
+                    f.flush()
+                    return result
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _reserve(self, tokens: float, timeout: Optional[float]) -> float:
+        """Reserves tokens and returns how long to wait before using them."""
+        def change(balance: float):
+            wait = max(0.0, (tokens - balance) / self.rate)
+            if timeout is not None and wait > timeout:
+                return balance, None
+            return balance - tokens, wait
+
+        wait = self._update(change)
+        if wait is None:
+            metrics.counter(f"rate_limit_{self.name}_timeouts_total").inc()
+            raise RateLimitTimeout(f"Rate limit '{self.name}' would delay the call beyond {timeout:.2f}s.")
+        metrics.counter(f"rate_limit_{self.name}_acquired_total").inc()
+        if wait > 0:
+            metrics.counter(f"rate_limit_{self.name}_throttled_total").inc()
+            metrics.histogram(f"rate_limit_{self.name}_wait_seconds").observe(wait)
+        return wait
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None):
+        """
+        Blocks until `tokens` may be spent.
+
+        Raises:
+            RateLimitTimeout: If that would take longer than `timeout` seconds; no tokens
+                are consumed in that case.
+        """
+        if self.unlimited:
+            return
+        wait = self._reserve(tokens, timeout)
+        if wait > 0:
+            self._sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0, timeout: Optional[float] = None):
+        """The coroutine version of `acquire`; waiting does not block the event loop."""
+        if self.unlimited:
+            return
+        wait = self._reserve(tokens, timeout)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float = 1.0):
+        """
+        Pauses the budget for about `seconds`, e.g. after the API answered 429, so that
+        all callers back off together instead of retrying into the same quota.
+        """
+        if self.unlimited:
+            return
+        self._update(lambda balance: (min(balance, 0.0) - seconds * self.rate, None))
+        metrics.counter(f"rate_limit_{self.name}_penalties_total").inc()
+        logger.warning(f"Rate limit '{self.name}' paused for {seconds:.1f}s after a quota error.")
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """
+    Returns the process-wide limiter of a named budget, configured from the environment:
+    `RATE_LIMIT_<NAME>_QPS`, `RATE_LIMIT_<NAME>_BURST`, and `RATE_LIMIT_SHARED_DIR` to
+    share budgets between local processes.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            prefix = f"RATE_LIMIT_{name.upper()}"
+            rate = float(os.getenv(f"{prefix}_QPS", str(DEFAULT_QPS.get(name, 0.0))))
+            burst = os.getenv(f"{prefix}_BURST")
+            shared_dir = os.getenv("RATE_LIMIT_SHARED_DIR")
+            limiter = RateLimiter(
+                name,
+                rate,
+                burst=float(burst) if burst else None,
+                state_path=os.path.join(shared_dir, f"{name}.bucket") if shared_dir else None,
+            )
+            _limiters[name] = limiter
+        return limiter
@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+from src.shared.clients import get_data_store_client
 from src.shared.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -36,13 +36,7 @@ def validate_datastore(project_id: str, location: str, data_store_id: str) -> bo
 
     logger.info(f"Validating DataStore '{data_store_id}' in project '{project_id}' at location '{location}'...")
     try:
-        if location == "global":
-            client_options = None
-        else:
-            api_endpoint = f"{location}-discoveryengine.googleapis.com"
-            client_options = ClientOptions(api_endpoint=api_endpoint)
-
-        client = discoveryengine.DataStoreServiceClient(client_options=client_options)  # type: ignore
+        client = get_data_store_client(location)
         parent = f"projects/{project_id}/locations/{location}/collections/default_collection"
 
         request = discoveryengine.ListDataStoresRequest(parent=parent)  # type: ignore
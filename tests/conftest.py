@@ -0,0 +1,32 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from src.ingestion import pipeline
+from src.shared import clients
+from tests.fakes import FakeDocumentClient, FakeStorageClient
+
+
+@pytest.fixture
+def cloud(tmp_path, monkeypatch):
+    for name, value in {
+        "PROJECT_ID": "p", "LOCATION": "global", "DATA_STORE_ID": "d", "ENGINE_ID": "e", "GCS_BUCKET_NAME": "bucket",
+        "DEDUP_DB_PATH": str(tmp_path / "dedup.sqlite"), "RATE_LIMIT_GCS_QPS": "0",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(pipeline, "mark_ingestion_complete", lambda: None)
+    storage, documents = FakeStorageClient(), FakeDocumentClient()
+    clients.get_registry().override(clients.STORAGE, storage)
+    clients.get_registry().override(clients.DOCUMENT, documents)
+    yield storage, documents
+    clients.get_registry().clear_overrides()
@@ -0,0 +1,131 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""In-memory stand-ins for the Cloud Storage and Discovery Engine clients."""
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import google_crc32c
+from google.api_core import exceptions as google_exceptions
+from src.ingestion.uploader import _encode
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.size: Optional[int] = None
+        self.crc32c: Optional[str] = None
+        self.md5_hash: Optional[str] = None
+
+    def _store(self, data: bytes, composite: bool = False):
+        self.bucket.calls.append(("upload" if not composite else "compose", self.name))
+        with self.bucket.lock:
+            self.bucket.objects[self.name] = data
+        self.reload()
+        if composite:
+            # Composite objects have no MD5 hash.
+            self.md5_hash = None
+
+    def upload_from_filename(self, file_path: str, checksum: Optional[str] = None):
+        self.bucket.before_upload(self.name)
+        with open(file_path, "rb") as f:
+            self._store(f.read())
+
+    def upload_from_file(self, f, size: int, checksum: Optional[str] = None):
+        self.bucket.before_upload(self.name)
+        self._store(f.read(size))
+
+    def compose(self, sources: List["FakeBlob"]):
+        with self.bucket.lock:
+            data = b"".join(self.bucket.objects[source.name] for source in sources)
+        self._store(data, composite=True)
+
+    def reload(self):
+        with self.bucket.lock:
+            data = self.bucket.objects.get(self.name)
+        if data is None:
+            raise google_exceptions.NotFound(self.name)
+        self.size = len(data)
+        self.crc32c, self.md5_hash = _checksums(data)
+
+    def delete(self):
+        with self.bucket.lock:
+            if self.bucket.objects.pop(self.name, None) is None:
+                raise google_exceptions.NotFound(self.name)
+        self.bucket.calls.append(("delete", self.name))
+
+
+def _checksums(data: bytes):
+    return _encode(google_crc32c.Checksum(data).digest()), _encode(hashlib.md5(data).digest())
+
+
+class FakeBucket:
+    """A bucket kept in memory. `fail_uploads` names objects whose uploads raise once per entry."""
+    def __init__(self, name: str = "bucket"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.objects: Dict[str, bytes] = {}
+        self.calls: List[tuple] = []
+        self.fail_uploads: List[str] = []
+
+    def before_upload(self, name: str):
+        with self.lock:
+            if name in self.fail_uploads:
+                self.fail_uploads.remove(name)
+                raise google_exceptions.Forbidden(f"Upload of {name} refused.")
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        blob = FakeBlob(self, name)
+        try:
+            blob.reload()
+        except google_exceptions.NotFound:
+            return None
+        return blob
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.buckets: Dict[str, FakeBucket] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self.buckets.setdefault(name, FakeBucket(name))
+
+
+class FakeDocumentClient:
+    """Records import requests; `error` is raised by the import operation if set."""
+    def __init__(self):
+        self.imports: List[str] = []
+        self.error: Optional[Exception] = None
+
+    def branch_path(self, **kwargs) -> str:
+        return "projects/{project}/locations/{location}/dataStores/{data_store}/branches/{branch}".format(**kwargs)
+
+    def import_documents(self, request):
+        self.imports.extend(request.gcs_source.input_uris)
+        client = self
+
+        class Operation:
+            operation = SimpleNamespace(name="operations/import")
+            metadata = SimpleNamespace(success_count=1, failure_count=0)
+
+            def result(self):
+                if client.error is not None:
+                    raise client.error
+                return SimpleNamespace(error_samples=[])
+
+        return Operation()
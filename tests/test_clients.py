@@ -0,0 +1,33 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from src.shared import clients
+
+
+def test_channels_are_shared_and_opened_on_the_https_port(monkeypatch):
+    opened = []
+
+    def create_channel(host, options):
+        opened.append((host, dict(options)))
+        return object()
+
+    monkeypatch.setattr(clients.SearchServiceGrpcTransport, "create_channel", staticmethod(create_channel))
+    monkeypatch.setenv("GRPC_KEEPALIVE_TIMEOUT_MS", "5000")
+    registry = clients.ClientRegistry(pool_size=2)
+    with registry._lock:
+        first = registry._channels_for("us-discoveryengine.googleapis.com")
+        second = registry._channels_for("us-discoveryengine.googleapis.com")
+
+    assert first is second
+    assert [host for host, _ in opened] == ["us-discoveryengine.googleapis.com:443"] * 2
+    assert opened[0][1]["grpc.keepalive_timeout_ms"] == 5000
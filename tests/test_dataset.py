@@ -0,0 +1,90 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import pytest
+from src.evaluation import dataset
+from src.evaluation.dataset import CONTEXT_ID, GoldenDataset, convert_jsonl, export_jsonl
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+CONTEXTS = [f"Patient {i} reports lower back pain. Follow up in two weeks." for i in range(5)]
+ROWS = [
+    {"context": CONTEXTS[i % 5], "question": f"Question {i}?", "reference_answer": f"Answer {i}.",
+     "source_file": f"record_{i % 5}.pdf"}
+    for i in range(20)
+]
+
+
+def write_legacy(path, rows=ROWS):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def converted(tmp_path):
+    directory = str(tmp_path / "golden")
+    assert convert_jsonl(write_legacy(tmp_path / "golden.jsonl"), directory) == len(ROWS)
+    return directory
+
+
+def test_jsonl_round_trip(tmp_path, converted):
+    assert len(GoldenDataset.open(converted)) == len(ROWS)
+    assert export_jsonl(GoldenDataset.open(converted), str(tmp_path / "exported.jsonl")) == len(ROWS)
+    with open(tmp_path / "exported.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == ROWS
+
+
+def test_contexts_are_stored_once(converted):
+    contexts = pq.read_table(f"{converted}/{dataset.CONTEXTS_FILE}")
+    assert contexts.num_rows == len(CONTEXTS)
+    golden = GoldenDataset.open(converted)
+    questions = golden.questions(columns=["question", CONTEXT_ID])
+    assert set(questions[0]) == {"question", CONTEXT_ID}
+    assert set(golden.contexts(q[CONTEXT_ID] for q in questions).values()) == set(CONTEXTS)
+
+
+def test_limit_and_sample(tmp_path, converted):
+    golden = GoldenDataset.open(converted)
+    assert [q["question"] for q in golden.questions(limit=3)] == ["Question 0?", "Question 1?", "Question 2?"]
+
+    sample = golden.rows(sample=4, seed=7)
+    assert len(sample) == 4 and sample == golden.rows(sample=4, seed=7)
+    # Sampled rows keep the dataset order and carry their context.
+    assert [r["question"] for r in sample] == [r["question"] for r in ROWS if r in sample]
+    # The legacy format draws the same sample.
+    legacy = GoldenDataset.open(str(tmp_path / "golden.jsonl"))
+    assert legacy.rows(sample=4, seed=7) == sample
+
+
+def test_legacy_path_without_extension(tmp_path):
+    write_legacy(tmp_path / "golden.jsonl")
+    golden = GoldenDataset.open(str(tmp_path / "golden"))
+    assert golden.rows(limit=2) == ROWS[:2]
+    with pytest.raises(FileNotFoundError):
+        GoldenDataset.open(str(tmp_path / "missing"))
+
+
+def test_later_batches_follow_the_schema_of_the_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, "_CONVERT_BATCH", 2)
+    rows = [dict(row) for row in ROWS[:5]]
+    rows[0]["difficulty"] = "easy"
+    rows[3]["category"] = "vitals"
+    directory = str(tmp_path / "golden")
+    dataset.write_dataset(directory, rows)
+
+    loaded = GoldenDataset.open(directory).rows()
+    assert [r.get("difficulty") for r in loaded] == ["easy", None, None, None, None]
+    assert all("category" not in r for r in loaded)
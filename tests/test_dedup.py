@@ -0,0 +1,129 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import numpy as np
+import pytest
+from src.ingestion.dedup import Deduplicator, Fingerprinter, similarity
+
+NOTE = (
+    "PATIENT ENCOUNTER NOTE Patient: Jessica Woodward Date: 2025-07-28 Provider: Dr. Martinez "
+    "SUBJECTIVE: Patient presents today complaining of lower back pain which started approximately "
+    "2 weeks ago. They describe the pain as a 5/10 and report difficulty sleeping. "
+    "ASSESSMENT: Findings are consistent with Type 2 Diabetes. PLAN: Prescribed Metformin 500mg."
+)
+
+
+def fingerprint(text, block_size=None):
+    fingerprinter = Fingerprinter()
+    if block_size is None:
+        fingerprinter.update(text)
+    else:
+        for i in range(0, len(text), block_size):
+            fingerprinter.update(text[i:i + block_size])
+    return fingerprinter.finish()
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64])
+def test_fingerprint_does_not_depend_on_block_boundaries(block_size):
+    whole, blocks = fingerprint(NOTE), fingerprint(NOTE, block_size)
+    assert blocks.exact_hash == whole.exact_hash
+    assert np.array_equal(blocks.signature, whole.signature)
+    assert blocks.tokens == whole.tokens
+
+
+def test_fingerprint_normalizes_case_and_whitespace():
+    assert fingerprint(NOTE.upper().replace(" ", "\n  ")).exact_hash == fingerprint(NOTE).exact_hash
+
+
+def test_similarity_separates_near_duplicates_from_different_texts():
+    base = fingerprint(NOTE).signature
+    edited = fingerprint(NOTE.replace("difficulty sleeping", "trouble sleeping")).signature
+    other = fingerprint("Completely unrelated text about the weather in the mountains this weekend.").signature
+    assert similarity(base, base) == 1.0
+    assert similarity(base, edited) > 0.6
+    assert similarity(base, other) < 0.1
+
+
+def test_short_texts_get_a_signature():
+    short = fingerprint("flu shot")
+    assert short.tokens == 2
+    assert short.signature.min() < np.iinfo(np.uint32).max
+
+
+@pytest.fixture
+def deduplicator(tmp_path):
+    dedup = Deduplicator(db_path=str(tmp_path / "dedup.sqlite"), threshold=0.6)
+    yield dedup
+    dedup.close()
+
+
+def test_exact_duplicate_is_detected(deduplicator):
+    fields = {"patient": "Jessica Woodward", "date": "2025-07-28"}
+    assert deduplicator.check("a", fingerprint(NOTE), fields).canonical is None
+    decision = deduplicator.check("b", fingerprint(NOTE.upper()), fields)
+    assert (decision.canonical, decision.kind) == ("a", "exact")
+
+
+def test_near_duplicate_is_detected(deduplicator):
+    fields = {"patient": "Jessica Woodward", "date": "2025-07-28"}
+    deduplicator.check("a", fingerprint(NOTE), fields)
+    decision = deduplicator.check("b", fingerprint(NOTE.replace("difficulty sleeping", "trouble sleeping")), fields)
+    assert (decision.canonical, decision.kind) == ("a", "near")
+    assert decision.similarity >= deduplicator.threshold
+
+
+def test_records_of_other_patients_or_dates_are_never_merged(deduplicator):
+    deduplicator.check("a", fingerprint(NOTE), {"patient": "Jessica Woodward", "date": "2025-07-28"})
+    other_patient = fingerprint(NOTE.replace("difficulty sleeping", "trouble sleeping"))
+    other_date = fingerprint(NOTE.replace("difficulty sleeping", "poor sleep"))
+    assert deduplicator.check("b", other_patient, {"patient": "John Doe", "date": "2025-07-28"}).canonical is None
+    assert deduplicator.check("c", other_date, {"patient": "Jessica Woodward", "date": "2025-08-01"}).canonical is None
+
+
+def test_reingesting_a_document_replaces_its_fingerprint(deduplicator):
+    fields = {"patient": "Jessica Woodward"}
+    deduplicator.check("a", fingerprint(NOTE), fields)
+    assert deduplicator.check("a", fingerprint(NOTE), fields).canonical is None
+    assert deduplicator.check("a", fingerprint("A rewritten note with other content entirely."), fields).canonical is None
+    # The old text of "a" is forgotten, so the same text under another id is canonical.
+    assert deduplicator.check("b", fingerprint(NOTE), fields).canonical is None
+
+
+def test_aliases_and_struct_data_are_persisted(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    dedup = Deduplicator(db_path=path)
+    dedup.check("a", fingerprint(NOTE), {"patient": "Jessica Woodward"})
+    dedup.add_alias("a", "b")
+    dedup.add_alias("a", "b")
+    dedup.close()
+
+    reopened = Deduplicator(db_path=path)
+    assert reopened.aliases("a") == ["b"]
+    assert reopened.struct_data("a") == {"patient": "Jessica Woodward"}
+    assert reopened.check("c", fingerprint(NOTE), {}).canonical == "a"
+    reopened.close()
+
+
+def test_forgotten_canonicals_no_longer_absorb_duplicates(tmp_path):
+    dedup = Deduplicator(db_path=str(tmp_path / "dedup.sqlite"))
+    data = {"patient": "Jessica Woodward", "date": "2025-07-28"}
+    assert dedup.check("a", fingerprint(NOTE), data).canonical is None
+    assert dedup.check("b", fingerprint(NOTE), data).canonical == "a"
+    dedup.add_alias("a", "b.pdf")
+    dedup.add_alias("a", "c.pdf")
+
+    dedup.forget("a", ["b.pdf"])
+    assert dedup.struct_data("a") is None
+    assert dedup.aliases("a") == ["c.pdf"]
+    assert dedup.check("b", fingerprint(NOTE), data).canonical is None
+    dedup.close()
@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import pytest
+from src.shared.docstore import DocStore, DocStoreWriter
+
+
+def write(path, documents, **kwargs):
+    with DocStoreWriter(path, **kwargs) as writer:
+        for doc_id, text in documents.items():
+            writer.add(doc_id, [text[:3], text[3:]], {"source_file": f"{doc_id}.pdf"})
+
+
+def data_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.startswith("documents"))
+
+
+def test_documents_are_read_back_by_id_and_range(tmp_path):
+    path = str(tmp_path)
+    write(path, {"b": "second text", "a": "first text", "c": "third text"})
+    with DocStore.open(path) as store:
+        assert len(store) == 3
+        assert store.text("a") == "first text"
+        assert store.get("b").metadata == {"source_file": "b.pdf"}
+        assert "d" not in store and store.get("d") is None
+        assert [d.doc_id for d in store.scan("b")] == ["b", "c"]
+        assert list(store.ids()) == ["a", "b", "c"]
+
+
+def test_appended_documents_replace_earlier_versions(tmp_path):
+    path = str(tmp_path)
+    write(path, {"a": "first text", "b": "second text"})
+    write(path, {"a": "first text, revised"}, compact_ratio=1.0)
+    with DocStore.open(path) as store:
+        assert (store.text("a"), store.text("b")) == ("first text, revised", "second text")
+
+
+def test_rebuild_drops_documents_not_written_again(tmp_path):
+    path = str(tmp_path)
+    write(path, {"a": "first text", "b": "second text"})
+    old = DocStore.open(path)
+    write(path, {"b": "second text"}, rebuild=True)
+
+    with DocStore.open(path) as store:
+        assert list(store.ids()) == ["b"]
+    assert sorted(os.listdir(path)) == ["documents.1.bin", "index.1.bin"]
+    # A reader opened before the rebuild keeps its snapshot.
+    assert old.text("a") == "first text"
+    old.close()
+
+
+def test_failed_rebuild_keeps_the_current_store(tmp_path):
+    path = str(tmp_path)
+    write(path, {"a": "first text"})
+    with pytest.raises(RuntimeError):
+        with DocStoreWriter(path, rebuild=True) as writer:
+            writer.add("b", ["second text"])
+            raise RuntimeError("ingestion failed")
+    with DocStore.open(path) as store:
+        assert list(store.ids()) == ["a"]
+    assert sorted(os.listdir(path)) == ["documents.bin", "index.bin"]
+
+
+def test_store_is_compacted_once_replaced_versions_dominate(tmp_path):
+    path = str(tmp_path)
+    text = "x" * 1000
+    write(path, {"a": text, "b": text})
+    write(path, {"a": text + "!"}, compact_ratio=0.4)
+    assert data_size(path) > 3000
+    write(path, {"a": text + "!!"}, compact_ratio=0.4)
+
+    assert data_size(path) < 2100
+    assert sorted(os.listdir(path)) == ["documents.1.bin", "index.1.bin"]
+    with DocStore.open(path) as store:
+        assert (store.text("a"), store.text("b")) == (text + "!!", text)
+        assert store.get("b").metadata == {"source_file": "b.pdf"}
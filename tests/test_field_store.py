@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from src.search.field_store import FieldStore
+
+RECORDS = {
+    "a": {"source_file": "a.pdf", "patient": "Jessica Woodward", "date": "2025-07-28",
+          "heart_rate": 96, "temperature_f": 99.1, "diagnosis": "Type 2 Diabetes"},
+    "b": {"source_file": "b.pdf", "patient": "Jessica Woodward", "date": "2025-08-15",
+          "heart_rate": 88, "diagnosis": "type 2 diabetes"},
+    "c": {"source_file": "c.pdf", "patient": "John Doe", "date": "2025-06-02", "diagnosis": "Osteoarthritis"},
+}
+
+
+@pytest.fixture
+def store():
+    return FieldStore.from_records(RECORDS)
+
+
+def doc_ids(store, rows):
+    return sorted(store.doc_ids[rows].tolist())
+
+
+def test_numeric_conditions_skip_missing_values(store):
+    assert doc_ids(store, store.where(("heart_rate", ">", 90))) == ["a"]
+    assert doc_ids(store, store.where(("heart_rate", "<", 100))) == ["a", "b"]
+    assert doc_ids(store, store.where(("heart_rate", "!=", 96))) == ["b"]
+
+
+def test_text_conditions_are_case_insensitive(store):
+    assert doc_ids(store, store.where(("diagnosis", "=", "TYPE 2 DIABETES"))) == ["a", "b"]
+    assert doc_ids(store, store.where(("provider", "!=", "Dr. Smith"))) == []
+
+
+def test_conditions_are_combined(store):
+    assert doc_ids(store, store.where(("diagnosis", "=", "type 2 diabetes"), ("heart_rate", ">=", 90))) == ["a"]
+    assert doc_ids(store, store.where()) == ["a", "b", "c"]
+
+
+def test_unknown_fields_and_operators_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.where(("weight", ">", 80))
+    with pytest.raises(ValueError):
+        store.where(("heart_rate", "~", 80))
+
+
+def test_records_are_found_by_patient_most_recent_first(store):
+    assert store.find_patients("What is the heart rate of jessica  woodward?") == ["Jessica Woodward"]
+    assert [r["doc_id"] for r in store.records_for("JESSICA WOODWARD")] == ["b", "a"]
+    assert store.records_for("Jane Roe") == []
+
+
+def test_round_trip_through_a_file(store, tmp_path):
+    path = str(tmp_path / "fields.npz")
+    store.save(path)
+    loaded = FieldStore.load(path)
+    assert loaded.to_records() == store.to_records()
+    assert loaded.get("a")["heart_rate"] == 96
+    assert "heart_rate" not in loaded.get("c")
+    assert FieldStore.load(str(tmp_path / "missing.npz")) is None
@@ -0,0 +1,51 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+from src.search import metadata_index
+from src.search.filters import SearchFilters
+from src.search.metadata_index import MetadataIndexFile
+
+
+def write_index(path, patients):
+    with open(path, "w", encoding="utf-8") as f:
+        for patient in patients:
+            f.write(json.dumps({"structData": {"source_file": f"{patient}.pdf", "patient": patient}}) + "\n")
+
+
+def test_index_is_reloaded_when_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_index, "last_ingestion_time", lambda: 0.0)
+    path = tmp_path / "metadata.jsonl"
+    index_file = MetadataIndexFile(str(path))
+    assert index_file.get() is None
+
+    write_index(path, ["Jessica Woodward"])
+    assert index_file.get().resolve(SearchFilters(patient="John Doe")) == set()
+
+    write_index(path, ["Jessica Woodward", "John Doe"])
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+    assert index_file.get().resolve(SearchFilters(patient="John Doe")) == {"John Doe.pdf"}
+
+
+def test_index_is_reloaded_after_an_ingestion(tmp_path, monkeypatch):
+    ingested_at = [1.0]
+    monkeypatch.setattr(metadata_index, "last_ingestion_time", lambda: ingested_at[0])
+    path = tmp_path / "metadata.jsonl"
+    write_index(path, ["Jessica Woodward"])
+    index_file = MetadataIndexFile(str(path))
+    first = index_file.get()
+    assert index_file.get() is first
+
+    ingested_at[0] = 2.0
+    assert index_file.get() is not first
@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import pytest
+from src.ingestion import ocr
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    # One worker, so the second page waits in the queue while the first is processed.
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(ocr, "_pool", executor)
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+    monkeypatch.setattr(ocr, "OCR_PAGE_TIMEOUT_SECONDS", 0.4)
+    monkeypatch.setattr(ocr, "_RESULT_GRACE_SECONDS", 0.0)
+    monkeypatch.setattr(ocr, "_QUEUED_POLL_SECONDS", 0.01)
+    yield executor
+    executor.shutdown()
+
+
+def test_page_timeout_starts_when_the_job_runs(pool, monkeypatch):
+    def slow_ocr(images, timeout):
+        time.sleep(0.3)
+        return images[0].decode()
+
+    monkeypatch.setattr(ocr, "_ocr_images", slow_ocr)
+    first = ocr.PendingPage(1, [b"first"])
+    second = ocr.PendingPage(2, [b"second"])
+    # The second page finishes 0.6s after submission, longer than the page timeout.
+    assert first.result() == "first"
+    assert second.result() == "second"
+    # Results are cached by the hash of the page images.
+    assert ocr.PendingPage(3, [b"second"]).result() == "second"
+
+
+def test_unresponsive_worker_is_given_up_on(pool, monkeypatch):
+    monkeypatch.setattr(ocr, "_ocr_images", lambda images, timeout: time.sleep(1.0) or "late")
+    started = time.monotonic()
+    assert ocr.PendingPage(1, [b"page"]).result() is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_worker_shares_the_page_timeout_between_images(monkeypatch):
+    timeouts = []
+
+    class FakeTesseract:
+        @staticmethod
+        def image_to_string(image, timeout):
+            timeouts.append(timeout)
+            time.sleep(0.05)
+            return "text"
+
+    monkeypatch.setattr(ocr, "pytesseract", FakeTesseract)
+    monkeypatch.setattr(ocr, "Image", type("FakeImage", (), {"open": staticmethod(lambda data: nullcontext(data))}))
+    assert ocr._ocr_images([b"a", b"b"], timeout=1.0) == "text\ntext"
+    assert timeouts[0] <= 1.0 and timeouts[1] < timeouts[0]
+    with pytest.raises(TimeoutError):
+        ocr._ocr_images([b"a", b"b", b"c"], timeout=0.08)
@@ -0,0 +1,88 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import base64
+import json
+import pytest
+from src.ingestion import pipeline
+
+NOTE = "PATIENT ENCOUNTER NOTE\nPatient: {name}\nDate: 2025-07-28\n\nSUBJECTIVE:\n{body}\n\nPLAN:\nFollow up in two weeks.\n"
+
+
+def write_note(directory, name, body):
+    path = directory / f"{name.replace(' ', '_')}.txt"
+    path.write_text(NOTE.format(name=name, body=body), encoding="utf-8")
+    return path
+
+
+def chunk_text(entry):
+    return base64.b64decode(entry["content"]["rawBytes"]).decode("utf-8")
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_chunks_cover_documents_longer_than_the_extraction_limit(tmp_path, cloud, monkeypatch):
+    monkeypatch.setattr(pipeline, "MAX_EXTRACTION_CHARS", 2000)
+    monkeypatch.setattr(pipeline, "CHUNK_IMPORT_ENABLED", True)
+    monkeypatch.setattr(pipeline, "CHUNK_SIZE", 500)
+    input_dir, output_dir = tmp_path / "raw", tmp_path / "processed"
+    input_dir.mkdir()
+    body = "\n".join(f"Line {i} of a long history of lower back pain." for i in range(400))
+    write_note(input_dir, "Jessica Woodward", body + "\nLAST LINE")
+
+    pipeline.run_ingestion(str(input_dir), str(output_dir))
+
+    entries = read_jsonl(output_dir / "metadata.jsonl")
+    assert max(e["structData"]["chunk_offset"] for e in entries) > 2000
+    assert any("LAST LINE" in chunk_text(e) for e in entries)
+
+
+def test_a_failed_import_is_raised(tmp_path, cloud):
+    storage, documents = cloud
+    documents.error = RuntimeError("import refused")
+    input_dir = tmp_path / "raw"
+    input_dir.mkdir()
+    write_note(input_dir, "Jessica Woodward", "Lower back pain.")
+
+    with pytest.raises(RuntimeError, match="import refused"):
+        pipeline.run_ingestion(str(input_dir), str(tmp_path / "processed"))
+
+
+def test_a_missing_bucket_is_raised(tmp_path, cloud, monkeypatch):
+    monkeypatch.delenv("GCS_BUCKET_NAME")
+    with pytest.raises(ValueError):
+        pipeline.run_ingestion(str(tmp_path), str(tmp_path / "processed"))
+
+
+def test_duplicates_of_a_failed_canonical_are_retried(tmp_path, cloud):
+    storage, documents = cloud
+    input_dir, output_dir = tmp_path / "raw", tmp_path / "processed"
+    input_dir.mkdir()
+    body = "\n".join(f"Line {i} of a long history of lower back pain, treated with physical therapy." for i in range(40))
+    original = write_note(input_dir, "Jessica Woodward", body)
+    copy = input_dir / "Jessica_Woodward_copy.txt"
+    copy.write_text(original.read_text(encoding="utf-8").replace("Line 7 ", "Line seven "), encoding="utf-8")
+    files = [str(original), str(copy)]
+
+    storage.bucket("bucket").fail_uploads.append("raw/Jessica_Woodward.txt")
+    assert pipeline.run_ingestion(str(input_dir), str(output_dir), files=files) == sorted(files)
+    assert documents.imports == []
+
+    # Neither file is left registered as a document or a duplicate of one that was never indexed.
+    assert pipeline.run_ingestion(str(input_dir), str(output_dir), files=files) == []
+    entries = read_jsonl(output_dir / "metadata_batch.jsonl")
+    assert [e["structData"]["source_file"] for e in entries] == ["Jessica_Woodward.txt"]
+    assert entries[0]["structData"]["aliases"] == ["Jessica_Woodward_copy.txt"]
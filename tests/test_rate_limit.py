@@ -0,0 +1,126 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import time
+import pytest
+from src.shared import rate_limit
+from src.shared.rate_limit import RateLimiter, RateLimitTimeout
+
+
+class FakeClock:
+    """A clock that only moves when the limiter sleeps or the test advances it."""
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+def limiter(clock, rate=2.0, burst=None, state_path=None, name="test"):
+    return RateLimiter(name, rate, burst=burst, state_path=state_path, clock=clock, sleep=clock.sleep)
+
+
+def test_burst_is_served_then_calls_are_paced():
+    clock = FakeClock()
+    budget = limiter(clock, rate=2.0, burst=2)
+    for _ in range(4):
+        budget.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_idle_time_refills_up_to_the_burst():
+    clock = FakeClock()
+    budget = limiter(clock, rate=2.0, burst=2)
+    budget.acquire(2)
+    clock.now += 100
+    for _ in range(3):
+        budget.acquire()
+    assert clock.sleeps == [0.5]
+
+
+def test_timeout_raises_without_consuming_tokens():
+    clock = FakeClock()
+    budget = limiter(clock, rate=1.0, burst=1)
+    budget.acquire()
+    with pytest.raises(RateLimitTimeout):
+        budget.acquire(timeout=0.5)
+    # The refused call reserved nothing: a second later the token is there.
+    clock.now += 1.0
+    budget.acquire(timeout=0.0)
+    assert clock.sleeps == []
+
+
+def test_penalize_pauses_every_caller():
+    clock = FakeClock()
+    budget = limiter(clock, rate=2.0, burst=2)
+    budget.penalize(1.0)
+    # The burst is forfeited and one second of tokens is owed before the next call.
+    budget.acquire()
+    assert clock.sleeps == [1.5]
+
+
+def test_zero_rate_disables_the_limit():
+    clock = FakeClock()
+    budget = limiter(clock, rate=0.0)
+    for _ in range(100):
+        budget.acquire(timeout=0.0)
+    budget.penalize()
+    assert clock.sleeps == []
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="budgets are shared through fcntl locks")
+def test_limiters_with_the_same_state_file_share_one_budget(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "shared" / "test.bucket")
+    first, second = limiter(clock, rate=1.0, burst=2, state_path=path), limiter(clock, rate=1.0, burst=2, state_path=path)
+    first.acquire(2)
+    second.acquire()
+    assert clock.sleeps == [1.0]
+    # A penalty applied by one process is seen by the other.
+    second.penalize(2.0)
+    first.acquire()
+    assert clock.sleeps == [1.0, 3.0]
+
+
+def test_acquire_async_waits_in_order_without_blocking_the_loop():
+    # The clock is frozen, so the waits are exactly the reserved ones and run on the real loop.
+    clock = FakeClock()
+    budget = limiter(clock, rate=20.0, burst=1)
+    finished, ticks = [], []
+
+    async def call(n):
+        await budget.acquire_async()
+        finished.append(n)
+
+    async def ticker():
+        while len(finished) < 3:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(ticker(), *(call(n) for n in range(3)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    assert finished == [0, 1, 2]
+    assert 0.09 <= elapsed < 0.5
+    assert len(ticks) >= 5
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(budget.acquire_async(timeout=0.01))
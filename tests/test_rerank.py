@@ -0,0 +1,86 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from src.search.backend import SearchHit
+from src.search.rerank import LexicalReranker, NoReranker, RerankingSearchBackend, get_reranker, metrics
+
+
+def hit(doc_id, *snippets):
+    return SearchHit(doc_id=doc_id, source_file=f"{doc_id}.pdf", snippets=list(snippets), score=1.0)
+
+
+HITS = [
+    hit("a", "Follow up in two weeks.", "Patient reports a mild headache."),
+    hit("b", "Blood pressure 150/95, hypertension uncontrolled.", "Lisinopril increased to 20 mg."),
+    hit("c", "Annual physical, no complaints."),
+]
+
+
+class FakeBackend:
+    def __init__(self, hits):
+        self.hits = hits
+        self.requests = []
+
+    def retrieve(self, query, filters=None, top_k=5, timeout=None):
+        self.requests.append((top_k, timeout))
+        return self.hits[:top_k]
+
+
+def test_lexical_reranker_promotes_matching_documents():
+    reranked = LexicalReranker().rerank("hypertension blood pressure", HITS, top_k=2)
+    assert [h.doc_id for h in reranked] == ["b", "a"]
+    assert reranked[0].score > reranked[1].score
+    # Only the passages containing a query term are kept.
+    assert reranked[0].snippets == ["Blood pressure 150/95, hypertension uncontrolled."]
+
+
+def test_lexical_reranker_keeps_the_best_snippet_of_unmatched_documents():
+    reranked = LexicalReranker().rerank("hypertension", HITS, top_k=3)
+    assert [h.doc_id for h in reranked][0] == "b"
+    assert all(len(h.snippets) == 1 for h in reranked[1:])
+    assert LexicalReranker().rerank("hypertension", [], top_k=3) == []
+
+
+def test_no_reranker_keeps_the_first_stage_order():
+    assert NoReranker().rerank("hypertension", HITS, top_k=2) == HITS[:2]
+
+
+def test_get_reranker():
+    assert isinstance(get_reranker("LEXICAL"), LexicalReranker)
+    with pytest.raises(ValueError, match="lexical"):
+        get_reranker("cross-encoder")
+
+
+def test_reranking_backend_over_fetches_candidates():
+    backend = FakeBackend(HITS)
+    rerank_seconds = metrics.histogram("search_rerank_seconds").count
+    candidates = metrics.histogram("search_rerank_candidates")
+    observed = candidates.count, candidates.sum
+
+    reranked = RerankingSearchBackend(backend, LexicalReranker(), candidates=50).retrieve(
+        "hypertension", top_k=1, timeout=2.0
+    )
+    assert backend.requests == [(50, 2.0)]
+    assert [h.doc_id for h in reranked] == ["b"]
+    assert metrics.histogram("search_rerank_seconds").count == rerank_seconds + 1
+    assert (candidates.count, candidates.sum) == (observed[0] + 1, observed[1] + len(HITS))
+
+
+def test_reranking_backend_reports_errors_to_the_agent():
+    class FailingBackend:
+        def retrieve(self, query, filters=None, top_k=5, timeout=None):
+            raise RuntimeError("unavailable")
+
+    text = RerankingSearchBackend(FailingBackend(), NoReranker(), candidates=10).search("hypertension")
+    assert text.startswith("Error retrieving documents")
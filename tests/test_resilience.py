@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+import pytest
+from google.api_core import exceptions as google_exceptions
+from src.search import local_client
+from src.search.backend import SearchHit
+from src.search.local_client import LocalFallbackClient
+from src.search.resilience import CLOSED, ResilientSearchBackend
+from src.shared.docstore import DocStoreWriter
+from src.shared.rate_limit import RateLimitTimeout
+
+HIT = SearchHit(doc_id="a", source_file="a.pdf", snippets=["text"], score=1.0)
+
+
+class FakeBackend:
+    """Fails with the queued errors, then answers; records the timeout of every attempt."""
+    def __init__(self, errors=(), latency=0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.timeouts = []
+
+    def retrieve(self, query, filters=None, top_k=5, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+        return [HIT]
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setenv("SEARCH_TIMEOUT_SECONDS", "5")
+    monkeypatch.setenv("SEARCH_DEADLINE_SECONDS", "10")
+    monkeypatch.setenv("SEARCH_RETRY_BACKOFF_SECONDS", "0.01")
+    monkeypatch.setenv("SEARCH_BREAKER_FAILURES", "2")
+
+
+def test_retryable_errors_are_retried():
+    primary = FakeBackend([google_exceptions.ServiceUnavailable("down")])
+    assert ResilientSearchBackend(primary).retrieve("query") == [HIT]
+    assert len(primary.timeouts) == 2
+
+
+def test_timeout_argument_bounds_every_attempt():
+    primary = FakeBackend()
+    ResilientSearchBackend(primary).retrieve("query", timeout=0.5)
+    assert 0 < primary.timeouts[0] <= 0.5
+
+
+def test_no_attempt_is_made_without_time_left():
+    backend = ResilientSearchBackend(FakeBackend())
+    with pytest.raises(TimeoutError):
+        backend._call_primary("query", None, 5, budget=0.0)
+    assert backend.primary.timeouts == []
+
+
+def test_exhausted_deadline_falls_back_to_the_last_result():
+    primary = FakeBackend()
+    backend = ResilientSearchBackend(primary)
+    assert backend.retrieve("query") == [HIT]
+    primary.errors = [google_exceptions.DeadlineExceeded("slow")] * 3
+    primary.latency = 0.05
+    assert backend.retrieve("query", timeout=0.06) == [HIT]
+    assert all(t > 0 for t in primary.timeouts)
+
+
+def test_breaker_opens_after_repeated_failures():
+    primary = FakeBackend([google_exceptions.ServiceUnavailable("down")] * 6)
+    backend = ResilientSearchBackend(primary, fallback=FakeBackend())
+    backend.retrieve("first")
+    backend.retrieve("second")
+    calls = len(primary.timeouts)
+    assert backend.retrieve("third") == [HIT]
+    assert len(primary.timeouts) == calls
+
+
+def test_rate_limit_timeouts_are_not_retried_nor_counted_as_failures():
+    primary = FakeBackend([RateLimitTimeout("budget exhausted")] * 3)
+    backend = ResilientSearchBackend(primary, fallback=FakeBackend())
+    for _ in range(3):
+        assert backend.retrieve("query") == [HIT]
+    assert len(primary.timeouts) == 3
+    assert backend.breaker.state == CLOSED
+
+
+def test_local_fallback_is_built_lazily_and_rebuilt_after_ingestion(tmp_path, monkeypatch):
+    ingested_at = [1.0]
+    monkeypatch.setattr(local_client, "last_ingestion_time", lambda: ingested_at[0])
+    builds = []
+    build = local_client.LocalSearchClient.__init__
+    monkeypatch.setattr(local_client.LocalSearchClient, "__init__",
+                        lambda self, path=None: builds.append(path) or build(self, path))
+    store = str(tmp_path / "docstore")
+    backend = ResilientSearchBackend(FakeBackend([google_exceptions.ServiceUnavailable("down")] * 9),
+                                     fallback=LocalFallbackClient(store))
+    assert builds == []
+
+    # Without a local document store the fallback cannot answer.
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        backend.retrieve("back pain")
+    assert builds == [store]
+
+    with DocStoreWriter(store) as writer:
+        writer.add("a", ["Lower back pain for two weeks."], {"source_file": "a.pdf"})
+    ingested_at[0] = 2.0
+    assert [hit.doc_id for hit in backend.retrieve("back pain")] == ["a"]
+    assert [hit.doc_id for hit in backend.retrieve("pain")] == ["a"]
+    assert len(builds) == 2
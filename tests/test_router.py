@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+from src.agents import router as router_module
+from src.agents.prompts import CONVERSATIONAL, EXTRACTOR, GENERAL, SUMMARIZER
+from src.agents.router import AGGREGATE, CHITCHAT, GENERATE, LOOKUP, QueryRouter
+from src.search.field_store import FieldStore
+
+RECORDS = {
+    "woodward": {
+        "source_file": "medical_record_Jessica_Woodward.pdf", "patient": "Jessica Woodward", "date": "2025-07-28",
+        "medication": "Metformin 500mg twice daily", "heart_rate": 96, "bp_systolic": 142, "bp_diastolic": 91,
+        "diagnosis": "Type 2 Diabetes",
+    },
+    "doe": {
+        "source_file": "medical_record_John_Doe.pdf", "patient": "John Doe", "date": "2025-06-02",
+        "medication": "Lisinopril 10mg", "heart_rate": 72, "bp_systolic": 128,
+    },
+}
+
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    path = str(tmp_path / "fields.npz")
+    FieldStore.from_records(RECORDS).save(path)
+    monkeypatch.setattr(router_module, "last_ingestion_time", lambda: 1.0)
+    return QueryRouter(field_store_path=path)
+
+
+def test_greetings_get_a_canned_reply(router):
+    assert router.route("Hello!").kind == CHITCHAT
+
+
+def test_lookup_prints_the_medication_as_stored(router):
+    route = router.route("What medication is Jessica Woodward on?")
+    assert route.kind == LOOKUP
+    assert "Medication: Metformin 500mg twice daily." in route.answer
+    assert "once daily" not in router.route("What medication is John Doe on?").answer
+
+
+def test_lookup_without_a_stored_value_goes_to_the_extractor(router):
+    route = router.route("What is the diagnosis of John Doe?")
+    assert (route.kind, route.persona, route.answer) == (GENERATE, EXTRACTOR, None)
+
+
+def test_aggregate_counts_and_lists_matching_records(router):
+    count = router.route("How many patients have a heart rate above 90?")
+    assert count.kind == AGGREGATE
+    assert count.answer.startswith("1 of 2 records (1 patients)")
+
+    listing = router.route("Which patients have blood pressure over 120?")
+    assert listing.kind == AGGREGATE
+    assert "Jessica Woodward (2025-07-28, medical_record_Jessica_Woodward.pdf): 142/91 mmHg" in listing.answer
+    assert "John Doe (2025-06-02, medical_record_John_Doe.pdf): 128 mmHg systolic" in listing.answer
+
+
+def test_aggregate_lists_conditions_on_every_field(router):
+    answer = router.route("Which patients have diastolic above 80 and heart rate above 90?").answer
+    assert "- Jessica Woodward (2025-07-28, medical_record_Jessica_Woodward.pdf): 91, 96 bpm" in answer
+
+
+def test_other_questions_go_to_the_model_with_a_persona(router):
+    assert router.route("Why was Jessica Woodward prescribed Metformin?").persona == GENERAL
+    assert router.route("Summarize the record of John Doe").persona == SUMMARIZER
+    assert router.route("ok great").persona == CONVERSATIONAL
+
+
+def test_without_a_field_store_nothing_is_answered_locally(tmp_path, monkeypatch):
+    monkeypatch.setattr(router_module, "last_ingestion_time", lambda: 1.0)
+    router = QueryRouter(field_store_path=str(tmp_path / "missing.npz"))
+    assert router.route("How many patients have a heart rate above 90?").kind == GENERATE
+    assert router.route("What medication is Jessica Woodward on?").persona == EXTRACTOR
+
+
+def test_aggregate_naming_a_patient_only_counts_their_records(router):
+    route = router.route("Is Jessica Woodward's heart rate above 90?")
+    assert route.kind == AGGREGATE
+    assert "John Doe" not in route.answer
+    assert route.answer.startswith("1 records of Jessica Woodward have heart rate > 90:")
+
+    assert router.route("Does John Doe have a heart rate above 90?").answer == (
+        "No records of John Doe have heart rate > 90."
+    )
+    assert router.route("How many records of John Doe have a heart rate above 60?").answer.startswith(
+        "1 of 1 records of John Doe (1 patients)"
+    )
+
+
+def test_reasoning_over_a_numeric_condition_goes_to_the_model(router):
+    route = router.route("Why is the heart rate above 90 for Jessica Woodward?")
+    assert (route.kind, route.persona, route.answer) == (GENERATE, GENERAL, None)
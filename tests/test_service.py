@@ -0,0 +1,163 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import threading
+import time
+
+# The agent's search tool is built at import time from the Vertex settings.
+for _name, _value in dict(PROJECT_ID="p", LOCATION="global", DATA_STORE_ID="d", ENGINE_ID="e").items():
+    os.environ.setdefault(_name, _value)
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from src.agents import memory, tools
+from src.agents import service as service_module
+from src.agents.memory import MemoryPolicy
+from src.agents.service import AgentService
+
+# The size of every model request and the number of requests in flight, per stub instance.
+REQUESTS = []
+ACTIVE = {"now": 0, "peak": 0}
+ANSWER = "The answer is " + "x" * 400
+
+
+class StubLlm(BaseLlm):
+    """Calls a tool once per turn, then answers; records the size of each request."""
+    delay: float = 0.0
+    tool: str = "lookup"
+
+    async def generate_content_async(self, llm_request, stream=False):
+        ACTIVE["now"] += 1
+        ACTIVE["peak"] = max(ACTIVE["peak"], ACTIVE["now"])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            ACTIVE["now"] -= 1
+        size = sum(len(c.model_dump_json(exclude_none=True)) for c in llm_request.contents)
+        REQUESTS.append(size + len(str(llm_request.config.system_instruction or "")))
+        if any(p.function_response for p in llm_request.contents[-1].parts):
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=ANSWER)]))
+        else:
+            call = types.FunctionCall(name=self.tool, args={"query": "q"})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+
+def lookup(query: str) -> str:
+    """Looks up records."""
+    return "snippet " * 400
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    REQUESTS.clear()
+    ACTIVE.update(now=0, peak=0)
+
+
+def make_service(monkeypatch, policy, delay=0.0, tool=lookup) -> AgentService:
+    monkeypatch.setattr(service_module, "memory_enabled", policy is not None)
+    if policy is not None:
+        monkeypatch.setattr(service_module, "memory_policy", policy)
+        monkeypatch.setattr(memory, "memory_policy", policy)
+    agent = Agent(
+        name="stub", model=StubLlm(model="stub", delay=delay, tool=tool.__name__), instruction="Answer.", tools=[tool],
+        before_model_callback=[memory.before_model] if policy is not None else [],
+    )
+    return AgentService(agent=agent, max_concurrency=8, max_pending=8)
+
+
+async def ask(service, session_id, message):
+    return "".join([text async for text in service.stream_reply("u", session_id, message)])
+
+
+async def converse(service, turns):
+    for i in range(turns):
+        assert await ask(service, "s", f"Question number {i} about the patient?") == ANSWER
+
+
+def test_prompt_size_stays_flat_over_a_long_session(monkeypatch):
+    service = make_service(monkeypatch, MemoryPolicy())
+    asyncio.run(converse(service, 100))
+    # Two model requests per turn: the tool call and the answer.
+    assert len(REQUESTS) == 200
+    after_window = REQUESTS[2 * 20 - 1]
+    assert max(REQUESTS[2 * 20:]) <= after_window * 1.1
+    assert REQUESTS[-1] < 16 * 1024
+
+
+def test_prompt_grows_without_the_memory_policy(monkeypatch):
+    service = make_service(monkeypatch, None)
+    asyncio.run(converse(service, 100))
+    assert REQUESTS[-1] > 100 * 1024
+
+
+def test_turns_of_a_session_are_serialized_with_compaction(monkeypatch):
+    # A tiny session budget compacts the session after every turn.
+    service = make_service(monkeypatch, MemoryPolicy(window_turns=2, max_session_bytes=1), delay=0.01)
+    questions = [f"Question number {i} about the patient?" for i in range(6)]
+
+    async def run():
+        replies = await asyncio.gather(*(ask(service, "s", q) for q in questions))
+        other = await ask(service, "other", "A question in another session?")
+        session = await service.session_service.get_session(app_name=service.app_name, user_id="u", session_id="s")
+        return replies, other, session
+
+    replies, other, session = asyncio.run(run())
+    assert replies == [ANSWER] * len(questions)
+    assert other == ANSWER
+    assert ACTIVE["peak"] == 1
+    # No turn is lost by a compaction racing with another turn: each is in the summary or the window.
+    summary = session.state.get(memory._STATE_SUMMARY, "")
+    recent = " ".join(e.content.parts[0].text or "" for e in session.events if e.author == "user")
+    assert all(q in summary or q in recent for q in questions)
+    assert not service._session_locks
+
+
+def test_turns_of_different_sessions_run_concurrently(monkeypatch):
+    service = make_service(monkeypatch, MemoryPolicy(), delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(ask(service, f"s{i}", "A question?") for i in range(4)))
+
+    assert asyncio.run(run()) == [ANSWER] * 4
+    assert ACTIVE["peak"] == 4
+
+
+def test_search_tool_calls_of_concurrent_turns_overlap(monkeypatch):
+    class SlowSearch:
+        """A blocking search backend recording when each call ran."""
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.calls = []
+
+        def search(self, query, filters=None):
+            started = time.perf_counter()
+            time.sleep(0.3)
+            with self.lock:
+                self.calls.append((started, time.perf_counter()))
+            return "snippet"
+
+    search = SlowSearch()
+    monkeypatch.setattr(tools, "search_client", search)
+    service = make_service(monkeypatch, None, tool=tools.search_knowledge_base)
+
+    async def run():
+        return await asyncio.gather(ask(service, "s1", "A question?"), ask(service, "s2", "A question?"))
+
+    assert asyncio.run(run()) == [ANSWER] * 2
+    (first_start, first_end), (second_start, second_end) = sorted(search.calls)
+    assert second_start < first_end
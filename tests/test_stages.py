@@ -0,0 +1,90 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+import time
+import pytest
+from src.ingestion.stages import Stage, run_stages
+
+
+def test_items_reach_ordered_stages_in_source_order():
+    seen = []
+
+    def jitter(item):
+        time.sleep(0.001 * (item % 3))
+        return item
+
+    stats = run_stages(range(50), [
+        Stage("work", jitter, workers=4, queue_size=4),
+        Stage("record", lambda item: seen.append(item) or item, ordered=True, queue_size=4),
+    ])
+    assert seen == list(range(50))
+    assert stats["record"].processed == 50
+
+
+def test_dropped_items_do_not_stall_ordered_stages():
+    seen = []
+    stats = run_stages(range(20), [
+        Stage("filter", lambda item: item if item % 2 else None, workers=3),
+        Stage("record", lambda item: seen.append(item) or item, ordered=True),
+    ])
+    assert seen == list(range(1, 20, 2))
+    assert stats["filter"].dropped == 10
+
+
+@pytest.mark.parametrize("window", [2, 4])
+def test_reordering_is_bounded_when_one_item_is_slow(window):
+    slow_done = threading.Event()
+    read_while_slow = []
+
+    def source():
+        for item in range(100):
+            if not slow_done.is_set():
+                read_while_slow.append(item)
+            yield item
+
+    def work(item):
+        if item == 0:
+            time.sleep(0.3)
+            slow_done.set()
+        return item
+
+    seen = []
+    stats = run_stages(source(), [
+        Stage("work", work, workers=8, queue_size=window),
+        Stage("dedup", lambda item: item, ordered=True, queue_size=window),
+        Stage("chunk", work, workers=8, queue_size=window),
+        Stage("write", lambda item: seen.append(item) or item, ordered=True, queue_size=window),
+    ])
+    assert seen == list(range(100))
+    assert stats["dedup"].reorder_peak < window
+    assert stats["write"].reorder_peak < window
+    # The source is read at most one item past the window while the oldest item is slow.
+    assert len(read_while_slow) <= window + 1
+
+
+def test_failed_items_are_reported():
+    def fail_on_odd(item):
+        if item % 2:
+            raise ValueError(f"bad item {item}")
+        return item
+
+    seen = []
+    stats = run_stages(range(10), [
+        Stage("work", fail_on_odd, workers=3),
+        Stage("record", lambda item: seen.append(item) or item, ordered=True),
+    ])
+    assert seen == [0, 2, 4, 6, 8]
+    assert sorted(item for item, _ in stats["work"].failed) == [1, 3, 5, 7, 9]
+    assert all(isinstance(error, ValueError) for _, error in stats["work"].failed)
+    assert stats["work"].to_dict()["failed"] == 5 and stats["record"].failed == []
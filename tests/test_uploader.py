@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import base64
+import os
+import pytest
+from google.api_core import exceptions as google_exceptions
+from src.ingestion import uploader
+from src.ingestion.uploader import COMPOSED, SKIPPED, UPLOADED, upload_file
+from src.shared import rate_limit
+from tests.fakes import FakeBlob, FakeBucket
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_GCS_QPS", "0")
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(uploader, "COMPOSITE_THRESHOLD_BYTES", 1000)
+    monkeypatch.setattr(uploader, "SLICE_BYTES", 300)
+
+
+def write(tmp_path, size, seed=b"record"):
+    path = tmp_path / "file.bin"
+    path.write_bytes((seed * (size // len(seed) + 1))[:size])
+    return str(path)
+
+
+def slices(bucket):
+    return sorted(name for name in bucket.objects if ".slices/" in name)
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    bucket = FakeBucket()
+    path = write(tmp_path, 500)
+    assert upload_file(bucket, "file.bin", path) == UPLOADED
+    assert upload_file(bucket, "file.bin", path) == SKIPPED
+    assert [call for call, _ in bucket.calls] == ["upload"]
+
+    write(tmp_path, 500, seed=b"edited")
+    assert upload_file(bucket, "file.bin", path) == UPLOADED
+
+
+def test_large_files_are_composed_from_slices(tmp_path):
+    bucket = FakeBucket()
+    path = write(tmp_path, 1000)
+    assert upload_file(bucket, "file.bin", path) == COMPOSED
+    with open(path, "rb") as f:
+        assert bucket.objects["file.bin"] == f.read()
+    assert [call for call, _ in bucket.calls].count("upload") == 4
+    # The slices are deleted once composed, and a composite object is skipped by its CRC32C.
+    assert slices(bucket) == []
+    assert upload_file(bucket, "file.bin", path) == SKIPPED
+
+
+def test_slices_of_a_failed_upload_are_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploader, "SLICE_WORKERS", 1)
+    bucket = FakeBucket()
+    path = write(tmp_path, 1000)
+    prefix = f"file.bin.slices/{base64.b64decode(uploader.file_checksums(path)[0]).hex()}"
+    bucket.fail_uploads.append(f"{prefix}/0002")
+    with pytest.raises(google_exceptions.Forbidden):
+        upload_file(bucket, "file.bin", path)
+    assert f"{prefix}/0000" in bucket.objects and "file.bin" not in bucket.objects
+
+    bucket.calls.clear()
+    assert upload_file(bucket, "file.bin", path) == COMPOSED
+    uploads = [name for call, name in bucket.calls if call == "upload"]
+    assert f"{prefix}/0000" not in uploads and f"{prefix}/0002" in uploads
+    assert slices(bucket) == []
+
+
+def test_a_mismatched_composite_is_cleaned_up(tmp_path, monkeypatch):
+    bucket = FakeBucket()
+    path = write(tmp_path, 1000)
+    compose = FakeBlob.compose
+    monkeypatch.setattr(FakeBlob, "compose", lambda self, sources: compose(self, sources[:-1]))
+    with pytest.raises(ValueError):
+        upload_file(bucket, "file.bin", path)
+    # Neither the wrong object nor the slices that produced it are left to be reused.
+    assert bucket.objects == {}
+
+    monkeypatch.setattr(FakeBlob, "compose", compose)
+    assert upload_file(bucket, "file.bin", path) == COMPOSED
+    assert os.path.getsize(path) == len(bucket.objects["file.bin"])
@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+from types import SimpleNamespace
+import pytest
+from src.search import vertex_client
+from src.search.vertex_client import VertexSearchClient
+from src.shared import clients
+from src.shared.rate_limit import RateLimitTimeout
+
+
+class FakeSearchClient:
+    def __init__(self):
+        self.timeouts = []
+
+    def search(self, request, timeout=None, retry=None):
+        self.timeouts.append(timeout)
+        return SimpleNamespace(results=[])
+
+
+class SlowLimiter:
+    def __init__(self, wait):
+        self.wait = wait
+
+    def acquire(self, timeout=None):
+        time.sleep(self.wait)
+
+    def penalize(self):
+        pass
+
+
+@pytest.fixture
+def search_client(tmp_path, monkeypatch):
+    for name, value in {"PROJECT_ID": "p", "LOCATION": "global", "DATA_STORE_ID": "d", "ENGINE_ID": "e",
+                        "METADATA_INDEX_PATH": str(tmp_path / "metadata.jsonl")}.items():
+        monkeypatch.setenv(name, value)
+    fake = FakeSearchClient()
+    clients.get_registry().override(clients.SEARCH, fake)
+    yield fake
+    clients.get_registry().clear_overrides()
+
+
+def test_rpc_timeout_excludes_the_rate_limit_wait(search_client, monkeypatch):
+    monkeypatch.setattr(vertex_client, "get_limiter", lambda name: SlowLimiter(0.2))
+    VertexSearchClient().retrieve("query", timeout=1.0)
+    assert 0.7 < search_client.timeouts[0] <= 0.8
+
+
+def test_call_is_not_sent_once_the_wait_used_up_the_deadline(search_client, monkeypatch):
+    monkeypatch.setattr(vertex_client, "get_limiter", lambda name: SlowLimiter(0.1))
+    with pytest.raises(RateLimitTimeout):
+        VertexSearchClient().retrieve("query", timeout=0.05)
+    assert search_client.timeouts == []
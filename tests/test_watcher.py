@@ -0,0 +1,82 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from src.ingestion.watcher import DirectoryWatcher
+
+
+def write_note(tmp_path):
+    (tmp_path / "raw").mkdir(exist_ok=True)
+    (tmp_path / "raw" / "note.txt").write_text("PATIENT ENCOUNTER NOTE\nPatient: Jessica Woodward\n", encoding="utf-8")
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_watcher(tmp_path):
+    return DirectoryWatcher(str(tmp_path / "raw"), str(tmp_path / "processed"), poll_seconds=1,
+                            settle_seconds=0, batch_size=10, max_batch_age_seconds=1)
+
+
+def test_files_stay_pending_until_the_import_succeeds(tmp_path, cloud):
+    storage, documents = cloud
+    write_note(tmp_path)
+    watcher = make_watcher(tmp_path)
+    # The first scan only detects the file; the batch is sent once it is old enough.
+    assert watcher.run_once(now=100) == 0
+
+    documents.error = RuntimeError("import refused")
+    assert watcher.run_once(now=200) == 0
+    assert documents.imports == ["gs://bucket/metadata/metadata_batch.jsonl"]
+    assert list(watcher._pending) == ["note.txt"]
+    assert not (tmp_path / "processed" / "watch_state.json").exists()
+
+    documents.error = None
+    assert watcher.run_once(now=300) == 1
+    assert list(make_watcher(tmp_path)._ingested) == ["note.txt"]
+    assert watcher.run_once(now=400) == 0
+
+
+def test_files_stay_pending_when_their_upload_fails(tmp_path, cloud):
+    storage, documents = cloud
+    write_note(tmp_path)
+    (tmp_path / "raw" / "other.txt").write_text("PATIENT ENCOUNTER NOTE\nPatient: Jane Roe\n", encoding="utf-8")
+    watcher = make_watcher(tmp_path)
+    watcher.run_once(now=100)
+
+    storage.bucket("bucket").fail_uploads.append("raw/note.txt")
+    assert watcher.run_once(now=200) == 2
+    assert list(watcher._pending) == ["note.txt"]
+    assert list(watcher._ingested) == ["other.txt"]
+    # Only the file that was uploaded is imported.
+    assert [e["structData"]["source_file"] for e in read_jsonl(tmp_path / "processed" / "metadata_batch.jsonl")] == ["other.txt"]
+
+    assert watcher.run_once(now=300) == 1
+    assert sorted(watcher._ingested) == ["note.txt", "other.txt"]
+    assert watcher._pending == {}
+
+
+def test_files_stay_pending_without_a_bucket(tmp_path, cloud, monkeypatch):
+    monkeypatch.delenv("GCS_BUCKET_NAME")
+    write_note(tmp_path)
+    calls = []
+    watcher = make_watcher(tmp_path)
+    ingest = watcher.ingest
+    watcher.ingest = lambda files: calls.append(files) or ingest(files)
+    watcher.run_once(now=100)
+
+    assert watcher.run_once(now=200) == 0
+    assert len(calls) == 1
+    assert list(watcher._pending) == ["note.txt"]